@@ -99,6 +99,14 @@ try:
         from .ledger import YAMLLedger
 
         current_ledger = YAMLLedger(config.get("ledger", "location"))
+    elif config.get("ledger", "engine") == "yamldirectory":
+        from .ledger import YAMLDirectoryLedger
+
+        current_ledger = YAMLDirectoryLedger(config.get("ledger", "location"))
+    elif config.get("ledger", "engine") == "sqlite":
+        from .ledger import DatabaseLedger
+
+        current_ledger = DatabaseLedger(config.get("ledger", "location"))
     else:
         current_ledger = None
 except FileNotFoundError:
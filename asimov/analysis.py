@@ -86,7 +86,7 @@ class Analysis:
             self.event.issue_object.update_data()
 
     def results(self, filename=None, handle=False, hash=None):
-        store = Store(root=config.get("storage", "results_store"))
+        store = Store.get(config.get("storage", "results_store"))
         if not filename:
             try:
                 items = store.manifest.list_resources(self.subject.name, self.name)
@@ -3,13 +3,15 @@ Tools for adding data from JSON and YAML files.
 Inspired by the kubectl apply approach from kubernetes.
 """
 
+import os
+
 import click
 import requests
-import yaml
 
-from asimov import LOGGER_LEVEL, logger
+from asimov import LOGGER_LEVEL, logger, serialisation
 import asimov.event
 from asimov import current_ledger as ledger
+from asimov.git import checkout_directory, is_remote, sync_repositories
 from asimov.utils import update
 
 import sys
@@ -36,67 +38,80 @@ def apply_page(file, event, ledger=ledger):
         with open(file, "r") as apply_file:
             data = apply_file.read()
 
-    quick_parse = yaml.safe_load_all(
-        data
+    quick_parse = list(
+        serialisation.load_all(data)
     )  # Load as a dictionary so we can identify the object type it contains
 
-    for document in quick_parse:
-
-        if document["kind"] == "event":
-            logger.info("Found an event")
-            document.pop("kind")
-            event = asimov.event.Event.from_yaml(yaml.dump(document))
-            ledger.update_event(event)
-            click.echo(
-                click.style("●", fg="green") + f" Successfully applied {event.name}"
-            )
-            logger.info(f"Added {event.name} to project")
-
-        elif document["kind"] == "analysis":
-            logger.info("Found an analysis")
-            document.pop("kind")
-            if event:
-                event_s = event
-            else:
-                if "event" in document:
-                    event_s = document["event"]
-                else:
-                    prompt = "Which event should these be applied to?"
-                    event_s = str(click.prompt(prompt))
-            try:
-                event_o = ledger.get_event(event_s)[0]
-            except KeyError as e:
+    # Clone the repositories for new events together, rather than one
+    # at a time as each event is created.
+    sources = {
+        document["name"]: document["repository"]
+        for document in quick_parse
+        if document.get("kind") == "event"
+        and is_remote(document.get("repository") or "")
+        and not os.path.exists(checkout_directory(document["name"]))
+    }
+    if sources:
+        sync_repositories(sources)
+
+    with ledger.batch():
+        for document in quick_parse:
+
+            if document["kind"] == "event":
+                logger.info("Found an event")
+                document.pop("kind")
+                event = asimov.event.Event.from_yaml(serialisation.dump(document))
+                ledger.update_event(event)
                 click.echo(
-                    click.style("●", fg="red")
-                    + f" Could not apply a production, couldn't find the event {event}"
+                    click.style("●", fg="green") + f" Successfully applied {event.name}"
                 )
-                logger.exception(e)
-            production = asimov.event.Production.from_dict(document, event=event_o)
-            try:
-                event_o.add_production(production)
-                ledger.update_event(event_o)
+                logger.info(f"Added {event.name} to project")
+
+            elif document["kind"] == "analysis":
+                logger.info("Found an analysis")
+                document.pop("kind")
+                if event:
+                    event_s = event
+                else:
+                    if "event" in document:
+                        event_s = document["event"]
+                    else:
+                        prompt = "Which event should these be applied to?"
+                        event_s = str(click.prompt(prompt))
+                try:
+                    event_o = ledger.get_event(event_s)[0]
+                except KeyError as e:
+                    click.echo(
+                        click.style("●", fg="red")
+                        + f" Could not apply a production, couldn't find the event {event}"
+                    )
+                    logger.exception(e)
+                production = asimov.event.Production.from_dict(document, event=event_o)
+                try:
+                    event_o.add_production(production)
+                    ledger.update_event(event_o)
+                    click.echo(
+                        click.style("●", fg="green")
+                        + f" Successfully applied {production.name} to {event_o.name}"
+                    )
+                    logger.info(f"Added {production.name} to {event_o.name}")
+                except ValueError as e:
+                    click.echo(
+                        click.style("●", fg="red")
+                        + f" Could not apply {production.name} to {event_o.name} as "
+                        + "an analysis already exists with this name"
+                    )
+                    logger.exception(e)
+
+            elif document["kind"] == "configuration":
+                logger.info("Found configurations")
+                document.pop("kind")
+                update(ledger.data, document)
+                ledger.save()
                 click.echo(
                     click.style("●", fg="green")
-                    + f" Successfully applied {production.name} to {event_o.name}"
+                    + " Successfully applied a configuration update"
                 )
-                logger.info(f"Added {production.name} to {event_o.name}")
-            except ValueError as e:
-                click.echo(
-                    click.style("●", fg="red")
-                    + f" Could not apply {production.name} to {event_o.name} as "
-                    + "an analysis already exists with this name"
-                )
-                logger.exception(e)
-
-        elif document["kind"] == "configuration":
-            logger.info("Found configurations")
-            document.pop("kind")
-            update(ledger.data, document)
-            ledger.save()
-            click.echo(
-                click.style("●", fg="green")
-                + " Successfully applied a configuration update"
-            )
 
 
 def apply_via_plugin(event, hookname, **kwargs):
@@ -104,16 +119,12 @@ def apply_via_plugin(event, hookname, **kwargs):
     for hook in discovered_hooks:
         if hook.name in hookname:
             hook.load()(ledger).run(event)
-            click.echo(
-                click.style("●", fg="green")
-                + f"{event} has been applied."
-            )
+            click.echo(click.style("●", fg="green") + f"{event} has been applied.")
 
             break
     else:
         click.echo(
-            click.style("●", fg="red")
-            + f"No hook found matching {hookname}. "
+            click.style("●", fg="red") + f"No hook found matching {hookname}. "
             f"Installed hooks are {', '.join(discovered_hooks.names)}"
         )
 
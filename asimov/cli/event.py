@@ -14,6 +14,7 @@ from asimov import config
 from asimov import current_ledger as ledger
 from asimov.utils import find_calibrations, update
 from asimov.event import DescriptionException, Event
+from asimov.git import sync_repositories
 
 
 @click.group()
@@ -141,6 +142,41 @@ def delete(event):
     ledger.delete_event(event_name=event)
 
 
+@click.option(
+    "--threads",
+    "-t",
+    "threads",
+    default=None,
+    type=int,
+    help="The number of repositories to clone or update at once.",
+)
+@click.argument("names", nargs=-1)
+@event.command()
+def sync(names, threads):
+    """
+    Clone or update the repositories for events in the ledger.
+
+    All of the events are synchronised unless some names are given.
+    """
+    sources = {}
+    for name in names or list(ledger.events):
+        repository = ledger.events[name].get("repository")
+        if repository:
+            sources[name] = repository
+    report = sync_repositories(sources, threads=threads)
+
+    for name, error in report["failed"].items():
+        click.echo(click.style("●", fg="red") + f" {name} could not be synchronised")
+        click.echo(f"  {error}")
+    rate = len(sources) / report["elapsed"] if report["elapsed"] else 0
+    click.echo(
+        click.style("●", fg="green")
+        + f" Synchronised {len(sources) - len(report['failed'])} repositories "
+        + f"in {report['elapsed']:.1f} seconds ({rate:.1f} per second): "
+        + f"{len(report['cloned'])} cloned, {len(report['updated'])} updated"
+    )
+
+
 # @click.argument("event")
 # @click.option("--yaml", "yaml", default=None)
 # @click.option("--ini", "ini", default=None)
@@ -0,0 +1,143 @@
+"""
+Commands for managing the project ledger.
+"""
+import os
+
+import click
+
+from asimov import config, logger, LOGGER_LEVEL
+from asimov.ledger import DatabaseLedger, YAMLDirectoryLedger, YAMLLedger
+
+logger = logger.getChild("cli").getChild("ledger")
+logger.setLevel(LOGGER_LEVEL)
+
+
+@click.group()
+def ledger():
+    """Manage the storage of the project ledger."""
+    pass
+
+
+@click.option(
+    "--location",
+    "location",
+    default=None,
+    help="The location of the new ledger. Defaults to .asimov/ledger for a "
+    "ledger directory, and .asimov/ledger.db for a ledger database.",
+)
+@click.option(
+    "--engine",
+    "engine",
+    default="yamldirectory",
+    type=click.Choice(["yamldirectory", "sqlite"]),
+    help="The type of ledger to migrate to.",
+)
+@ledger.command()
+def migrate(location, engine):
+    """
+    Convert a single-file ledger to a ledger directory, with one file per
+    event, or to an SQLite ledger database.
+    """
+    if config.get("ledger", "engine") != "yamlfile":
+        click.echo(
+            click.style("●", fg="red")
+            + " Only single-file YAML ledgers can be migrated."
+        )
+        return
+
+    source = config.get("ledger", "location")
+    if engine == "sqlite":
+        location = location or DatabaseLedger.default_location
+        DatabaseLedger.migrate(source, location)
+    else:
+        location = location or YAMLDirectoryLedger.default_location
+        YAMLDirectoryLedger.migrate(source, location)
+
+    config.set("ledger", "engine", engine)
+    config.set("ledger", "location", location)
+    with open(os.path.join(".asimov", "asimov.conf"), "w") as config_file:
+        config.write(config_file)
+
+    click.echo(
+        click.style("●", fg="green") + f" The ledger has been migrated to {location}"
+    )
+    logger.info(f"Migrated the ledger from {source} to {location}")
+
+
+@ledger.group()
+def cache():
+    """Manage the snapshot cache of the project ledger."""
+    pass
+
+
+def _cached_ledger():
+    """
+    Open the project ledger for cache operations, or return None if the
+    ledger does not support a snapshot cache.
+    """
+    if config.get("ledger", "engine") != "yamlfile":
+        click.echo(
+            click.style("●", fg="red")
+            + " Only single-file YAML ledgers have a snapshot cache."
+        )
+        return None
+    return YAMLLedger(config.get("ledger", "location"), cache=False)
+
+
+@cache.command()
+def rebuild():
+    """
+    Re-read the ledger and replace its snapshot cache.
+    """
+    current = _cached_ledger()
+    if current is None:
+        return
+    current.rebuild_cache()
+    click.echo(
+        click.style("●", fg="green")
+        + f" The ledger cache has been rebuilt at {current.cache_location}"
+    )
+    logger.info(f"Rebuilt the ledger cache at {current.cache_location}")
+
+
+@cache.command()
+def clear():
+    """
+    Remove the snapshot cache of the ledger.
+    """
+    current = _cached_ledger()
+    if current is None:
+        return
+    current.clear_cache()
+    click.echo(click.style("●", fg="green") + " The ledger cache has been removed")
+
+
+@cache.command()
+def info():
+    """
+    Show the state of the snapshot cache of the ledger.
+    """
+    current = _cached_ledger()
+    if current is None:
+        return
+    details = current.cache_info()
+    if not details["exists"]:
+        click.echo(
+            click.style("●", fg="yellow")
+            + f" There is no ledger cache at {details['location']}"
+        )
+        return
+    if details["valid"]:
+        click.echo(
+            click.style("●", fg="green")
+            + f" The ledger cache at {details['location']} is up to date"
+        )
+        click.echo(f"  Events: {details['events']}")
+        click.echo(f"  Ledger hash: {details['hash']}")
+    else:
+        click.echo(
+            click.style("●", fg="yellow")
+            + f" The ledger cache at {details['location']} is out of date,"
+            + " and will be rebuilt the next time the ledger is read"
+        )
+    click.echo(f"  Size: {details['size']} bytes")
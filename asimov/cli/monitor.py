@@ -1,11 +1,13 @@
+import concurrent.futures
 import shutil
 import configparser
 import os
 import sys
+import time
 import click
 from copy import deepcopy
 
-from asimov import condor, config, logger, LOGGER_LEVEL
+from asimov import condor, config, git, logger, utils, LOGGER_LEVEL
 from asimov import current_ledger as ledger
 from asimov.cli import ACTIVE_STATES, manage, report
 
@@ -78,191 +80,245 @@ def stop(dry_run):
     logger.info(f"Stopped asimov cronjob {cluster}")
 
 
-@click.argument("event", default=None, required=False)
-@click.option(
-    "--update",
-    "update",
-    default=False,
-    help="Force the git repos to be pulled before submission occurs.",
-)
-@click.option("--dry-run", "-n", "dry_run", is_flag=True)
-@click.option(
-    "--chain",
-    "-c",
-    "chain",
-    default=False,
-    is_flag=True,
-    help="Chain multiple asimov commands",
-)
-@click.command()
-@click.pass_context
-def monitor(ctx, event, update, dry_run, chain):
+class EventOutput:
     """
-    Monitor condor jobs' status, and collect logging information.
+    Hold the output for an event, so that events can be checked at the
+    same time and their output shown in order afterwards.
     """
 
-    logger.info("Running asimov monitor")
+    def __init__(self):
+        self.lines = []
 
-    if chain:
-        logger.info("Running in chain mode")
-        ctx.invoke(manage.build, event=event)
-        ctx.invoke(manage.submit, event=event)
+    def echo(self, message=""):
+        self.lines.append((message, {}))
 
-    try:
-        # First pull the condor job listing
-        job_list = condor.CondorJobList()
-    except condor.htcondor.HTCondorLocateError:
-        click.echo(click.style("Could not find the condor scheduler", bold=True))
-        click.echo(
-            "You need to run asimov on a machine which has access to a"
-            "condor scheduler in order to work correctly, or to specify"
-            "the address of a valid sceduler."
-        )
-        sys.exit()
+    def secho(self, message="", **styles):
+        self.lines.append((message, styles))
 
-    for event in sorted(ledger.get_event(event), key=lambda e: e.name):
-        stuck = 0
-        running = 0
-        finish = 0
-        click.secho(f"{event.name}", bold=True)
-        on_deck = [
-            production
-            for production in event.productions
-            if production.status.lower() in ACTIVE_STATES
-        ]
-        for production in on_deck:
-
-            logger.debug(f"Available analyses: {event}/{production.name}")
-
-            click.echo(
-                "\t- "
-                + click.style(f"{production.name}", bold=True)
-                + click.style(f"[{production.pipeline}]", fg="green")
-            )
+    def show(self):
+        """Show the output."""
+        for message, styles in self.lines:
+            click.secho(message, **styles)
+        self.lines = []
 
-            # Jobs marked as ready can just be ignored as they've not been stood-up
-            if production.status.lower() == "ready":
-                click.secho(f"  \t  ● {production.status.lower()}", fg="green")
-                logger.debug(f"Ready production: {event}/{production.name}")
-                continue
 
-            # Deal with jobs which need to be stopped first
-            if production.status.lower() == "stop":
-                pipe = production.pipeline
-                logger.debug(f"Stop production: {event}/{production.name}")
-                if not dry_run:
+class SerialisedLedger:
+    """
+    Wrap a ledger so that it can be shared between threads, by only
+    allowing one thread to use it at a time.
+
+    Parameters
+    ----------
+    ledger : `asimov.ledger.Ledger`
+       The ledger to wrap.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        # Saving the ledger can change the working directory, and the
+        # pipelines update the ledger while holding the directory lock,
+        # so the same lock is used for both.
+        self.lock = utils.directory_lock
+
+    def unwrap(self):
+        """
+        Return the ledger which is wrapped.
+        """
+        return self.ledger
+
+    def __getattr__(self, name):
+        with self.lock:
+            value = getattr(self.ledger, name)
+        if not callable(value):
+            return value
+
+        def locked(*args, **kwargs):
+            with self.lock:
+                return value(*args, **kwargs)
+
+        return locked
+
+
+def monitor_event(event, job_list, ledger, output, dry_run=False):
+    """
+    Check the status of the active productions for an event.
+
+    This can be run for several events at the same time, so all of the
+    output is written to `output`, and the ledger should be one which
+    can be shared between threads.
+
+    Parameters
+    ----------
+    event : `asimov.event.Event`
+       The event.
+    job_list : `asimov.condor.CondorJobList`
+       The condor jobs.
+    ledger : `asimov.ledger.Ledger`
+       The ledger.
+    output : `EventOutput`
+       The output for the event.
+    dry_run : bool
+       If true don't make any changes.
+
+    Returns
+    -------
+    list
+       Pairs of a production and the cluster id of its job, for the
+       productions which have finished.
+    """
+    finished = []
+    stuck = 0
+    running = 0
+    finish = 0
+    output.secho(f"{event.name}", bold=True)
+    on_deck = [
+        production
+        for production in event.productions
+        if production.status.lower() in ACTIVE_STATES
+    ]
+    for production in on_deck:
+
+        logger.debug(f"Available analyses: {event}/{production.name}")
+
+        output.echo(
+            "\t- "
+            + click.style(f"{production.name}", bold=True)
+            + click.style(f"[{production.pipeline}]", fg="green")
+        )
+
+        # Jobs marked as ready can just be ignored as they've not been stood-up
+        if production.status.lower() == "ready":
+            output.secho(f"  \t  ● {production.status.lower()}", fg="green")
+            logger.debug(f"Ready production: {event}/{production.name}")
+            continue
+
+        # Deal with jobs which need to be stopped first
+        if production.status.lower() == "stop":
+            pipe = production.pipeline
+            logger.debug(f"Stop production: {event}/{production.name}")
+            if not dry_run:
+                with utils.directory_lock:
                     pipe.eject_job()
                     production.status = "stopped"
-                    click.secho("  \tStopped", fg="red")
-                else:
-                    click.echo("\t\t{production.name} --> stopped")
-                continue
-
-            # Get the condor jobs
-            try:
-                if "job id" in production.meta:
-                    if not dry_run:
-                        if production.meta["job id"] in job_list.jobs:
-                            job = job_list.jobs[production.meta["job id"]]
-                        else:
-                            job = None
+                output.secho("  \tStopped", fg="red")
+            else:
+                output.echo("\t\t{production.name} --> stopped")
+            continue
+
+        # Get the condor jobs
+        try:
+            if "job id" in production.meta:
+                if not dry_run:
+                    if production.meta["job id"] in job_list.jobs:
+                        job = job_list.jobs[production.meta["job id"]]
                     else:
-                        logger.debug(
-                            f"Running analysis: {event}/{production.name}, cluster {production.meta['job id']}"
-                        )
-                        click.echo("\t\tRunning under condor")
+                        job = None
                 else:
-                    raise ValueError  # Pass to the exception handler
+                    logger.debug(
+                        f"Running analysis: {event}/{production.name}, cluster {production.meta['job id']}"
+                    )
+                    output.echo("\t\tRunning under condor")
+            else:
+                raise ValueError  # Pass to the exception handler
 
-                if not dry_run:
+            if not dry_run:
 
-                    if (
-                        job.status.lower() == "running"
-                        and production.status == "processing"
-                    ):
-                        click.echo(
-                            "  \t  "
-                            + click.style("●", "green")
-                            + f" Postprocessing for {production.name} is running"
-                            + f" (condor id: {production.job_id})"
-                        )
+                if (
+                    job.status.lower() == "running"
+                    and production.status == "processing"
+                ):
+                    output.echo(
+                        "  \t  "
+                        + click.style("●", "green")
+                        + f" Postprocessing for {production.name} is running"
+                        + f" (condor id: {production.job_id})"
+                    )
 
-                        production.meta["postprocessing"]["status"] = "running"
+                    production.meta["postprocessing"]["status"] = "running"
 
-                    elif job.status.lower() == "idle":
-                        click.echo(
-                            "  \t  "
-                            + click.style("●", "green")
-                            + f" {production.name} is in the queue (condor id: {production.job_id})"
-                        )
-
-                    elif job.status.lower() == "running":
-                        click.echo(
-                            "  \t  "
-                            + click.style("●", "green")
-                            + f" {production.name} is running (condor id: {production.job_id})"
-                        )
-                        if "profiling" not in production.meta:
-                            production.meta["profiling"] = {}
-                        production.status = "running"
+                elif job.status.lower() == "idle":
+                    output.echo(
+                        "  \t  "
+                        + click.style("●", "green")
+                        + f" {production.name} is in the queue (condor id: {production.job_id})"
+                    )
 
-                    elif job.status.lower() == "completed":
+                elif job.status.lower() == "running":
+                    output.echo(
+                        "  \t  "
+                        + click.style("●", "green")
+                        + f" {production.name} is running (condor id: {production.job_id})"
+                    )
+                    if "profiling" not in production.meta:
+                        production.meta["profiling"] = {}
+                    production.status = "running"
+
+                elif job.status.lower() == "completed":
+                    # The job list's cache is kept relative to the working
+                    # directory, so it is refreshed under the same lock.
+                    with utils.directory_lock:
+                        pipe = production.pipeline
                         pipe.after_completion()
-                        click.echo(
-                            "  \t  "
-                            + click.style("●", "green")
-                            + f" {production.name} has finished and post-processing has been started"
-                        )
-                        job_list.refresh()
+                        job_list.refresh(cluster_ids=[job.idno, production.job_id])
+                    output.echo(
+                        "  \t  "
+                        + click.style("●", "green")
+                        + f" {production.name} has finished and post-processing has been started"
+                    )
 
-                    elif job.status.lower() == "held":
-                        click.echo(
-                            "  \t  "
-                            + click.style("●", "yellow")
-                            + f" {production.name} is held on the scheduler"
-                            + f" (condor id: {production.job_id})"
-                        )
-                        production.status = "stuck"
-                        stuck += 1
-                    else:
-                        running += 1
+                elif job.status.lower() == "held":
+                    output.echo(
+                        "  \t  "
+                        + click.style("●", "yellow")
+                        + f" {production.name} is held on the scheduler"
+                        + f" (condor id: {production.job_id})"
+                    )
+                    production.status = "stuck"
+                    stuck += 1
+                else:
+                    running += 1
 
-            except (ValueError, AttributeError):
+        except (ValueError, AttributeError):
+            # The pipelines change the working directory, which every
+            # thread shares, and check files relative to it, so they are
+            # run one at a time; only the condor lookups are concurrent.
+            with utils.directory_lock:
                 if production.pipeline:
 
                     pipe = production.pipeline
 
                     if production.status.lower() == "stop":
+                        cluster_id = production.job_id
                         pipe.eject_job()
                         production.status = "stopped"
-                        click.echo(
+                        output.echo(
                             "  \t  "
                             + click.style("●", "red")
                             + f" {production.name} has been stopped"
                         )
-                        job_list.refresh()
+                        job_list.refresh(cluster_ids=[cluster_id])
                     elif production.status.lower() == "finished":
                         pipe.after_completion()
-                        click.echo(
+                        output.echo(
                             "  \t  "
                             + click.style("●", "green")
                             + f" {production.name} has finished and post-processing has been started"
                         )
-                        job_list.refresh()
+                        job_list.refresh(cluster_ids=[production.job_id])
                     elif production.status.lower() == "processing":
                         # Need to check the upload has completed
                         if pipe.detect_completion_processing():
                             try:
                                 pipe.after_processing()
-                                click.echo(
+                                output.echo(
                                     "  \t  "
                                     + click.style("●", "green")
                                     + f" {production.name} has been finalised and stored"
                                 )
                             except ValueError as e:
-                                click.echo(e)
+                                output.echo(e)
                         else:
-                            click.echo(
+                            output.echo(
                                 "  \t  "
                                 + click.style("●", "green")
                                 + f" {production.name} has finished and post-processing"
@@ -273,7 +329,7 @@ def monitor(ctx, event, update, dry_run, chain):
                         pipe.detect_completion()
                         and production.status.lower() == "processing"
                     ):
-                        click.echo(
+                        output.echo(
                             "  \t  "
                             + click.style("●", "green")
                             + f" {production.name} has finished and post-processing is running"
@@ -285,37 +341,22 @@ def monitor(ctx, event, update, dry_run, chain):
                         # The job has been completed, collect its assets
                         if "profiling" not in production.meta:
                             production.meta["profiling"] = {}
-                        try:
-                            config.get("condor", "scheduler")
-                            production.meta["profiling"] = condor.collect_history(
-                                production.job_id
-                            )
-                            production.meta["job id"] = None
-                        except (
-                            configparser.NoOptionError,
-                            configparser.NoSectionError,
-                        ):
-                            logger.warning(
-                                "Could not collect condor profiling data as"
-                                " no scheduler was specified in the"
-                                " config file."
-                            )
-                        except ValueError as e:
-                            logger.error("Could not collect condor profiling data.")
-                            logger.exception(e)
-                            pass
+                        # The profiling data for all of the finished jobs
+                        # is collected together at the end of the pass.
+                        if production.job_id is not None:
+                            finished.append((production, production.job_id))
 
                         finish += 1
                         production.status = "finished"
                         pipe.after_completion()
-                        click.secho(
+                        output.secho(
                             f"  \t  ● {production.name} - Completion detected",
                             fg="green",
                         )
-                        job_list.refresh()
+                        job_list.refresh(cluster_ids=[production.job_id])
                     else:
                         # It looks like the job has been evicted from the cluster
-                        click.echo(
+                        output.echo(
                             "  \t  "
                             + click.style("●", "yellow")
                             + f" {production.name} is stuck; attempting a rescue"
@@ -324,46 +365,183 @@ def monitor(ctx, event, update, dry_run, chain):
                             pipe.resurrect()
                         except Exception:  # Sorry, but there are many ways the above command can fail
                             production.status = "stuck"
-                            click.echo(
+                            output.echo(
                                 "  \t  "
                                 + click.style("●", "red")
                                 + f" {production.name} is stuck; automatic rescue was not possible"
                             )
 
                 if production.status == "stuck":
-                    click.echo(
+                    output.echo(
                         "  \t  "
                         + click.style("●", "yellow")
                         + f" {production.name} is stuck"
                     )
 
-            ledger.update_event(event)
-
-        all_productions = set(event.productions)
-        complete = {
-            production
-            for production in event.productions
-            if production.status in {"finished", "uploaded"}
-        }
-        others = all_productions - set(event.get_all_latest()) - complete
-        if len(others) > 0:
-            click.echo(
-                "The event also has these analyses which are waiting on other analyses to complete:"
+        ledger.update_event(event)
+
+    all_productions = set(event.productions)
+    complete = {
+        production
+        for production in event.productions
+        if production.status in {"finished", "uploaded"}
+    }
+    others = all_productions - set(event.get_all_latest()) - complete
+    if len(others) > 0:
+        output.echo(
+            "The event also has these analyses which are waiting on other analyses to complete:"
+        )
+        for production in others:
+            needs = ", ".join(production.meta["needs"])
+            output.echo(f"\t{production.name} which needs {needs}")
+
+    return finished
+
+
+def record_profiling(finished):
+    """
+    Collect the resources used by finished jobs from the condor history,
+    and store them in each production's profiling information.
+
+    Parameters
+    ----------
+    finished : list
+       Pairs of a production and the cluster id of its finished job.
+    """
+    try:
+        config.get("condor", "scheduler")
+    except (configparser.NoOptionError, configparser.NoSectionError):
+        logger.warning(
+            "Could not collect condor profiling data as"
+            " no scheduler was specified in the"
+            " config file."
+        )
+        return
+
+    histories = condor.collect_histories([job_id for _, job_id in finished])
+    for production, job_id in finished:
+        try:
+            history = histories.get(int(float(job_id)))
+        except (TypeError, ValueError):
+            history = None
+        if history is None:
+            logger.error(
+                f"Could not collect condor profiling data for {production.name}."
             )
-            for production in others:
-                needs = ", ".join(production.meta["needs"])
-                click.echo(f"\t{production.name} which needs {needs}")
-
-        # Post-monitor hooks
-        if "hooks" in ledger.data:
-            if "postmonitor" in ledger.data["hooks"]:
-                discovered_hooks = entry_points(group="asimov.hooks.postmonitor")
-                for hook in discovered_hooks:
-                    if hook.name in list(ledger.data["hooks"]["postmonitor"].keys()):
-                        try:
-                            hook.load()(deepcopy(ledger)).run()
-                        except Exception:
-                            pass
+            continue
+        production.meta["profiling"] = history
+        if production.job_id == job_id:
+            production.meta["job id"] = None
+        ledger.update_event(production.event)
 
-        if chain:
-            ctx.invoke(report.html)
+
+@click.argument("event", default=None, required=False)
+@click.option(
+    "--update",
+    "update",
+    is_flag=True,
+    default=False,
+    help="Force the git repos to be pulled before submission occurs.",
+)
+@click.option("--dry-run", "-n", "dry_run", is_flag=True)
+@click.option(
+    "--chain",
+    "-c",
+    "chain",
+    default=False,
+    is_flag=True,
+    help="Chain multiple asimov commands",
+)
+@click.command()
+@click.pass_context
+def monitor(ctx, event, update, dry_run, chain):
+    """
+    Monitor condor jobs' status, and collect logging information.
+    """
+
+    logger.info("Running asimov monitor")
+
+    if update:
+        git.updates.force = True
+
+    if chain:
+        logger.info("Running in chain mode")
+        ctx.invoke(manage.build, event=event, update=update)
+        ctx.invoke(manage.submit, event=event, update=update)
+
+    events = sorted(ledger.get_event(event), key=lambda e: e.name)
+
+    try:
+        # First pull the condor job listing for the analyses being monitored
+        job_list = condor.CondorJobList(
+            cluster_ids=[
+                production.job_id
+                for event in events
+                for production in event.productions
+                if production.status.lower() in ACTIVE_STATES
+            ]
+        )
+    except condor.htcondor.HTCondorLocateError:
+        click.echo(click.style("Could not find the condor scheduler", bold=True))
+        click.echo(
+            "You need to run asimov on a machine which has access to a"
+            "condor scheduler in order to work correctly, or to specify"
+            "the address of a valid sceduler."
+        )
+        sys.exit()
+
+    finished = []
+    shared = SerialisedLedger(ledger)
+    outputs = [EventOutput() for _ in events]
+    threads = config.getint("monitor", "threads", fallback=4)
+    start = time.monotonic()
+    with ledger.batch():
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, threads)
+        ) as executor:
+            futures = []
+            for event, output in zip(events, outputs):
+                event.ledger = shared
+                futures.append(
+                    executor.submit(
+                        monitor_event, event, job_list, shared, output, dry_run=dry_run
+                    )
+                )
+            # The output for each event is shown in order as soon as the
+            # event, and all of the events before it, have been checked.
+            for event, output, future in zip(events, outputs, futures):
+                try:
+                    finished += future.result()
+                finally:
+                    output.show()
+                    event.ledger = ledger
+
+        if finished:
+            record_profiling(finished)
+
+    # The hooks and the report are only run once every event has been
+    # checked and the changes written, so that they don't see events
+    # which are part way through being updated, and so that changes the
+    # hooks save aren't replaced when the batch is written.
+    if "hooks" in ledger.data:
+        if "postmonitor" in ledger.data["hooks"]:
+            discovered_hooks = entry_points(group="asimov.hooks.postmonitor")
+            for hook in discovered_hooks:
+                if hook.name in list(ledger.data["hooks"]["postmonitor"].keys()):
+                    try:
+                        hook.load()(deepcopy(ledger)).run()
+                    except Exception:
+                        pass
+
+    if chain:
+        ctx.invoke(report.html)
+
+    duration = time.monotonic() - start
+    click.echo(f"Checked {len(events)} events in {duration:.1f} seconds")
+    logger.info(
+        f"Checked {len(events)} events in {duration:.1f} seconds;"
+        f" found schedulers {condor.scheduler.lookups} times,"
+        f" and reused them {condor.scheduler.avoided} times;"
+        f" pulled event repositories {git.updates.pulls} times,"
+        f" and skipped {git.updates.avoided} pulls"
+    )
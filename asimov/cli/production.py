@@ -1,9 +1,8 @@
 from copy import copy
 
 import click
-import yaml
 
-from asimov import config
+from asimov import config, serialisation
 from asimov import current_ledger as ledger
 
 from asimov.event import Production
@@ -100,9 +99,8 @@ def create(event, pipeline, family, comment, needs, template, status, approximan
         raise NotImplementedError(
             "The Gitlab interface has been removed from this version." ""
         )
-    elif config.get("ledger", "engine") == "yamlfile":
-        ledger.events[event.name] = event.to_dict()
-        ledger.save()
+    elif config.get("ledger", "engine") in {"yamlfile", "yamldirectory", "sqlite"}:
+        ledger.update_event(event)
 
 
 @click.option(
@@ -159,7 +157,7 @@ def show(event, production):
 
     meta = copy(production.meta)
     meta.pop("ledger")
-    output = yaml.dump(meta, default_flow_style=False)
+    output = serialisation.dump(meta, default_flow_style=False)
     click.echo_via_pager(output)
 
 
@@ -177,7 +175,7 @@ def results(event, production, file, hash=None):
         for production_o in event.productions
         if production_o.name == production
     ][0]
-    store = Store(root=config.get("storage", "directory"))
+    store = Store.get(config.get("storage", "directory"))
 
     if not file:
         try:
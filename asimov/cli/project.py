@@ -14,7 +14,7 @@ import getpass
 import click
 
 from asimov import config, storage, logger, LOGGER_LEVEL
-from asimov.ledger import Ledger
+from asimov.ledger import DatabaseLedger, Ledger, YAMLDirectoryLedger, YAMLLedger
 
 logger = logger.getChild("cli").getChild("project")
 logger.setLevel(LOGGER_LEVEL)
@@ -189,18 +189,29 @@ def clone(location):
     config.set("storage", "results_store", results)
 
     # Make the ledger
-    if config.get("ledger", "engine") == "yamlfile":
-        shutil.copyfile(
-            os.path.join(location, config.get("ledger", "location")),
-            os.path.join(".asimov", "ledger.yml"),
-        )
-    elif config.get("ledger", "engine") == "gitlab":
+    engine = config.get("ledger", "engine")
+    source = os.path.join(location, config.get("ledger", "location"))
+    if engine == "yamlfile":
+        ledger = YAMLLedger.default_location
+        shutil.copyfile(source, ledger)
+    elif engine == "yamldirectory":
+        ledger = YAMLDirectoryLedger.default_location
+        shutil.copytree(source, ledger)
+    elif engine == "sqlite":
+        ledger = DatabaseLedger.default_location
+        shutil.copyfile(source, ledger)
+    elif engine == "gitlab":
         raise NotImplementedError(
             "The gitlab interface has been removed from this version of asimov."
         )
+    else:
+        raise NotImplementedError(f"Projects with a {engine} ledger can't be cloned.")
 
-    config.set("ledger", "engine", "yamlfile")
-    config.set("ledger", "location", os.path.join(".asimov", "ledger.yml"))
+    config.set("ledger", "location", ledger)
 
     with open(os.path.join(".asimov", "asimov.conf"), "w") as config_file:
         config.write(config_file)
+
+    click.echo(
+        "The event repositories can be cloned together with `asimov event sync`."
+    )
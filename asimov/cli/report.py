@@ -7,13 +7,12 @@ import os
 
 import click
 import pytz
-import yaml
 from pkg_resources import resource_filename
 
 import otter
 import otter.bootstrap as bt
 
-from asimov import config, current_ledger
+from asimov import config, current_ledger, serialisation
 
 tz = pytz.timezone("Europe/London")
 
@@ -200,10 +199,10 @@ def ledger(event, yaml_f):
     """
     total = []
     for event in current_ledger.get_event(event):
-        total.append(yaml.safe_load(event.to_yaml()))
+        total.append(serialisation.load(event.to_yaml()))
 
-    click.echo(yaml.dump(total))
+    click.echo(serialisation.dump(total))
 
     if yaml_f:
         with open(yaml_f, "w") as f:
-            f.write(yaml.dump(total))
+            f.write(serialisation.dump(total))
@@ -6,13 +6,17 @@ An important function of asimov is interaction with condor schedulers in order t
 In order to improve performance the code caches results from the query to the scheduler.
 
 """
+import configparser
 import os
 import datetime
+import queue
+import threading
+import time
 from dateutil import tz
 import htcondor
 import yaml
 
-from asimov import config, logger, LOGGER_LEVEL
+from asimov import config, logger, serialisation, LOGGER_LEVEL
 
 UTC = tz.tzutc()
 
@@ -39,6 +43,181 @@ def datetime_from_epoch(dt, tzinfo=UTC):
     return datetime.datetime.utcfromtimestamp(dt).replace(tzinfo=tzinfo)
 
 
+class SchedulerConnection:
+    """
+    Find the condor schedulers, and remember them so that the collector
+    doesn't need to be asked again every time a job is submitted or
+    queried.
+
+    The scheduler named by `condor>scheduler` in the configuration file
+    is always tried first, followed by the other schedulers in the pool.
+    The schedulers which have been found are remembered for
+    `condor>scheduler_ttl` seconds, or until one of them fails.
+
+    Parameters
+    ----------
+    ttl : float, optional
+       The number of seconds for which the schedulers are remembered.
+       Defaults to the value of `condor>scheduler_ttl` in the
+       configuration file.
+
+    Attributes
+    ----------
+    lookups : int
+       The number of times the collector has been asked for a scheduler.
+    avoided : int
+       The number of times a remembered scheduler was used instead of
+       asking the collector.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.lookups = 0
+        self.avoided = 0
+        self._found = {}
+        self._schedds = {}
+        self._lock = threading.RLock()
+
+    def forget(self):
+        """
+        Forget all of the schedulers which have been found.
+        """
+        with self._lock:
+            self._found = {}
+            self._schedds = {}
+
+    def _lookup(self, key, function):
+        ttl = self.ttl
+        if ttl is None:
+            ttl = config.getfloat("condor", "scheduler_ttl", fallback=900)
+        with self._lock:
+            if key in self._found:
+                found, value = self._found[key]
+                if time.monotonic() - found < ttl:
+                    self.avoided += 1
+                    return value
+            self.lookups += 1
+            value = function()
+            self._found[key] = (time.monotonic(), value)
+            return value
+
+    def preferred(self):
+        """
+        Find the scheduler named in the configuration file.
+
+        Returns
+        -------
+        classad
+           The classad for the scheduler.
+
+        Raises
+        ------
+        htcondor.HTCondorLocateError
+           If the scheduler can't be found.
+        """
+        name = config.get("condor", "scheduler")
+        return self._lookup(
+            ("scheduler", name),
+            lambda: htcondor.Collector().locate(htcondor.DaemonTypes.Schedd, name),
+        )
+
+    def pool(self):
+        """
+        Find all of the schedulers in the pool.
+
+        Returns
+        -------
+        list
+           The classads for the schedulers.
+        """
+        return self._lookup(
+            ("pool",),
+            lambda: list(htcondor.Collector().locateAll(htcondor.DaemonTypes.Schedd)),
+        )
+
+    def candidates(self):
+        """
+        Find the schedulers in the order in which they should be tried.
+
+        The pool is only searched if the preceding schedulers have been
+        rejected, so that a working preferred scheduler needs a single
+        lookup.
+
+        Yields
+        ------
+        classad
+           The classad for each scheduler.
+        """
+        name = None
+        try:
+            preferred = self.preferred()
+            name = preferred.get("Name")
+            yield preferred
+        except (
+            configparser.NoOptionError,
+            configparser.NoSectionError,
+            htcondor.HTCondorLocateError,
+        ):
+            logger.info("Searching for a scheduler of any kind")
+        for schedd_ad in self.pool():
+            if name is None or schedd_ad.get("Name") != name:
+                yield schedd_ad
+
+    def schedd(self, schedd_ad=None):
+        """
+        Get a handle for a scheduler, reusing the handle if one has
+        already been made.
+
+        Parameters
+        ----------
+        schedd_ad : classad, optional
+           The classad for the scheduler.
+           If this isn't given the local scheduler is used.
+        """
+        key = None if schedd_ad is None else schedd_ad.get("Name")
+        with self._lock:
+            if key not in self._schedds:
+                self._schedds[key] = (
+                    htcondor.Schedd()
+                    if schedd_ad is None
+                    else htcondor.Schedd(schedd_ad)
+                )
+            return self._schedds[key]
+
+    def run(self, action):
+        """
+        Run an action using the first scheduler which accepts it.
+
+        Parameters
+        ----------
+        action : callable
+           A function which is called with an `htcondor.Schedd`.
+
+        Returns
+        -------
+        object
+           The value returned by the action.
+        """
+        error = None
+        tried = False
+        for schedd_ad in self.candidates():
+            tried = True
+            try:
+                return action(self.schedd(schedd_ad))
+            except htcondor.HTCondorIOError as e:
+                logger.info(f"{schedd_ad.get('Name')} cannot receive jobs")
+                error = e
+                self.forget()
+        if not tried:
+            # If you can't find any scheduler, try the local one
+            return action(self.schedd())
+        raise error
+
+
+#: The connection to the schedulers which is shared by all of asimov.
+scheduler = SchedulerConnection()
+
+
 def submit_job(submit_description):
     """
     Submit a new job to the condor scheduller
@@ -46,100 +225,276 @@ def submit_job(submit_description):
 
     hostname_job = htcondor.Submit(submit_description)
 
-    try:
-        # There should really be a specified submit node, and if there is, use it.
-        schedulers = htcondor.Collector().locate(
-            htcondor.DaemonTypes.Schedd, config.get("condor", "scheduler")
-        )
-        schedd = htcondor.Schedd(schedulers)
-        logger.info(f"Found scheduler: {schedd}")
-    except:  # NoQA
-        # If you can't find a specified scheduler, try until it works
-        collectors = htcondor.Collector().locateAll(htcondor.DaemonTypes.Schedd)
-        logger.info("Searching for a scheduler of any kind")
-        for collector in collectors:
-            logger.info(f"Found {collector}")
-            schedd = htcondor.Schedd(collector)
-            try:
-                with schedd.transaction() as txn:
-                    cluster_id = hostname_job.queue(txn)
-                    break
-            except htcondor.HTCondorIOError:
-                logger.info(f"{collector} cannot receive jobs")
+    def queue(schedd):
+        with schedd.transaction() as txn:
+            return hostname_job.queue(txn)
 
+    cluster_id = scheduler.run(queue)
+    logger.info(f"Submitted job {cluster_id}")
     return cluster_id
 
 
 def delete_job(cluster_id):
-    try:
-        # There should really be a specified submit node, and if there is, use it.
-        schedulers = htcondor.Collector().locate(
-            htcondor.DaemonTypes.Schedd, config.get("condor", "scheduler")
+    scheduler.run(
+        lambda schedd: schedd.act(
+            htcondor.JobAction.Remove, f"ClusterId == {cluster_id}"
         )
-        schedd = htcondor.Schedd(schedulers)
-    except:  # NoQA
-        # If you can't find a specified scheduler, use the first one you find
-        schedd = htcondor.Schedd()
-    schedd.act(htcondor.JobAction.Remove, f"ClusterId == {cluster_id}")
+    )
 
 
-def collect_history(cluster_id):
+def is_queued(cluster_id):
+    """
+    Check whether a job is still in the queue.
+
+    Parameters
+    ----------
+    cluster_id : int
+       The cluster id of the job.
+
+    Returns
+    -------
+    bool
+    """
+    jobs = scheduler.run(
+        lambda schedd: list(
+            schedd.query(
+                constraint=f"ClusterId == {cluster_id}", projection=["ClusterId"]
+            )
+        )
+    )
+    return len(jobs) > 0
+
+
+#: The attributes which are collected from the history of a job.
+HISTORY_CLASSADS = [
+    "ClusterId",
+    "DAGManJobId",
+    "CompletionDate",
+    "CpusProvisioned",
+    "GpusProvisioned",
+    "CumulativeSuspensionTime",
+    "EnteredCurrentStatus",
+    "JobStartDate",
+    "MaxHosts",
+    "MemoryUsage",
+    "RemoteWallClockTime",
+    "RequestCpus",
+    "RequestGpus",
+]
+
+
+def _usage(job):
+    """
+    Find the resources used by a single finished job.
+    """
+    end = float(job.get("CompletionDate", 0)) or float(
+        job.get("EnteredCurrentStatus", 0)
+    )
+    # get cpus and gpus
+    try:
+        cpus = float(job["CpusProvisioned"])
+    except (KeyError, ValueError):
+        cpus = float(job.get("RequestCpus", 1))
+    try:
+        gpus = float(job["GpusProvisioned"])
+    except (KeyError, ValueError):
+        gpus = float(job.get("RequestGpus", 0))
+    # get total job time (seconds)
+    runtime = float(job.get("RemoteWallClockTime", 0)) - float(
+        job.get("CumulativeSuspensionTime", 0)
+    )
     try:
-        # There should really be a specified submit node, and if there is, use it.
-        schedulers = htcondor.Collector().locate(
-            htcondor.DaemonTypes.Schedd, config.get("condor", "scheduler")
+        memory = float(job["MemoryUsage"])
+    except (KeyError, ValueError):
+        memory = None
+    try:
+        start = float(job["JobStartDate"])
+    except (KeyError, ValueError):
+        start = None
+    return dict(
+        end=end, start=start, cpus=cpus, gpus=gpus, runtime=runtime, memory=memory
+    )
+
+
+def _summarise(jobs):
+    """
+    Add up the resources used by the jobs in a cluster or DAG.
+
+    Parameters
+    ----------
+    jobs : list
+       The history classads of the jobs.
+
+    Returns
+    -------
+    dict
+       The total resources used by the jobs.
+    """
+    usage = [_usage(job) for job in jobs]
+    end = max(job["end"] for job in usage)
+    output = {
+        "end": datetime_from_epoch(end).strftime("%Y-%m-%d"),
+        "jobs": len(usage),
+        "cpus": max(job["cpus"] for job in usage),
+        "gpus": max(job["gpus"] for job in usage),
+        "runtime": sum(job["runtime"] for job in usage),
+        "cpu hours": sum(job["cpus"] * job["runtime"] for job in usage) / 3600,
+        "gpu hours": sum(job["gpus"] * job["runtime"] for job in usage) / 3600,
+    }
+    starts = [job["start"] for job in usage if job["start"]]
+    if starts:
+        output["wall time"] = end - min(starts)
+    memory = [job["memory"] for job in usage if job["memory"] is not None]
+    if memory:
+        output["peak memory"] = max(memory)
+    return output
+
+
+def collect_histories(cluster_ids):
+    """
+    Collect the resources used by several finished jobs with a single
+    query to the scheduler.
+
+    If a job ran a DAG the resources used by all of the jobs in the DAG
+    are added together.
+
+    Parameters
+    ----------
+    cluster_ids : list
+       The cluster ids of the finished jobs.
+
+    Returns
+    -------
+    dict
+       The resources used by each job which was found in the history,
+       keyed by cluster id.
+       These include the total runtime of the jobs in seconds
+       (``runtime``), the total ``cpu hours`` and ``gpu hours``, the
+       time between the first job starting and the last job finishing
+       in seconds (``wall time``), and the largest amount of memory used
+       by any one job in megabytes (``peak memory``).
+    """
+    ids = _cluster_ids(cluster_ids)
+    if not ids:
+        return {}
+    jobs = scheduler.run(
+        lambda schedd: list(
+            schedd.history(_constraint(ids), projection=HISTORY_CLASSADS)
         )
-        schedd = htcondor.Schedd(schedulers)
-    except:  # NoQA
-        # If you can't find a specified scheduler, use the first one you find
-        collectors = htcondor.Collector().locateAll(htcondor.DaemonTypes.Schedd)
-        logger.info("Searching for a scheduler of any kind")
-        for collector in collectors:
-            logger.info(f"Found {collector}")
-            schedd = htcondor.Schedd(collector)
-            HISTORY_CLASSADS = [
-                    "CompletionDate",
-                    "CpusProvisioned",
-                    "GpusProvisioned",
-                    "CumulativeSuspensionTime",
-                    "EnteredCurrentStatus",
-                    "MaxHosts",
-                    "RemoteWallClockTime",
-                    "RequestCpus",
-                ]
-            try:
-                jobs = schedd.history(
-                    f"ClusterId == {cluster_id}", projection=HISTORY_CLASSADS
-                )
-                logger.info(f"Jobs found: {jobs}")
-                break
-            except htcondor.HTCondorIOError:
-                logger.info(f"{collector} cannot receive jobs")
-        if len(list(jobs)) == 0:
-            raise ValueError
-        output = {}
-        for job in jobs:
-            end = float(job["CompletionDate"]) or float(job["EnteredCurrentStatus"])
-            output["end"] = datetime_from_epoch(end).strftime("%Y-%m-%d")
-            # get cpus and gpus
-            try:
-                cpus = float(job["CpusProvisioned"])
-            except (KeyError, ValueError):
-                cpus = float(job.get("RequestCpus", 1))
-            try:
-                gpus = float(job["GpusProvisioned"])
-            except (KeyError, ValueError):
-                gpus = float(job.get("RequestGpus", 1))
-            output["cpus"] = cpus
-            output["gpus"] = gpus
-            # get total job time (seconds)
-            runtime = float(job["RemoteWallClockTime"]) - float(
-                job["CumulativeSuspensionTime"]
-            )
-            # if the job didn't get assigned a MATCH_GLIDEIN_Site,
-            # then it ran in the local pool
-            output["runtime"] = runtime
-        return output
+    )
+    logger.info(f"Found the history of {len(jobs)} jobs in {len(ids)} clusters")
+
+    clusters = {}
+    subjobs = {}
+    for job in jobs:
+        if job.get("DAGManJobId") is not None:
+            dag = int(float(job["DAGManJobId"]))
+            if dag in ids:
+                subjobs.setdefault(dag, []).append(job)
+                continue
+        cluster_id = int(float(job["ClusterId"]))
+        if cluster_id in ids:
+            clusters.setdefault(cluster_id, []).append(job)
+
+    # The DAG manager's own job isn't counted if the jobs it ran were found.
+    return {
+        cluster_id: _summarise(subjobs.get(cluster_id) or clusters[cluster_id])
+        for cluster_id in sorted(ids)
+        if cluster_id in subjobs or cluster_id in clusters
+    }
+
+
+def collect_history(cluster_id):
+    """
+    Collect the resources used by a single finished job.
+
+    See `collect_histories` for the resources which are returned.
+
+    Parameters
+    ----------
+    cluster_id : int
+       The cluster id of the job.
+
+    Raises
+    ------
+    ValueError
+       If the job can't be found in the history.
+    """
+    histories = collect_histories([cluster_id])
+    if not histories:
+        raise ValueError(f"Could not find the history of job {cluster_id}")
+    return next(iter(histories.values()))
+
+
+#: The attributes which are collected for each job on a scheduler.
+JOB_CLASSADS = [
+    "ClusterId",
+    "Cmd",
+    "CurrentHosts",
+    "HoldReason",
+    "JobStatus",
+    "DAG_Status",
+    "JobBatchName",
+    "DAGManJobId",
+]
+
+
+def _cluster_ids(cluster_ids):
+    """
+    Convert a list of job ids to a set of cluster ids, skipping any which
+    are missing or aren't valid.
+    """
+    ids = set()
+    for cluster_id in cluster_ids:
+        try:
+            ids.add(int(float(cluster_id)))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def _constraint(cluster_ids):
+    """
+    Make a classad expression which selects a set of jobs, and the jobs
+    in any DAGs which they run.
+
+    Parameters
+    ----------
+    cluster_ids : set
+       The cluster ids of the jobs.
+
+    Returns
+    -------
+    str
+       The expression.
+    """
+    ids = ", ".join(str(cluster_id) for cluster_id in sorted(cluster_ids))
+    return f"member(ClusterId, {{{ids}}}) || member(DAGManJobId, {{{ids}}})"
+
+
+def _query_schedd(schedd_ad, constraint=None):
+    """
+    Find the current user's jobs on a single scheduler.
+
+    Parameters
+    ----------
+    schedd_ad : classad
+       The classad for the scheduler.
+    constraint : str, optional
+       A classad expression which the jobs must satisfy.
+       By default all of the user's jobs are returned.
+
+    Returns
+    -------
+    list
+       The classads for the jobs.
+    """
+    schedd = scheduler.schedd(schedd_ad)
+    return schedd.query(
+        constraint=constraint or "true",
+        opts=htcondor.QueryOpts.DefaultMyJobsOnly,
+        projection=JOB_CLASSADS,
+    )
 
 
 class CondorJob(yaml.YAMLObject):
@@ -147,7 +502,8 @@ class CondorJob(yaml.YAMLObject):
     Represent a specific condor Job.
     """
 
-    yaml_loader = yaml.SafeLoader
+    yaml_loader = [yaml.SafeLoader, serialisation.SafeLoader]
+    yaml_dumper = serialisation.Dumper
     yaml_tag = "!CondorJob"
 
     def __init__(self, idno, command, hosts, status, **kwargs):
@@ -271,85 +627,292 @@ class CondorJobList:
 
     The list is automatically pulled from the condor scheduller if it is
     more than 15 minutes old (by default)
+
+    Parameters
+    ----------
+    cluster_ids : list, optional
+       The cluster ids of the jobs which should be tracked, for example
+       the job ids of the productions in the ledger.
+       If these are given the schedulers are only asked for these jobs
+       (and the jobs in their DAGs), rather than for every job which the
+       user owns.
+       The jobs are merged into the cached list without changing its
+       age, so that the other jobs in the cache are kept until the next
+       full refresh.
     """
 
-    def __init__(self):
+    def __init__(self, cluster_ids=None):
         self.jobs = {}
+        self.stats = {}
+        self._lock = threading.RLock()
+        self.cluster_ids = None if cluster_ids is None else _cluster_ids(cluster_ids)
         cache = os.path.join(".asimov", "_cache_jobs.yaml")
-        if not os.path.exists(cache):
-            self.refresh()
-        else:
+        fresh = False
+        if os.path.exists(cache):
             age = -os.stat(cache).st_mtime + datetime.datetime.now().timestamp()
             logger.info(f"Condor cache is {age} seconds old")
-            if float(age) < float(config.get("condor", "cache_time")):
+            fresh = float(age) < float(config.get("condor", "cache_time"))
+            if fresh or self.cluster_ids is not None:
                 with open(cache, "r") as f:
-                    self.jobs = yaml.safe_load(f)
-            else:
+                    self.jobs = serialisation.load(f) or {}
+
+        if self.cluster_ids is None:
+            if not fresh:
                 self.refresh()
+        else:
+            # Only the tracked jobs are requested, and they are merged
+            # into the cached list, so that the other jobs in it are kept.
+            # Jobs which have been submitted since a fresh cache was
+            # written won't be in it yet.
+            missing = (
+                self.cluster_ids if not fresh else self.cluster_ids - set(self.jobs)
+            )
+            if missing:
+                self.refresh(cluster_ids=missing)
 
-    def refresh(self):
+    def refresh(self, scheduler_only=None, cluster_ids=None):
         """
         Poll the schedulers to get the list of running jobs and update the database.
+
+        The schedulers are queried concurrently, and a scheduler which
+        fails or does not respond within the timeout set by
+        `condor>query_timeout` in the configuration file is skipped.
+        The time taken to query each scheduler, and any error, is recorded
+        in the `stats` attribute.
+
+        Parameters
+        ----------
+        scheduler_only : bool, optional
+           If true only the scheduler set by `condor>scheduler` in the
+           configuration file is queried, rather than every scheduler in
+           the pool.
+           Defaults to the value of `condor>scheduler_only` in the
+           configuration file, or False if this is not set.
+        cluster_ids : list, optional
+           The cluster ids of specific jobs to update.
+           If these are given only these jobs are queried, and the
+           results are merged into the existing list without changing
+           the age of the cache.
+           Otherwise all of the tracked jobs are queried and the list is
+           replaced.
         """
-        data = []
+        targeted = cluster_ids is not None
+        ids = _cluster_ids(cluster_ids) if targeted else self.cluster_ids
+        if targeted and not ids:
+            return
 
-        logger.info("Updating the condor cache")
+        if ids is not None and not ids:
+            data = []
+        else:
+            if targeted:
+                logger.info(f"Updating the condor cache for {len(ids)} jobs")
+            else:
+                logger.info("Updating the condor cache")
+            data = self._query_schedulers(
+                self._locate(scheduler_only),
+                constraint=None if ids is None else _constraint(ids),
+                timeout=config.getfloat("condor", "query_timeout", fallback=60),
+                threads=config.getint("condor", "query_threads", fallback=8),
+            )
+
+        jobs = self._build(data)
+        # Jobs can be refreshed from several threads while monitoring.
+        with self._lock:
+            if targeted:
+                for idno in ids:
+                    self.jobs.pop(idno, None)
+                self.jobs.update(jobs)
+            else:
+                self.jobs = jobs
+
+            self._write_cache(keep_age=targeted)
+
+    def _locate(self, scheduler_only=None):
+        """
+        Find the classads for the schedulers which should be queried.
+        """
+        if scheduler_only is None:
+            scheduler_only = config.getboolean(
+                "condor", "scheduler_only", fallback=False
+            )
 
         try:
-            collectors = htcondor.Collector().locateAll(htcondor.DaemonTypes.Schedd)
+            if scheduler_only:
+                return [scheduler.preferred()]
+            else:
+                return scheduler.pool()
         except htcondor.HTCondorLocateError as e:
             logger.error("Could not find a valid condor scheduler")
             logger.exception(e)
             raise e
 
-        for schedd_ad in collectors:
-            try:
-                schedd = htcondor.Schedd(schedd_ad)
-                jobs = schedd.query(
-                    opts=htcondor.htcondor.QueryOpts.DefaultMyJobsOnly,
-                    projection=[
-                        "ClusterId",
-                        "Cmd",
-                        "CurrentHosts",
-                        "HoldReason",
-                        "JobStatus",
-                        "DAG_Status",
-                        "JobBatchName",
-                        "DAGManJobId",
-                    ],
+    @staticmethod
+    def _build(data):
+        """
+        Make the jobs from the classads returned by the schedulers,
+        attaching the jobs in a DAG to the job running the DAG.
+        """
+        retdat = []
+        for datum in data:
+            if "ClusterId" in datum:
+                job = dict(
+                    id=int(float(datum["ClusterId"])),
+                    command=datum["Cmd"],
+                    hosts=datum["CurrentHosts"],
+                    status=datum["JobStatus"],
                 )
-                data += jobs
-            except:  # NoQA
-                pass
-
-            retdat = []
-            for datum in data:
-                if "ClusterId" in datum:
-                    job = dict(
-                        id=int(float(datum["ClusterId"])),
-                        command=datum["Cmd"],
-                        hosts=datum["CurrentHosts"],
-                        status=datum["JobStatus"],
-                    )
-                    if "HoldReason" in datum:
-                        job["hold"] = datum["HoldReason"]
-                    if "JobBatchName" in datum:
-                        job["name"] = datum["JobBatchName"]
-                    if "DAG_Status" not in datum and "DAGManJobID" in datum:
-                        job["dag id"] = int(float(datum["DAGManJobId"]))
+                if "HoldReason" in datum:
+                    job["hold"] = datum["HoldReason"]
+                if "JobBatchName" in datum:
+                    job["name"] = datum["JobBatchName"]
+                if "DAG_Status" not in datum and "DAGManJobId" in datum:
+                    job["dag id"] = int(float(datum["DAGManJobId"]))
 
                 retdat.append(CondorJob.from_dict(job))
 
+        jobs = {}
         for datum in retdat:
             if not datum.dag:
-                self.jobs[datum.idno] = datum
+                jobs[datum.idno] = datum
                 # # Now search for subjobs
         for datum in retdat:
             if datum.dag:
-                if datum.dag in self.jobs:
-                    self.jobs[datum.dag].add_subjob(datum)
+                if datum.dag in jobs:
+                    jobs[datum.dag].add_subjob(datum)
                 else:
-                    self.jobs[datum.idno] = datum.to_dict()
+                    jobs[datum.idno] = datum.to_dict()
+        return jobs
+
+    def _write_cache(self, keep_age=False):
+        """
+        Write the job list to the cache file.
+
+        Parameters
+        ----------
+        keep_age : bool
+           If true the modification time of an existing cache file is
+           kept, so that updating a few jobs doesn't delay the next full
+           refresh.
+           A new cache file is given the oldest possible modification
+           time, because it only holds the jobs which were updated.
+        """
+        cache = os.path.join(".asimov", "_cache_jobs.yaml")
+        times = None
+        if keep_age:
+            if os.path.exists(cache):
+                stat = os.stat(cache)
+                times = (stat.st_atime_ns, stat.st_mtime_ns)
+            else:
+                times = (0, 0)
+        with open(cache, "w") as f:
+            f.write(serialisation.dump(self.jobs))
+        if times:
+            os.utime(cache, ns=times)
+
+    def _query_schedulers(self, schedd_ads, timeout, threads, constraint=None):
+        """
+        Query a number of schedulers concurrently.
 
-        with open(os.path.join(".asimov", "_cache_jobs.yaml"), "w") as f:
-            f.write(yaml.dump(self.jobs))
+        Parameters
+        ----------
+        schedd_ads : list
+           The classads for the schedulers.
+        timeout : float
+           The number of seconds to wait for each scheduler to respond.
+        threads : int
+           The maximum number of schedulers to query at once.
+        constraint : str, optional
+           A classad expression which the jobs must satisfy.
+
+        Returns
+        -------
+        list
+           The classads for the jobs on all of the schedulers which
+           responded, in the order that the schedulers were given.
+        """
+        schedd_ads = list(schedd_ads)
+        self.stats = {}
+        if not schedd_ads:
+            return []
+
+        # The queries are run on daemon threads, rather than in a thread
+        # pool, so that a scheduler which never responds can't stop the
+        # interpreter from exiting.
+        # A query which times out gives up its slot, so that the queries
+        # waiting behind it can still run.
+        started = {}
+        finished = set()
+        abandoned = set()
+        lock = threading.Lock()
+        slots = threading.Semaphore(max(1, min(threads, len(schedd_ads))))
+        responses = queue.Queue()
+
+        def query(name, schedd_ad):
+            slots.acquire()
+            started[name] = time.monotonic()
+            try:
+                jobs, error = list(_query_schedd(schedd_ad, constraint)), None
+            except Exception as exception:  # NoQA
+                jobs, error = None, exception
+            with lock:
+                finished.add(name)
+                if name not in abandoned:
+                    slots.release()
+            responses.put((name, jobs, time.monotonic() - started[name], error))
+
+        names = [
+            schedd_ad.get("Name", f"scheduler {number}")
+            for number, schedd_ad in enumerate(schedd_ads)
+        ]
+        results = {}
+        start = time.monotonic()
+        for name, schedd_ad in zip(names, schedd_ads):
+            threading.Thread(
+                target=query,
+                args=(name, schedd_ad),
+                name=f"asimov-scheduler-{name}",
+                daemon=True,
+            ).start()
+        pending = set(names)
+        while pending:
+            try:
+                name, jobs, latency, error = responses.get(timeout=min(timeout, 1))
+            except queue.Empty:
+                pass
+            else:
+                if name in pending:
+                    pending.discard(name)
+                    self.stats[name] = {
+                        "latency": latency,
+                        "jobs": len(jobs) if jobs is not None else 0,
+                        "error": None if error is None else str(error),
+                    }
+                    if error is None:
+                        results[name] = jobs
+                    else:
+                        logger.warning(f"Could not query the scheduler {name}: {error}")
+            now = time.monotonic()
+            with lock:
+                for name in list(pending):
+                    if (
+                        name in started
+                        and name not in finished
+                        and now - started[name] > timeout
+                    ):
+                        pending.discard(name)
+                        abandoned.add(name)
+                        slots.release()
+                        self.stats[name] = {
+                            "latency": now - started[name],
+                            "jobs": 0,
+                            "error": "timed out",
+                        }
+                        logger.warning(
+                            f"The scheduler {name} did not respond within {timeout}s"
+                        )
+
+        logger.info(
+            f"Queried {len(schedd_ads)} schedulers in {time.monotonic() - start:.1f}s, "
+            f"{len(schedd_ads) - len(results)} failed"
+        )
+        return [job for name in names for job in results.get(name, [])]
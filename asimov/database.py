@@ -15,10 +15,20 @@ Initially the implementation is designed to use TinyDB but that's
 just because I want something I can work with easily on a laptop.
 MongoDB would be a better long-term solution.
 
+The SQLite database stores the ledger in a single file using the
+sqlite3 module from the standard library, so no database service is
+required.
+Each event is stored as a YAML document, and the status, pipeline,
+review status, and job id of each production are stored in an indexed
+table so that productions can be found without reading every event.
+
 """
+import sqlite3
+
 from tinydb import Query, TinyDB
 
-from asimov import config
+from asimov import config, serialisation
+from asimov.query import ALIASES, Not, normalise
 
 
 class AsimovDatabase:
@@ -59,3 +69,298 @@ class AsimovTinyDatabase(AsimovDatabase):
     def query(self, table, parameter, value):
         pages = self.tables[table].search(Query()[parameter] == value)
         return pages
+
+
+#: The columns of the production table, and the ledger properties which
+#: they store.
+PRODUCTION_COLUMNS = {
+    "event": "event",
+    "status": "status",
+    "pipeline": "pipeline",
+    "review status": "review_status",
+    "job id": "job_id",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS project (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS productions (
+    event TEXT NOT NULL REFERENCES events(name) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT,
+    pipeline TEXT,
+    review_status TEXT,
+    job_id,
+    PRIMARY KEY (event, name)
+);
+CREATE INDEX IF NOT EXISTS events_position ON events(position);
+CREATE INDEX IF NOT EXISTS productions_status ON productions(status);
+CREATE INDEX IF NOT EXISTS productions_pipeline ON productions(pipeline);
+CREATE INDEX IF NOT EXISTS productions_review ON productions(review_status);
+CREATE INDEX IF NOT EXISTS productions_job ON productions(job_id);
+"""
+
+
+def _production_rows(document):
+    """
+    Extract the indexed properties of each production in an event.
+
+    Parameters
+    ----------
+    document : dict
+       The event, as stored in the ledger.
+
+    Returns
+    -------
+    list
+       A tuple for each production, containing the values for each column
+       of the production table.
+    """
+    rows = []
+    for position, production in enumerate(document.get("productions") or []):
+        (name, data), *_ = production.items()
+        data = data or {}
+        review_status = None
+        messages = sorted(
+            data.get("review") or [], key=lambda message: str(message.get("timestamp"))
+        )
+        for message in messages:
+            if message.get("status"):
+                review_status = message["status"].upper()
+        rows.append(
+            (
+                document["name"],
+                name,
+                position,
+                (data.get("status") or "none").lower(),
+                str(data.get("pipeline", "")).lower(),
+                review_status,
+                data.get("job id"),
+            )
+        )
+    return rows
+
+
+def _condition(column, parameter, condition):
+    """
+    Convert a filter on an indexed property to an SQL expression.
+
+    Returns
+    -------
+    tuple
+       The SQL expression and its parameters.
+    """
+    if isinstance(condition, Not):
+        clause, values = _condition(column, parameter, condition.value)
+        return f"NOT ({clause})", values
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        if not condition:
+            return "0", []
+        clauses, values = [], []
+        for option in condition:
+            clause, option_values = _condition(column, parameter, option)
+            clauses.append(clause)
+            values += option_values
+        return "(" + " OR ".join(clauses) + ")", values
+    return f"p.{column} IS ?", [normalise(parameter, condition)]
+
+
+class AsimovSQLiteDatabase(AsimovDatabase):
+    """
+    A ledger database stored in an SQLite file.
+
+    Changes are made inside a transaction, which is only written to the
+    file when `commit` is called.
+
+    Parameters
+    ----------
+    location : str, optional
+       The path to the database file.
+       Defaults to the value of `ledger>location` in the configuration file.
+    """
+
+    def __init__(self, location=None):
+        if not location:
+            location = config.get("ledger", "location")
+        self.location = location
+        # The connection may be shared between threads by the monitor, which
+        # makes sure that only one thread uses it at a time.
+        self.connection = sqlite3.connect(location, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def _create(cls, location=None):
+        return cls(location)
+
+    def commit(self):
+        """
+        Write all of the changes made since the last commit.
+        """
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def get_project(self):
+        """
+        Return the project-level data.
+        """
+        return {
+            key: serialisation.load(value)
+            for key, value in self.connection.execute("SELECT key, value FROM project")
+        }
+
+    def set_project(self, data):
+        """
+        Replace the project-level data.
+
+        Parameters
+        ----------
+        data : dict
+           The project data, which should not include any events.
+        """
+        self.connection.execute("DELETE FROM project")
+        self.connection.executemany(
+            "INSERT INTO project (key, value) VALUES (?, ?)",
+            [(key, serialisation.dump(value)) for key, value in data.items()],
+        )
+
+    def event_names(self):
+        """
+        Return the names of all of the events, in the order they were added.
+        """
+        return [
+            name
+            for (name,) in self.connection.execute(
+                "SELECT name FROM events ORDER BY position"
+            )
+        ]
+
+    def count_events(self):
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM events").fetchone()
+        return count
+
+    def get_event(self, name):
+        """
+        Return a single event.
+
+        Parameters
+        ----------
+        name : str
+           The name of the event.
+
+        Returns
+        -------
+        dict or None
+           The event, or None if there is no event with this name.
+        """
+        row = self.connection.execute(
+            "SELECT document FROM events WHERE name = ?", (name,)
+        ).fetchone()
+        return serialisation.load(row[0]) if row else None
+
+    def get_events(self):
+        """
+        Return all of the events, in the order they were added.
+        """
+        return [
+            serialisation.load(document)
+            for (document,) in self.connection.execute(
+                "SELECT document FROM events ORDER BY position"
+            )
+        ]
+
+    def put_events(self, documents):
+        """
+        Add or replace a number of events, and index their productions.
+
+        Parameters
+        ----------
+        documents : list
+           The events, each as a dictionary.
+        """
+        documents = list(documents)
+        rows = [
+            (document["name"], serialisation.dump(document)) for document in documents
+        ]
+        # Existing events are updated in place so that they keep their
+        # position, and then new events are added.
+        # This avoids INSERT ... ON CONFLICT, which older versions of
+        # SQLite don't support.
+        self.connection.executemany(
+            "UPDATE events SET document = ? WHERE name = ?",
+            [(document, name) for name, document in rows],
+        )
+        self.connection.executemany(
+            """
+            INSERT OR IGNORE INTO events (name, position, document)
+            VALUES (?, (SELECT IFNULL(MAX(position), -1) + 1 FROM events), ?)
+            """,
+            rows,
+        )
+        self.connection.executemany(
+            "DELETE FROM productions WHERE event = ?",
+            [(document["name"],) for document in documents],
+        )
+        self.connection.executemany(
+            "INSERT INTO productions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [row for document in documents for row in _production_rows(document)],
+        )
+
+    def delete_event(self, name):
+        """
+        Remove an event and its productions.
+        """
+        self.connection.execute("DELETE FROM events WHERE name = ?", (name,))
+
+    def find_productions(self, event=None, filters=None):
+        """
+        Find productions using their indexed properties.
+
+        Parameters
+        ----------
+        event : str, optional
+           The name of an event to restrict the search to.
+        filters : dict, optional
+           Filters on the indexed properties, as described in
+           `asimov.query`.
+           Filters on any other properties are ignored.
+
+        Returns
+        -------
+        list
+           A tuple of the event name and production name for each
+           matching production, in ledger order.
+        """
+        clauses, values = [], []
+        if event:
+            clauses.append("p.event = ?")
+            values.append(event)
+        for parameter, condition in (filters or {}).items():
+            parameter = ALIASES.get(parameter, parameter)
+            if parameter not in PRODUCTION_COLUMNS:
+                continue
+            clause, condition_values = _condition(
+                PRODUCTION_COLUMNS[parameter], parameter, condition
+            )
+            clauses.append(clause)
+            values += condition_values
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.connection.execute(
+            f"""
+            SELECT p.event, p.name FROM productions AS p
+            JOIN events AS e ON e.name = p.event
+            {where}
+            ORDER BY e.position, p.position
+            """,
+            values,
+        ).fetchall()
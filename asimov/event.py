@@ -10,16 +10,15 @@ import configparser
 import subprocess
 
 import networkx as nx
-import yaml
 from ligo.gracedb.rest import GraceDb, HTTPError
 from liquid import Liquid
 
-from asimov import config, logger, LOGGER_LEVEL
+from asimov import config, logger, serialisation, LOGGER_LEVEL
 from asimov.pipelines import known_pipelines
 from asimov.storage import Store
-from asimov.utils import update, diff_dict
+from asimov.utils import LayeredDict, update, diff_dict
 
-from .git import EventRepo
+from .git import EventRepo, is_remote
 from .ini import RunConfiguration
 from .review import Review
 
@@ -120,7 +119,7 @@ class Event:
             self.ledger = None
 
         if repository:
-            if "git@" in repository or "https://" in repository:
+            if is_remote(repository):
                 self.repository = EventRepo.from_url(
                     repository, self.name, directory=None, update=update
                 )
@@ -150,33 +149,11 @@ class Event:
         else:
             self.issue_object = None
 
-        self.productions = []
-        self.graph = nx.DiGraph()
-
-        if "productions" in kwargs:
-            for production in kwargs["productions"]:
-                try:
-                    self.add_production(
-                        Production.from_dict(
-                            production, event=self, issue=self.issue_object
-                        )
-                    )
-                except DescriptionException as error:
-                    error.submit_comment()
-
-        self.productions = []
-        self.graph = nx.DiGraph()
-
-        if "productions" in kwargs:
-            for production in kwargs["productions"]:
-                try:
-                    self.add_production(
-                        Production.from_dict(
-                            production, event=self, issue=self.issue_object
-                        )
-                    )
-                except DescriptionException as error:
-                    error.submit_comment()
+        # Productions are only constructed from the ledger data when they
+        # are first needed; see `Event.productions`.
+        self._production_data = kwargs.get("productions", None) or []
+        self._productions = None
+        self._graph = None
 
         self._check_required()
 
@@ -245,6 +222,51 @@ class Event:
                 f"{set(self.meta['interferometers']) - set(self.meta['calibration'].keys())}"
             )
 
+    @property
+    def productions(self):
+        """
+        The productions (analyses) for this event.
+
+        The production objects are constructed the first time that
+        they are requested, rather than when the event is loaded.
+        """
+        if self._productions is None:
+            self._load_productions()
+        return self._productions
+
+    @productions.setter
+    def productions(self, value):
+        self._productions = value
+
+    @property
+    def graph(self):
+        """
+        The dependency graph of the productions for this event.
+        """
+        if self._graph is None:
+            self._load_productions()
+        return self._graph
+
+    @graph.setter
+    def graph(self, value):
+        self._graph = value
+
+    def _load_productions(self):
+        """
+        Construct the production objects from the stored production data.
+        """
+        self._productions = []
+        self._graph = nx.DiGraph()
+        for production in self._production_data:
+            try:
+                self.add_production(
+                    Production.from_dict(
+                        production, event=self, issue=self.issue_object
+                    )
+                )
+            except DescriptionException as error:
+                error.submit_comment()
+
     @property
     def webdir(self):
         """
@@ -313,7 +335,7 @@ class Event:
         Event
            An event.
         """
-        data = yaml.safe_load(data)
+        data = serialisation.load(data)
         if "kind" in data:
             data.pop("kind")
         if (
@@ -487,7 +509,7 @@ class Event:
         """Serialise this object as yaml"""
         data = self.to_dict()
 
-        return yaml.dump(data, default_flow_style=False)
+        return serialisation.dump(data, default_flow_style=False)
 
     def to_issue(self):
         self.text[1] = "\n" + self.to_yaml()
@@ -594,26 +616,15 @@ class Production:
             self.status_str = "none"
         self.comment = comment
 
-        # Start by adding pipeline defaults
-        if "pipelines" in self.event.ledger.data:
-            if pipeline in self.event.ledger.data["pipelines"]:
-                self.meta = deepcopy(self.event.ledger.data["pipelines"][pipeline])
-            else:
-                self.meta = {}
-        else:
-            self.meta = {}
-
-        if "postprocessing" in self.event.ledger.data:
-            self.meta["postprocessing"] = deepcopy(
-                self.event.ledger.data["postprocessing"]
-            )
-
-        # Update with the event and project defaults
+        # Layer the production settings over the pipeline defaults and
+        # the event and project defaults, which are shared between all
+        # of the productions rather than being copied for each one.
         if "ledger" in self.event.meta:
             self.event.meta.pop("ledger")
-        self.meta = update(self.meta, deepcopy(self.event.meta))
+        self.meta = LayeredDict(*self._default_layers(pipeline), self.event.meta)
         if "productions" in self.meta:
-            self.meta.pop("productions")
+            # Unlike pop, this doesn't copy the event's productions.
+            del self.meta["productions"]
 
         self.meta = update(self.meta, kwargs)
 
@@ -733,6 +744,24 @@ class Production:
                     "amplitude order"
                 ]
 
+    def _default_layers(self, pipeline):
+        """
+        Return the pipeline defaults and project postprocessing settings
+        for this production, which are used as the lowest layers of its
+        metadata.
+        """
+        data = self.event.ledger.data
+        layers = []
+        if pipeline in data.get("pipelines", {}):
+            layers.append(LayeredDict(data["pipelines"][pipeline]))
+        if "postprocessing" in data:
+            # The project postprocessing settings replace any from the
+            # pipeline defaults, rather than being combined with them.
+            if layers and "postprocessing" in layers[0]:
+                del layers[0]["postprocessing"]
+            layers.append({"postprocessing": data["postprocessing"]})
+        return layers
+
     def __hash__(self):
         return int(f"{hash(self.name)}{abs(hash(self.event.name))}")
 
@@ -753,7 +782,7 @@ class Production:
             return None
 
     def results(self, filename=None, handle=False, hash=None):
-        store = Store(root=config.get("storage", "results_store"))
+        store = Store.get(config.get("storage", "results_store"))
         if not filename:
             try:
                 items = store.manifest.list_resources(self.event.name, self.name)
@@ -872,22 +901,11 @@ class Production:
         dictionary["job id"] = self.job_id
 
         # Remove duplicates of pipeline defaults
-        if self.pipeline.name.lower() in self.event.ledger.data["pipelines"]:
-            defaults = deepcopy(
-                self.event.ledger.data["pipelines"][self.pipeline.name.lower()]
-            )
-        else:
-            defaults = {}
-
-        if "postprocessing" in self.event.ledger.data:
-            defaults["postprocessing"] = deepcopy(
-                self.event.ledger.data["postprocessing"]
-            )
-
         if "ledger" in self.event.meta:
             self.event.meta.pop("ledger")
-
-        defaults = update(defaults, deepcopy(self.event.meta))
+        defaults = LayeredDict(
+            *self._default_layers(self.pipeline.name.lower()), self.event.meta
+        )
 
         dictionary = diff_dict(defaults, dictionary)
 
@@ -982,6 +1000,7 @@ class Production:
             files = glob.glob(
                 f"{self.event.repository.directory}/{self.category}/psds/{sample_rate}/*.xml.gz"
             )
+            self.event.repository.fetch_lfs(*files)
             return files
 
     def get_timefile(self):
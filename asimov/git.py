@@ -3,14 +3,17 @@ import os
 import pathlib
 import shutil
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import git
 
 from copy import copy
 
 from asimov import config, logger
-from asimov.utils import set_directory
+from asimov.utils import set_directory, wait_until
 
 from .ini import RunConfiguration
 
@@ -19,6 +22,258 @@ class AsimovFileNotFound(FileNotFoundError):
     pass
 
 
+#: The first line of a git LFS pointer file.
+LFS_POINTER = b"version https://git-lfs.github.com/spec/v1"
+
+
+def is_lfs_pointer(path):
+    """
+    Check whether a file is a git LFS pointer whose contents haven't
+    been fetched yet.
+
+    Parameters
+    ----------
+    path : str
+       The path to the file.
+
+    Returns
+    -------
+    bool
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(LFS_POINTER)) == LFS_POINTER
+    except OSError:
+        return False
+
+
+class RepositoryUpdates:
+    """
+    Remember when each event repository was last pulled, so that it
+    isn't pulled again every time a file is looked up.
+
+    By default a repository is pulled at most once by each asimov
+    command.
+    If `git>update_interval` is set in the configuration file it is
+    pulled again once this many seconds have passed.
+
+    Attributes
+    ----------
+    force : bool
+       If true repositories are pulled every time they are updated.
+    pulls : int
+       The number of times a repository has been pulled.
+    avoided : int
+       The number of times a repository wasn't pulled because it had
+       been pulled recently.
+    """
+
+    def __init__(self):
+        self.force = False
+        self.pulls = 0
+        self.avoided = 0
+        self._updated = {}
+        self._lock = threading.Lock()
+
+    def needed(self, directory, force=False):
+        """
+        Check whether a repository needs to be pulled, and if so note
+        that it is being pulled now.
+
+        Parameters
+        ----------
+        directory : str
+           The directory containing the repository.
+        force : bool, optional
+           If true the repository is always pulled.
+
+        Returns
+        -------
+        bool
+        """
+        key = os.path.realpath(directory)
+        interval = config.getfloat("git", "update_interval", fallback=None)
+        with self._lock:
+            updated = self._updated.get(key)
+            fresh = updated is not None and (
+                interval is None or time.monotonic() - updated < interval
+            )
+            if fresh and not (force or self.force):
+                self.avoided += 1
+                return False
+            self._updated[key] = time.monotonic()
+            self.pulls += 1
+            return True
+
+    def record(self, directory):
+        """
+        Note that a repository has just been pulled or cloned.
+
+        Parameters
+        ----------
+        directory : str
+           The directory containing the repository.
+        """
+        with self._lock:
+            self._updated[os.path.realpath(directory)] = time.monotonic()
+
+    def forget(self, directory=None):
+        """
+        Forget when a repository, or every repository, was pulled.
+
+        Parameters
+        ----------
+        directory : str, optional
+           The directory containing the repository.
+           If this isn't given all of the repositories are forgotten.
+        """
+        with self._lock:
+            if directory is None:
+                self._updated = {}
+            else:
+                self._updated.pop(os.path.realpath(directory), None)
+
+
+#: The record of repository updates which is shared by all of asimov.
+updates = RepositoryUpdates()
+
+
+def push_repositories(repositories, threads=None):
+    """
+    Push several repositories at the same time.
+
+    Parameters
+    ----------
+    repositories : list
+       The `EventRepo` objects to push.
+    threads : int, optional
+       The largest number of repositories to push at once.
+       Defaults to the value of `git>push_threads` in the configuration
+       file, or 8.
+
+    Returns
+    -------
+    dict
+       The error raised when pushing each repository which couldn't be
+       pushed, keyed by the repository.
+    """
+    repositories = list(repositories)
+    if not repositories:
+        return {}
+    if threads is None:
+        threads = config.getint("git", "push_threads", fallback=8)
+
+    def push(repository):
+        try:
+            repository.push()
+        except git.exc.GitCommandError as error:
+            logger.error(f"Could not push {repository.directory}: {error}")
+            return error
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(threads, len(repositories)))
+    ) as pool:
+        errors = dict(zip(repositories, pool.map(push, repositories)))
+    return {repository: error for repository, error in errors.items() if error}
+
+
+def is_remote(url):
+    """
+    Check whether a repository location is a remote URL rather than a
+    directory.
+
+    Parameters
+    ----------
+    url : str
+       The location of the repository.
+
+    Returns
+    -------
+    bool
+    """
+    return "git@" in url or "https://" in url or url.startswith("file://")
+
+
+def checkout_directory(name):
+    """
+    Find the directory which an event's repository is cloned into.
+
+    Parameters
+    ----------
+    name : str
+       The name of the event.
+
+    Returns
+    -------
+    str
+    """
+    return f"{config.get('general', 'git_default')}/{name}"
+
+
+def sync_repositories(sources, threads=None):
+    """
+    Clone or update the repositories for several events at the same time.
+
+    Remote repositories are cloned into the `general>git_default`
+    directory, where `Event` will find them, or updated if they have
+    already been cloned there.
+    Repositories which are directories are updated in place.
+
+    Parameters
+    ----------
+    sources : dict
+       The location of each event's repository, keyed by the name of
+       the event.
+    threads : int, optional
+       The largest number of repositories to clone or update at once.
+       Defaults to the value of `git>sync_threads` in the configuration
+       file, or 8.
+
+    Returns
+    -------
+    dict
+       The names of the events whose repositories were ``cloned`` and
+       ``updated``, the errors for those which ``failed``, keyed by
+       event name, and the time ``elapsed`` in seconds.
+    """
+    if threads is None:
+        threads = config.getint("git", "sync_threads", fallback=8)
+
+    def sync(name, url):
+        if is_remote(url):
+            directory = checkout_directory(name)
+        else:
+            directory = url
+        try:
+            if os.path.exists(os.path.join(directory, ".git")):
+                EventRepo(directory, url).update(force=True)
+                return "updated", None
+            EventRepo.from_url(url, name, directory=directory)
+            updates.record(directory)
+            return "cloned", None
+        except Exception as error:
+            logger.error(f"Could not synchronise the repository for {name}: {error}")
+            return "failed", error
+
+    report = {"cloned": [], "updated": [], "failed": {}, "elapsed": 0}
+    start = time.monotonic()
+    if sources:
+        with ThreadPoolExecutor(max_workers=max(1, min(threads, len(sources)))) as pool:
+            outcomes = dict(zip(sources, pool.map(sync, *zip(*sources.items()))))
+        for name, (outcome, error) in outcomes.items():
+            if error:
+                report["failed"][name] = error
+            else:
+                report[outcome].append(name)
+    report["elapsed"] = time.monotonic() - start
+    logger.info(
+        f"Synchronised {len(sources)} repositories in {report['elapsed']:.1f}s: "
+        f"{len(report['cloned'])} cloned, {len(report['updated'])} updated, "
+        f"{len(report['failed'])} failed"
+    )
+    return report
+
+
 class EventRepo:
     """
     Read a git repository containing event PE information.
@@ -40,6 +295,9 @@ class EventRepo:
         self.update_needed = update
         self.repo = git.Repo(directory)
         self.url = url
+        self._batch_depth = 0
+        self._staged = []
+        self.unpushed = False
 
         self.logger = logger
 
@@ -71,11 +329,27 @@ class EventRepo:
         return cls(directory=location, url=location)
 
     @classmethod
-    def from_url(cls, url, name, directory=None, update=False):
+    def from_url(
+        cls,
+        url,
+        name,
+        directory=None,
+        update=False,
+        depth=None,
+        clone_filter=None,
+        sparse=None,
+        lazy_lfs=None,
+    ):
         """
         Clone a git repository into a working directory,
         then create an EventRepo object for it.
 
+        Event repositories can be very large, so the clone can be made
+        shallow, partial, or sparse, and LFS files can be left to be
+        fetched when they are first used.
+        Each of these defaults to the value in the `git` section of the
+        configuration file.
+
         Parameters
         ----------
         url : str
@@ -89,16 +363,39 @@ class EventRepo:
         update : bool
            Flag to determine if the repository is updated when loaded.
            Defaults to False.
+        depth : int, optional
+           The number of commits of history to clone.
+           Defaults to `git>clone_depth`, or the full history.
+        clone_filter : str, optional
+           A filter for a partial clone, for example ``blob:none``,
+           so that files are only downloaded when they are checked out.
+           Defaults to `git>clone_filter`, or no filter.
+        sparse : bool, optional
+           If true only the calibration category directory is checked
+           out.
+           Defaults to `git>sparse_checkout`, or False.
+        lazy_lfs : bool, optional
+           If true LFS files aren't downloaded when the repository is
+           cloned, but only when asimov reads them; see `fetch_lfs`.
+           Defaults to `git>lazy_lfs`, or False.
         """
         if not directory:
-            tmp = config.get("general", "git_default")
-            directory = f"{tmp}/{name}"
+            directory = checkout_directory(name)
 
             if os.path.exists(directory):
                 return cls(directory, url, update=update)
 
             pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
 
+        if depth is None:
+            depth = config.getint("git", "clone_depth", fallback=None)
+        if clone_filter is None:
+            clone_filter = config.get("git", "clone_filter", fallback=None)
+        if sparse is None:
+            sparse = config.getboolean("git", "sparse_checkout", fallback=False)
+        if lazy_lfs is None:
+            lazy_lfs = config.getboolean("git", "lazy_lfs", fallback=False)
+
         # Replace an https address with an ssh address
         if "https" in url:
             url = url.replace("https://", "git@")
@@ -107,11 +404,38 @@ class EventRepo:
 
             url = f"{start}:{final}"
 
+        options = {}
+        if depth:
+            options["depth"] = depth
+        if clone_filter:
+            options["filter"] = clone_filter
+        if sparse:
+            options["sparse"] = True
+        if options and os.path.isdir(url):
+            # Git ignores shallow and partial clones of local paths
+            url = pathlib.Path(url).resolve().as_uri()
+        environment = {"GIT_LFS_SKIP_SMUDGE": "1"} if lazy_lfs else {}
+
         try:
-            repo = git.Repo.clone_from(url, directory)
-            repo.git.execute(["git", "lfs", "install"])
-            repo.git.execute(["git", "lfs", "fetch"])
-            repo.git.execute(["git", "lfs", "pull"])
+            repo = git.Repo.clone_from(url, directory, env=environment, **options)
+            if sparse:
+                category = config.get("general", "calibration_directory")
+                with repo.git.custom_environment(**environment):
+                    repo.git.sparse_checkout("set", category)
+            if lazy_lfs:
+                repo.git.config("asimov.lazylfs", "true")
+                try:
+                    repo.git.execute(
+                        ["git", "lfs", "install", "--local", "--skip-smudge"]
+                    )
+                except git.exc.GitCommandError:
+                    logger.warning(
+                        f"git-lfs is not available, so LFS files in {name} can't be fetched"
+                    )
+            else:
+                repo.git.execute(["git", "lfs", "install"])
+                repo.git.execute(["git", "lfs", "fetch"])
+                repo.git.execute(["git", "lfs", "pull"])
         except git.exc.GitCommandError:
             repo = git.Repo(directory)
             try:
@@ -126,9 +450,111 @@ class EventRepo:
                 pass
         return cls(directory, url, update=update)
 
-    def add_file(self, source, destination, commit_message=None):
+    @property
+    def lazy_lfs(self):
         """
-        Add a new file to the repository.
+        Whether LFS files in this repository are only fetched when they
+        are used.
+        """
+        lazy = self.repo.git.config("--get", "asimov.lazylfs", with_exceptions=False)
+        return lazy == "true" or config.getboolean("git", "lazy_lfs", fallback=False)
+
+    def sparse_directories(self):
+        """
+        Find the directories which are checked out in a sparse checkout.
+
+        Returns
+        -------
+        list
+           The directories, relative to the root of the repository, or
+           None if the whole repository is checked out.
+        """
+        if (
+            self.repo.git.config("--get", "core.sparseCheckout", with_exceptions=False)
+            != "true"
+        ):
+            return None
+        return self.repo.git.sparse_checkout("list").splitlines()
+
+    def fetch_lfs(self, *paths):
+        """
+        Download the contents of LFS files which have only been checked
+        out as pointers.
+
+        Files which aren't LFS pointers are left alone, so this can be
+        called for every file which asimov reads from the repository.
+
+        Parameters
+        ----------
+        *paths : str
+           The paths to the files.
+
+        Returns
+        -------
+        list
+           The files which were fetched, relative to the root of the
+           repository.
+        """
+        root = os.path.abspath(self.directory)
+        pointers = [
+            os.path.relpath(os.path.abspath(path), root)
+            for path in paths
+            if is_lfs_pointer(path)
+        ]
+        if not pointers:
+            return []
+        try:
+            self.repo.git.execute(
+                ["git", "lfs", "pull", "--include", ",".join(pointers), "--exclude", ""]
+            )
+        except git.exc.GitCommandError as e:
+            logger.warning(f"Could not fetch {', '.join(pointers)} from LFS: {e}")
+            return []
+        return pointers
+
+    @contextmanager
+    def batch(self, push=True, commit_message=None):
+        """
+        Commit all of the files which are added to the repository inside
+        the context together, when the outermost batch finishes.
+
+        If the context raises an exception the files which were added are
+        still committed, but they aren't pushed.
+
+        Parameters
+        ----------
+        push : bool, optional
+           If false the commit isn't pushed, so that the pushes for
+           several repositories can be made together with
+           `push_repositories`.
+           Defaults to True.
+        commit_message : str, optional
+           The commit message.
+           Defaults to a description of the files which were added.
+
+        Examples
+        --------
+        >>> with event.repository.batch():
+        ...     event.repository.add_file("Prod0.ini", "C01_offline/Prod0.ini")
+        ...     event.repository.add_file("Prod1.ini", "C01_offline/Prod1.ini")
+        """
+        self._batch_depth += 1
+        committed = False
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            # The files which were added before an error are still
+            # committed, like the changes in `Ledger.batch`, so that they
+            # aren't committed later with an unrelated message.
+            if self._batch_depth == 0:
+                committed = self.commit_staged(commit_message)
+        if committed and push:
+            self.push()
+
+    def stage_file(self, source, destination):
+        """
+        Copy a file into the repository and stage it to be committed.
 
         Parameters
         ----------
@@ -138,12 +564,18 @@ class EventRepo:
            The location to which the file should be copied in
            the repository, relative to the root of the repository.
            Any directories which do not exist already will be created.
-        commit_message : str, optional
-           The commit message for the git commit.
-           Defaults to a description of the file addition.
         """
-
         destination_dir = os.path.dirname(destination)
+        sparse = self.sparse_directories()
+        if (
+            sparse is not None
+            and destination_dir
+            and not any(
+                f"{destination_dir}/".startswith(f"{directory}/")
+                for directory in sparse
+            )
+        ):
+            self.repo.git.sparse_checkout("add", destination_dir)
         destination_dir = os.path.join(self.directory, destination_dir)
         pathlib.Path(destination_dir).mkdir(parents=True, exist_ok=True)
 
@@ -154,24 +586,142 @@ class EventRepo:
         except shutil.SameFileError:
             pass
 
-        if not commit_message:
-            commit_message = f"Added {destination}"
-
         self.repo.git.add(destination)
+        if destination not in self._staged:
+            self._staged.append(destination)
+
+    def commit_staged(self, commit_message=None):
+        """
+        Commit all of the files which have been staged.
+
+        Parameters
+        ----------
+        commit_message : str, optional
+           The commit message for the git commit.
+           Defaults to a description of the files which were added.
+
+        Returns
+        -------
+        bool
+           True if a commit was made.
+        """
+        if not self._staged:
+            return False
+        if not commit_message:
+            commit_message = f"Added {', '.join(self._staged)}"
         self.repo.git.commit("-m", commit_message)
+        self._staged = []
+        self.unpushed = True
+        return True
+
+    def push(self):
+        """
+        Push the current branch to the remote repository, and wait until
+        the remote has the new commits.
+
+        Repositories which don't have a remote are skipped.
+
+        Returns
+        -------
+        bool
+           True if the remote was seen to have the new commits.
+           A push which succeeded but couldn't be confirmed, because
+           the remote couldn't be checked or didn't show the commits
+           before `git>push_timeout`, is logged as a warning rather than
+           raised as an error.
+        """
         try:
             self.repo.git.push()
-            time.sleep(15)
         except git.exc.GitCommandError as e:
             if "There is no tracking information for the current branch." in str(e):
-                pass
+                return False
             elif (
                 "Either specify the URL from the command-line or configure a remote repository using"
                 in str(e)
             ):
-                pass
+                return False
             else:
                 raise e
+        self.unpushed = False
+
+        try:
+            confirmed = self.wait_for_push()
+        except git.exc.GitCommandError as e:
+            logger.warning(
+                f"Pushed {self.directory}, but could not check the remote: {e}"
+            )
+            return False
+        if confirmed is False:
+            logger.warning(
+                f"Pushed {self.directory}, but the remote did not show the new commits in time"
+            )
+        return bool(confirmed)
+
+    def add_file(self, source, destination, commit_message=None):
+        """
+        Add a new file to the repository.
+
+        The file is committed and pushed straight away, unless this is
+        done inside `batch`, in which case it is committed with the other
+        files in the batch.
+
+        Parameters
+        ----------
+        source : str, file path
+           The path to the file to be added.
+        destination : str
+           The location to which the file should be copied in
+           the repository, relative to the root of the repository.
+           Any directories which do not exist already will be created.
+        commit_message : str, optional
+           The commit message for the git commit.
+           Defaults to a description of the file addition.
+        """
+        self.stage_file(source, destination)
+        if self._batch_depth > 0:
+            return
+
+        if not commit_message:
+            commit_message = f"Added {destination}"
+        self.commit_staged(commit_message)
+        self.push()
+
+    def wait_for_push(self, timeout=None):
+        """
+        Wait until the remote repository has the current commit.
+
+        Parameters
+        ----------
+        timeout : float, optional
+           The longest time to wait, in seconds.
+           Defaults to the value of `git>push_timeout` in the
+           configuration file, or 60 seconds.
+
+        Returns
+        -------
+        bool or None
+           True if the remote branch points at the current commit, False
+           if it didn't before the timeout, or None if the branch doesn't
+           have a remote branch.
+        """
+        try:
+            tracking = self.repo.active_branch.tracking_branch()
+        except TypeError:
+            # The repository has a detached head.
+            tracking = None
+        if tracking is None:
+            return None
+        if timeout is None:
+            timeout = config.getfloat("git", "push_timeout", fallback=60)
+        head = self.repo.head.commit.hexsha
+
+        def pushed():
+            refs = self.repo.git.ls_remote(
+                tracking.remote_name, f"refs/heads/{tracking.remote_head}"
+            )
+            return refs.split()[:1] == [head]
+
+        return wait_until(pushed, timeout, description=f"{self.event} to be pushed")
 
     def find_timefile(self, category=config.get("general", "calibration_directory")):
         """
@@ -181,17 +731,21 @@ class EventRepo:
         with set_directory(os.path.join(self.directory, category)):
             try:
                 gps_file = glob.glob("*gps*.txt")[0]
-                return gps_file
             except IndexError:
                 raise AsimovFileNotFound
+        self.fetch_lfs(os.path.join(self.directory, category, gps_file))
+        return gps_file
 
     def find_coincfile(self, category=config.get("general", "calibration_directory")):
         """
         Find the coinc file for this calibration category in this repository.
         """
-        coinc_file = glob.glob(os.path.join(os.getcwd(), self.directory, category, "*coinc*.xml"))
+        coinc_file = glob.glob(
+            os.path.join(os.getcwd(), self.directory, category, "*coinc*.xml")
+        )
 
         if len(coinc_file) > 0:
+            self.fetch_lfs(coinc_file[0])
             return coinc_file[0]
         else:
             raise AsimovFileNotFound
@@ -214,6 +768,7 @@ class EventRepo:
 
         self.update()
         path = f"{os.path.join(os.getcwd(), self.directory, category)}/{name}.ini"
+        self.fetch_lfs(path)
         return [path]
 
     def upload_prod(
@@ -340,17 +895,20 @@ class EventRepo:
             self.repo.git.add("Preferred/PESummary_metafile/posterior_samples.h5")
             self.repo.git.commit("-m", "Updated the preferred sample metafile.")
             self.repo.git.push()
-            time.sleep(15)
+            self.wait_for_push()
 
             event.labels += ["Preferred cleaned"]
             event.issue_object.save()
 
         return True
 
-    def update(self, stash=False, branch="master"):
+    def update(self, stash=False, branch="master", force=False):
         """
         Pull the latest updates to the repository.
 
+        The repository isn't pulled again if it has already been pulled
+        recently; see `RepositoryUpdates`.
+
         Parameters
         ----------
         stash : bool, optional
@@ -360,23 +918,41 @@ class EventRepo:
         branch : str, optional
            The branch which should be checked-out.
            Default is master.
+        force : bool, optional
+           If true the repository is pulled even if it was pulled
+           recently.
+           Default is False.
+
+        Returns
+        -------
+        bool
+           True if the repository was pulled.
         """
-        if stash:
-            self.repo.git.stash()
+        if not updates.needed(self.directory, force=force):
+            return False
 
-        self.repo.git.checkout(branch)
         try:
-            self.repo.git.pull()
-            self.repo.git.execute(["git", "lfs", "fetch"])
-        except git.exc.GitCommandError as e:
-            if "There is no tracking information for the current branch." in str(e):
-                pass
-            elif (
-                "Either specify the URL from the command-line or configure a remote repository using"
-                in str(e)
-            ):
-                pass
-            elif "Temporary failure in name resolution" in str(e):
-                logger.warning(f"Unable to update the repository for {self.event}")
-            else:
-                raise e
+            if stash:
+                self.repo.git.stash()
+
+            self.repo.git.checkout(branch)
+            try:
+                self.repo.git.pull()
+                if not self.lazy_lfs:
+                    self.repo.git.execute(["git", "lfs", "fetch"])
+            except git.exc.GitCommandError as e:
+                if "There is no tracking information for the current branch." in str(e):
+                    pass
+                elif (
+                    "Either specify the URL from the command-line or configure a remote repository using"
+                    in str(e)
+                ):
+                    pass
+                elif "Temporary failure in name resolution" in str(e):
+                    logger.warning(f"Unable to update the repository for {self.event}")
+                else:
+                    raise e
+        except Exception:
+            updates.forget(self.directory)
+            raise
+        return True
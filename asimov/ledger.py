@@ -1,19 +1,127 @@
 """
 Code for the project ledger.
 """
-import yaml
-
+import hashlib
 import os
+import pathlib
+import pickle
+import re
 import shutil
+import stat
+from collections import defaultdict
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from copy import deepcopy
 
 import asimov
 import asimov.database
-from asimov import config
-from asimov.event import Event, Production
+from asimov import config, logger, serialisation, LOGGER_LEVEL
+from asimov.event import Event
+from asimov.query import ProductionIndex, matches
 from asimov.utils import update, set_directory
 
+logger = logger.getChild("ledger")
+logger.setLevel(LOGGER_LEVEL)
+
+#: The version of the format used for the ledger snapshot cache.
+#: Changing this invalidates all existing snapshots.
+CACHE_FORMAT = 1
+
 
 class Ledger:
+    _batch_depth = 0
+
+    #: Attributes which hold objects built from the ledger data, or the
+    #: state of a batch of changes, which are reset rather than copied
+    #: when the ledger is copied.
+    _caches = {
+        "_event_cache": dict,
+        "_index": lambda: None,
+        "_stale_index": set,
+        "_batch_depth": lambda: 0,
+        "_unsaved": lambda: False,
+        "_unsaved_events": set,
+        "_unsaved_index": lambda: False,
+    }
+
+    def __deepcopy__(self, memo):
+        """
+        Copy the ledger, without copying the events which have been
+        constructed from it.
+
+        The events refer back to the ledger, so copying them is slow and
+        can fail part way through; the copy builds them again from its
+        own copy of the ledger data when they are requested.
+        The copy isn't part of any batch which the ledger is in, so its
+        changes are written when it is saved.
+        """
+        copied = self.__class__.__new__(self.__class__)
+        memo[id(self)] = copied
+        for name, value in vars(self).items():
+            if name in self._caches:
+                setattr(copied, name, self._caches[name]())
+            else:
+                setattr(copied, name, deepcopy(value, memo))
+        return copied
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer writing changes to the ledger until the end of the context.
+
+        Changes made to events inside the context are held in memory and
+        written together when the outermost batch finishes, including when
+        it finishes because of an exception.
+
+        Examples
+        --------
+        >>> with ledger.batch():
+        ...     for event in ledger.get_event():
+        ...         ledger.update_event(event)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush()
+
+    def _flush(self):
+        """
+        Write any changes which were deferred during a batch.
+        """
+        pass
+
+    def get_defaults(self):
+        """
+        Gather project-level defaults from the ledger.
+
+        At present data, quality, priors, and likelihood settings can all be set at a project level as defaults.
+        """
+        defaults = {}
+        if "data" in self.data:
+            defaults["data"] = self.data["data"]
+        if "priors" in self.data:
+            defaults["priors"] = self.data["priors"]
+        if "quality" in self.data:
+            defaults["quality"] = self.data["quality"]
+        if "likelihood" in self.data:
+            defaults["likelihood"] = self.data["likelihood"]
+        if "scheduler" in self.data:
+            defaults["scheduler"] = self.data["scheduler"]
+        return defaults
+
+    def _apply_defaults(self, event):
+        """
+        Combine the project defaults with the data for an event which has
+        just been read from the ledger.
+
+        Only the defaults are copied; the event data are updated in place,
+        since they are not shared with anything else.
+        """
+        return update(deepcopy(self.get_defaults()), event)
+
     @classmethod
     def create(cls, name=None, engine=None, location=None):
         """
@@ -26,8 +134,16 @@ class Ledger:
         if engine == "yamlfile":
             YAMLLedger.create(location=location, name=name)
 
+        elif engine == "yamldirectory":
+            YAMLDirectoryLedger.create(location=location, name=name)
+
+        elif engine == "sqlite":
+            DatabaseLedger.create(location=location, name=name)
+
         elif engine in {"tinydb", "mongodb"}:
-            DatabaseLedger.create()
+            raise NotImplementedError(
+                "Document databases are no longer supported; use the sqlite engine."
+            )
         elif engine == "gitlab":
             raise NotImplementedError(
                 "This hasn't been ported to the new interface yet. Stay tuned!"
@@ -40,28 +156,209 @@ class Ledger:
 
 
 class YAMLLedger(Ledger):
-    def __init__(self, location=None):
+    """
+    A ledger stored in a single YAML file.
+
+    Parameters
+    ----------
+    location : str, optional
+       The path to the ledger file.
+       Defaults to `.asimov/ledger.yml`.
+    lazy : bool, optional
+       If true the event and production objects are only constructed
+       when they are first requested from the ledger, rather than when
+       the ledger is loaded.
+       Defaults to the value of `ledger>lazy` in the configuration
+       file, or True if this is not set.
+    cache : bool, optional
+       If true a snapshot of the parsed ledger is kept alongside the
+       ledger file, and is used instead of re-reading the ledger while
+       the ledger file is unchanged.
+       Defaults to the value of `ledger>cache` in the configuration
+       file, or True if this is not set.
+    """
+
+    default_location = os.path.join(".asimov", "ledger.yml")
+    cache_name = "_cache_ledger.pickle"
+
+    def __init__(self, location=None, lazy=None, cache=None):
         if not location:
-            location = os.path.join(".asimov", "ledger.yml")
+            location = self.default_location
         self.location = location
-        with open(location, "r") as ledger_file:
-            self.data = yaml.safe_load(ledger_file)
+        if cache is None:
+            cache = config.getboolean("ledger", "cache", fallback=True)
+        self.cache = cache
+        self._read()
+        self._event_cache = {}
+        self._index = None
+        self._stale_index = set()
+        self._unsaved = False
+
+        if lazy is None:
+            lazy = config.getboolean("ledger", "lazy", fallback=True)
+        if not lazy:
+            for event in self.get_event():
+                event._load_productions()
+
+    def _read(self):
+        """
+        Read the project and event data from the ledger file, or from the
+        snapshot cache if the ledger file has not changed since the
+        snapshot was made.
+        """
+        if self.cache:
+            snapshot = self._read_cache()
+            if snapshot:
+                self.data = snapshot["data"]
+                self.events = snapshot["events"]
+                return
+
+        key = _file_key(self.location)
+        with open(self.location, "rb") as ledger_file:
+            contents = ledger_file.read()
+        key["hash"] = hashlib.sha256(contents).hexdigest()
+        self.data = serialisation.load(contents)
 
         self.data["events"] = [
-            update(self.get_defaults(), event, inplace=False)
-            for event in self.data["events"]
+            self._apply_defaults(event) for event in self.data["events"]
         ]
         self.events = {ev["name"]: ev for ev in self.data["events"]}
-        self._all_events = [
-            Event(**self.events[event], ledger=self)
-            for event in self.events.keys()
-            ]
         self.data.pop("events")
 
+        if self.cache:
+            self._write_cache(
+                {
+                    "format": CACHE_FORMAT,
+                    "version": asimov.__version__,
+                    "key": key,
+                    "data": self.data,
+                    "events": self.events,
+                }
+            )
+
+    @property
+    def cache_location(self):
+        """
+        The path to the snapshot cache for this ledger.
+        """
+        return os.path.join(os.path.dirname(self.location), self.cache_name)
+
+    def _read_cache(self):
+        """
+        Read the snapshot cache, if it is valid for the current ledger file.
+
+        The snapshot is valid if the ledger file has the same size and
+        modification time as when the snapshot was made.
+        If only the modification time has changed the contents of the
+        file are compared with the hash recorded in the snapshot.
+
+        Returns
+        -------
+        dict or None
+           The snapshot, or None if there is no valid snapshot.
+        """
+        try:
+            with open(self.cache_location, "rb") as cache_file:
+                if not _private(cache_file):
+                    logger.warning(
+                        "The ledger cache was not read, as it could have been "
+                        "changed by another user"
+                    )
+                    return None
+                snapshot = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            logger.warning(f"The ledger cache could not be read: {error}")
+            return None
+
+        if not isinstance(snapshot, dict) or (
+            snapshot.get("format"),
+            snapshot.get("version"),
+        ) != (CACHE_FORMAT, asimov.__version__):
+            return None
+
+        key = _file_key(self.location)
+        cached = snapshot["key"]
+        if key["size"] != cached["size"]:
+            return None
+        if (key["mtime"], key["inode"]) != (cached["mtime"], cached["inode"]):
+            if _file_hash(self.location) != cached["hash"]:
+                return None
+            # The file has been rewritten without changing, so the
+            # snapshot is updated to avoid hashing it next time.
+            cached.update(key)
+            self._write_cache(snapshot)
+        return snapshot
+
+    def _write_cache(self, snapshot):
+        """
+        Write a snapshot of the parsed ledger to the cache.
+
+        Failing to write the cache is not an error, since the ledger can
+        always be read from the ledger file.
+        Only the current user can write to the cache, as it is only read
+        if nobody else can have changed it.
+        """
+        try:
+            with open(self.cache_location + "_tmp", "wb") as cache_file:
+                mode = stat.S_IMODE(os.fstat(cache_file.fileno()).st_mode)
+                os.chmod(cache_file.name, mode & ~(stat.S_IWGRP | stat.S_IWOTH))
+                pickle.dump(snapshot, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.cache_location + "_tmp", self.cache_location)
+        except OSError as error:
+            logger.warning(f"The ledger cache could not be written: {error}")
+
+    def clear_cache(self):
+        """
+        Remove the snapshot cache for this ledger, if there is one.
+        """
+        try:
+            os.remove(self.cache_location)
+        except FileNotFoundError:
+            pass
+
+    def rebuild_cache(self):
+        """
+        Re-read the ledger file and replace the snapshot cache.
+        """
+        self.clear_cache()
+        cache, self.cache = self.cache, True
+        try:
+            self._read()
+        finally:
+            self.cache = cache
+        self._event_cache = {}
+        self._index = None
+
+    def cache_info(self):
+        """
+        Describe the snapshot cache for this ledger.
+
+        Returns
+        -------
+        dict
+           A dictionary containing the location of the cache, whether it
+           exists and is valid for the current ledger file, and, if it
+           exists, its size in bytes, the number of events it contains, and
+           the hash of the ledger file it was made from.
+        """
+        info = {"location": self.cache_location, "exists": False, "valid": False}
+        if not os.path.exists(self.cache_location):
+            return info
+        info["exists"] = True
+        info["size"] = os.path.getsize(self.cache_location)
+        snapshot = self._read_cache()
+        if snapshot:
+            info["valid"] = True
+            info["events"] = len(snapshot["events"])
+            info["hash"] = snapshot["key"]["hash"]
+        return info
+
     @classmethod
     def create(cls, name, location=None):
         if not location:
-            location = os.path.join(".asimov", "ledger.yml")
+            location = cls.default_location
         data = {}
         data["asimov"] = {}
         data["asimov"]["version"] = asimov.__version__
@@ -69,13 +366,14 @@ class YAMLLedger(Ledger):
         data["project"] = {}
         data["project"]["name"] = name
         with open(location, "w") as ledger_file:
-            ledger_file.write(yaml.dump(data, default_flow_style=False))
+            ledger_file.write(serialisation.dump(data, default_flow_style=False))
 
     def update_event(self, event):
         """
         Update an event in the ledger with a changed event object.
         """
         self.events[event.name] = event.to_dict()
+        self._cache_event(event)
         self.save()
 
     def delete_event(self, event_name):
@@ -88,6 +386,8 @@ class YAMLLedger(Ledger):
            The name of the event to remove from the ledger.
         """
         event = self.events.pop(event_name)
+        self._event_cache.pop(event_name, None)
+        self._stale_index.add(event_name)
         if "trash" not in self.data:
             self.data["trash"] = {}
         if "events" not in self.data["trash"]:
@@ -104,54 +404,114 @@ class YAMLLedger(Ledger):
         The save function checks the difference between the default values for each production and event
         before saving them, in order to attempt to reduce the duplication within the ledger.
 
-
+        If the ledger is inside a batch (see `Ledger.batch`) the file is
+        not written until the batch finishes.
         """
+        if self._batch_depth > 0:
+            self._unsaved = True
+            return
+
         self.data["events"] = list(self.events.values())
         with set_directory(config.get("project", "root")):
+            self.clear_cache()
             # First produce a backup of the ledger
             shutil.copy(self.location, self.location + ".bak")
             with open(self.location + "_tmp", "w") as ledger_file:
-                ledger_file.write(yaml.dump(self.data, default_flow_style=False))
+                ledger_file.write(
+                    serialisation.dump(self.data, default_flow_style=False)
+                )
                 ledger_file.flush()
                 # os.fsync(ledger_file.fileno())
             os.replace(self.location + "_tmp", self.location)
 
+    def _flush(self):
+        if self._unsaved:
+            self._unsaved = False
+            self.save()
+
     def add_event(self, event):
         if "events" not in self.data:
             self.data["events"] = []
 
         self.events[event.name] = event.to_dict()
+        self._cache_event(event)
         self.save()
 
     def add_production(self, event, production):
         event.add_production(production)
         self.events[event.name] = event.to_dict()
+        self._cache_event(event)
         self.save()
 
-    def get_defaults(self):
+    def _cache_event(self, event):
         """
-        Gather project-level defaults from the ledger.
+        Keep an event object which has been written to the ledger, so that
+        it is returned by later requests rather than being rebuilt.
 
-        At present data, quality, priors, and likelihood settings can all be set at a project level as defaults.
+        Event objects which are not attached to this ledger are discarded,
+        and will be reconstructed from the ledger data when requested.
+        Events which are attached to a wrapper around this ledger, such as
+        the one which the monitor shares between threads, are kept.
         """
-        defaults = {}
-        if "data" in self.data:
-            defaults["data"] = self.data["data"]
-        if "priors" in self.data:
-            defaults["priors"] = self.data["priors"]
-        if "quality" in self.data:
-            defaults["quality"] = self.data["quality"]
-        if "likelihood" in self.data:
-            defaults["likelihood"] = self.data["likelihood"]
-        if "scheduler" in self.data:
-            defaults["scheduler"] = self.data["scheduler"]
-        return defaults
+        owner = getattr(event, "ledger", None)
+        if hasattr(owner, "unwrap"):
+            owner = owner.unwrap()
+        if owner is self:
+            self._event_cache[event.name] = event
+        else:
+            self._event_cache.pop(event.name, None)
+        self._stale_index.add(event.name)
+
+    def _load_event(self, name):
+        """
+        Return the event object for a given event, constructing it from
+        the ledger data if it has not already been requested.
+        """
+        if name not in self._event_cache:
+            self._event_cache[name] = Event(**self.events[name], ledger=self)
+        return self._event_cache[name]
 
     def get_event(self, event=None):
+        """
+        Return a list of events from the ledger.
+
+        Parameters
+        ----------
+        event : str, optional
+           The name of the event to return.
+           If this is omitted all of the events in the ledger are returned.
+
+        Notes
+        -----
+        Event objects are cached, so repeated requests for the same event
+        return the same object without re-reading the ledger data.
+        """
         if event:
-            return [Event(**self.events[event], ledger=self)]
+            return [self._load_event(event)]
         else:
-            return self._all_events
+            return [self._load_event(name) for name in self.events]
+
+    @property
+    def production_index(self):
+        """
+        The index of the productions in the ledger.
+
+        The index is built the first time that it is needed, and events
+        which have been changed since then are re-indexed before it is
+        returned.
+        """
+        if self._index is None:
+            self._index = ProductionIndex()
+            self._stale_index = set()
+            for name in list(self.events):
+                self._index.add_event(self._load_event(name))
+        while self._stale_index:
+            name = self._stale_index.pop()
+            if name in self.events:
+                self._index.add_event(self._load_event(name))
+            else:
+                self._index.remove_event(name)
+        return self._index
 
     def get_productions(self, event=None, filters=None):
         """Get a list of productions either for a single event or for all events.
@@ -165,83 +525,545 @@ class YAMLLedger(Ledger):
 
         filters : dict
            A dictionary of parameters to filter on.
+           See `asimov.query` for the filters which can be used.
+
+        Notes
+        -----
+        Productions are found using an index of their status, pipeline,
+        event, review status, and job id, which is kept up to date as
+        events are written to the ledger.
+        The index only narrows down the productions which are checked,
+        and every production which is returned matches the filters when
+        they are checked, as it does when the productions of a single
+        event are checked directly.
+        Changes to a production's status are written to the ledger, and
+        so are always seen by the index.
+        The index is only built once productions are requested for more
+        than one event; until then the productions of a single event are
+        checked one by one, so that other events are not loaded.
 
         Examples
         --------
-        FIXME: Add docs.
+        >>> from asimov.query import Not
+        >>> ledger.get_productions(
+        ...     filters={"status": {"ready", "running"}, "pipeline": Not("rift")}
+        ... )
+        """
+        if event and self._index is None:
+            # Building the index would construct every event in the
+            # ledger, so a single event's productions are checked
+            # directly instead.
+            if event not in self.events:
+                return []
+            return [
+                production
+                for production in self._load_event(event).productions
+                if matches(production, filters or {})
+            ]
+        return self.production_index.query(event, filters)
+
+
+def _file_key(path):
+    """
+    Return the size, modification time, and inode of a file, which are
+    used to check whether it has changed.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "inode": stat.st_ino}
+
+
+def _private(open_file):
+    """
+    Check that an open file belongs to the current user and can't be
+    written by anyone else, so that it is safe to unpickle.
+    """
+    status = os.fstat(open_file.fileno())
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        return False
+    return not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _file_hash(path):
+    """
+    Return the SHA-256 hash of the contents of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as hash_file:
+        for block in iter(lambda: hash_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_yaml(path, data):
+    """
+    Atomically write data to a YAML file.
+
+    The data are first written to a temporary file, which then replaces
+    the original file, so that an interrupted write cannot leave the file
+    partially written.
+    """
+    with open(path + "_tmp", "w") as yaml_file:
+        yaml_file.write(serialisation.dump(data, default_flow_style=False))
+        yaml_file.flush()
+    os.replace(path + "_tmp", path)
+
+
+def _event_filename(name, existing):
+    """
+    Choose a filename for an event which does not clash with any of the
+    existing filenames.
+    """
+    stem = re.sub(r"[^\w.-]", "_", name)
+    filename = f"{stem}.yml"
+    number = 1
+    while filename in existing:
+        filename = f"{stem}-{number}.yml"
+        number += 1
+    return filename
+
+
+class EventFiles(MutableMapping):
+    """
+    A mapping of event names to event data, where each event is stored in
+    its own file in a ledger directory.
+
+    Event files are only read the first time that an event is accessed.
+
+    Parameters
+    ----------
+    ledger : `asimov.ledger.YAMLDirectoryLedger`
+       The ledger which these events belong to.
+    index : dict
+       A dictionary mapping each event name to the name of its file.
+    """
+
+    def __init__(self, ledger, index):
+        self.ledger = ledger
+        self.index = index
+        self._data = {}
+
+    def __getitem__(self, name):
+        if name not in self._data:
+            if name not in self.index:
+                raise KeyError(name)
+            self._data[name] = self.ledger._read_event(self.index[name])
+        return self._data[name]
+
+    def __setitem__(self, name, value):
+        if name not in self.index:
+            self.index[name] = _event_filename(name, self.index.values())
+        self._data[name] = value
+
+    def __delitem__(self, name):
+        if name not in self.index:
+            raise KeyError(name)
+        self.index.pop(name)
+        self._data.pop(name, None)
+
+    def __iter__(self):
+        return iter(self.index)
 
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def loaded(self):
+        """
+        The names of the events which have been read from their files.
         """
+        return list(self._data.keys())
 
-        if event:
-            productions = self.get_event(event).productions
-        else:
-            productions = []
-            for event_i in self.get_event():
-                for production in event_i.productions:
-                    productions.append(production)
 
-        def apply_filter(productions, parameter, value):
-            productions = filter(
-                lambda x: x.meta[parameter] == value
-                if (parameter in x.meta)
-                else (
-                    getattr(x, parameter) == value if hasattr(x, parameter) else False
-                ),
-                productions,
+class YAMLDirectoryLedger(YAMLLedger):
+    """
+    A ledger stored in a directory of YAML files, with one file per event.
+
+    The directory contains the project-level data in ``ledger.yml``, an
+    index of the events in ``index.yml``, and one file for each event in
+    the ``events`` subdirectory.
+    Updating an event only rewrites the file for that event.
+
+    Parameters
+    ----------
+    location : str, optional
+       The path to the ledger directory.
+       Defaults to `.asimov/ledger`.
+    lazy : bool, optional
+       If true the event and production objects are only constructed
+       when they are first requested from the ledger.
+       Defaults to the value of `ledger>lazy` in the configuration
+       file, or True if this is not set.
+    """
+
+    default_location = os.path.join(".asimov", "ledger")
+
+    def __init__(self, location=None, lazy=None):
+        self._unsaved_events = set()
+        self._unsaved_index = False
+        self._removed = []
+        super().__init__(location, lazy, cache=False)
+
+    def _read(self):
+        """
+        Read the project data and the event index from the ledger directory.
+        """
+        with open(os.path.join(self.location, "ledger.yml"), "r") as ledger_file:
+            self.data = serialisation.load(ledger_file)
+        with open(os.path.join(self.location, "index.yml"), "r") as index_file:
+            index = serialisation.load(index_file) or {}
+        self.events = EventFiles(self, index)
+
+    def _read_event(self, filename):
+        """
+        Read the data for a single event from its file.
+        """
+        with open(os.path.join(self.location, "events", filename), "r") as event_file:
+            event = serialisation.load(event_file)
+        return self._apply_defaults(event)
+
+    @classmethod
+    def create(cls, name, location=None):
+        if not location:
+            location = cls.default_location
+        pathlib.Path(os.path.join(location, "events")).mkdir(parents=True)
+        data = {}
+        data["asimov"] = {}
+        data["asimov"]["version"] = asimov.__version__
+        data["project"] = {}
+        data["project"]["name"] = name
+        _write_yaml(os.path.join(location, "ledger.yml"), data)
+        _write_yaml(os.path.join(location, "index.yml"), {})
+
+    @classmethod
+    def migrate(cls, source, location=None):
+        """
+        Convert a single-file YAML ledger into a ledger directory.
+
+        Parameters
+        ----------
+        source : str
+           The path to the existing ledger file.
+        location : str, optional
+           The path to the ledger directory which should be created.
+           Defaults to `.asimov/ledger`.
+
+        Returns
+        -------
+        `asimov.ledger.YAMLDirectoryLedger`
+           The new ledger.
+        """
+        if not location:
+            location = cls.default_location
+        with open(source, "r") as ledger_file:
+            data = serialisation.load(ledger_file)
+        events = data.pop("events", None) or []
+
+        pathlib.Path(os.path.join(location, "events")).mkdir(parents=True)
+        index = {}
+        for event in events:
+            filename = _event_filename(event["name"], index.values())
+            index[event["name"]] = filename
+            _write_yaml(os.path.join(location, "events", filename), event)
+        _write_yaml(os.path.join(location, "index.yml"), index)
+        _write_yaml(os.path.join(location, "ledger.yml"), data)
+
+        return cls(location)
+
+    def _save_event(self, name):
+        """
+        Write a single event to its file.
+        """
+        with set_directory(config.get("project", "root")):
+            _write_yaml(
+                os.path.join(self.location, "events", self.events.index[name]),
+                self.events[name],
             )
-            return productions
 
-        if filters:
-            for parameter, value in filters.items():
-                productions = apply_filter(productions, parameter, value)
-        return list(productions)
+    def _save_index(self):
+        with set_directory(config.get("project", "root")):
+            _write_yaml(os.path.join(self.location, "index.yml"), self.events.index)
+
+    def update_event(self, event):
+        """
+        Update an event in the ledger with a changed event object.
+
+        Only the file for this event is rewritten.
+        """
+        new = event.name not in self.events.index
+        self.events[event.name] = event.to_dict()
+        self._cache_event(event)
+        if self._batch_depth > 0:
+            self._unsaved_events.add(event.name)
+            self._unsaved_index |= new
+            return
+        self._save_event(event.name)
+        if new:
+            self._save_index()
+
+    def add_event(self, event):
+        self.update_event(event)
+
+    def add_production(self, event, production):
+        event.add_production(production)
+        self.update_event(event)
+
+    def delete_event(self, event_name):
+        """
+        Remove an event from the ledger.
+
+        Parameters
+        ----------
+        event_name : str
+           The name of the event to remove from the ledger.
+        """
+        self._removed.append(self.events.index[event_name])
+        self._unsaved_events.discard(event_name)
+        super().delete_event(event_name)
+
+    def save(self):
+        """
+        Update the ledger directory with the project data and the data for
+        every event which has been loaded.
+
+        If the ledger is inside a batch (see `Ledger.batch`) the files are
+        not written until the batch finishes.
+        """
+        if self._batch_depth > 0:
+            self._unsaved = True
+            return
+
+        with set_directory(config.get("project", "root")):
+            ledger_file = os.path.join(self.location, "ledger.yml")
+            shutil.copy(ledger_file, ledger_file + ".bak")
+            _write_yaml(ledger_file, self.data)
+        self._save_index()
+        for name in self.events.loaded:
+            self._save_event(name)
+        # Event files are only removed once the index no longer refers to them.
+        with set_directory(config.get("project", "root")):
+            for filename in self._removed:
+                os.remove(os.path.join(self.location, "events", filename))
+        self._removed = []
+        self._unsaved_events.clear()
+        self._unsaved_index = False
+
+    def _flush(self):
+        if self._unsaved:
+            self._unsaved = False
+            self.save()
+            return
+        for name in self._unsaved_events:
+            self._save_event(name)
+        if self._unsaved_index:
+            self._save_index()
+        self._unsaved_events.clear()
+        self._unsaved_index = False
+
+
+class EventRecords(Mapping):
+    """
+    A read-only mapping of event names to event data, where the events
+    are read from a ledger database when they are accessed.
+
+    Parameters
+    ----------
+    ledger : `asimov.ledger.DatabaseLedger`
+       The ledger which these events belong to.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def __getitem__(self, name):
+        document = self.ledger.db.get_event(name)
+        if document is None:
+            raise KeyError(name)
+        return self.ledger._apply_defaults(document)
+
+    def __contains__(self, name):
+        return self.ledger.db.get_event(name) is not None
+
+    def __iter__(self):
+        return iter(self.ledger.db.event_names())
+
+    def __len__(self):
+        return self.ledger.db.count_events()
 
 
 class DatabaseLedger(Ledger):
     """
-    Use a document database to store the ledger.
+    A ledger stored in an SQLite database.
+
+    Each event is stored as a separate record, and the status, pipeline,
+    review status, and job id of every production are indexed, so events
+    and productions can be found without reading the whole ledger.
+
+    Parameters
+    ----------
+    location : str, optional
+       The path to the database file.
+       Defaults to `.asimov/ledger.db`.
     """
 
-    def __init__(self):
-        if config.get("ledger", "engine") == "tinydb":
-            self.db = asimov.database.AsimovTinyDatabase()
-        else:
-            self.db = asimov.database.AsimovTinyDatabase()
+    default_location = os.path.join(".asimov", "ledger.db")
+
+    def __init__(self, location=None):
+        if not location:
+            location = self.default_location
+        if not os.path.exists(location):
+            raise FileNotFoundError(f"There is no ledger database at {location}")
+        self.location = location
+        self.db = asimov.database.AsimovSQLiteDatabase(location)
+        self.data = self.db.get_project()
+        self._event_cache = {}
 
     @classmethod
-    def create(cls):
-        ledger = cls()
-        ledger.db._create()
-        return ledger
+    def create(cls, name, location=None):
+        if not location:
+            location = cls.default_location
+        data = {}
+        data["asimov"] = {}
+        data["asimov"]["version"] = asimov.__version__
+        data["project"] = {}
+        data["project"]["name"] = name
+        database = asimov.database.AsimovSQLiteDatabase._create(location)
+        database.set_project(data)
+        database.commit()
+        database.close()
+        return cls(location)
 
-    def _insert(self, payload):
+    @classmethod
+    def migrate(cls, source, location=None):
         """
-        Store the payload in the correct database table.
+        Convert a single-file YAML ledger into a ledger database.
+
+        Parameters
+        ----------
+        source : str
+           The path to the existing ledger file.
+        location : str, optional
+           The path to the database which should be created.
+           Defaults to `.asimov/ledger.db`.
+
+        Returns
+        -------
+        `asimov.ledger.DatabaseLedger`
+           The new ledger.
         """
+        if not location:
+            location = cls.default_location
+        if os.path.exists(location):
+            raise FileExistsError(f"There is already a ledger database at {location}")
+        with open(source, "r") as ledger_file:
+            data = serialisation.load(ledger_file)
+        events = data.pop("events", None) or []
 
-        if isinstance(payload, Event):
-            id_number = self.db.insert("event", payload.to_dict(productions=False))
-        elif isinstance(payload, Production):
-            id_number = self.db.insert("production", payload.to_dict(event=False))
+        database = asimov.database.AsimovSQLiteDatabase._create(location)
+        database.set_project(data)
+        database.put_events(events)
+        database.commit()
+        database.close()
 
-        return id_number
+        return cls(location)
+
+    def _commit(self):
+        """
+        Commit changes to the database, unless they are part of a batch.
+        """
+        if self._batch_depth == 0:
+            self.db.commit()
+
+    def _flush(self):
+        self.db.commit()
 
     @property
     def events(self):
         """
-        Return all of the events in the ledger.
+        The data for each event in the ledger, indexed by event name.
         """
-        return [Event.from_dict(page) for page in self.db.tables["event"].all()]
+        return EventRecords(self)
 
-    def get_defaults(self):
-        raise NotImplementedError
+    def _load_event(self, name):
+        """
+        Return the event object for a given event, reading it from the
+        database if it has not already been requested.
+        """
+        if name not in self._event_cache:
+            self._event_cache[name] = Event(**self.events[name], ledger=self)
+        return self._event_cache[name]
 
     def get_event(self, event=None):
         """
-        Find a specific event in the ledger and return it.
+        Return a list of events from the ledger.
+
+        Parameters
+        ----------
+        event : str, optional
+           The name of the event to return.
+           If this is omitted all of the events in the ledger are returned.
+        """
+        if event:
+            return [self._load_event(event)]
+        else:
+            return [self._load_event(name) for name in self.db.event_names()]
+
+    def update_event(self, event):
+        """
+        Update an event in the ledger with a changed event object.
+        """
+        self.update_events([event])
+
+    def update_events(self, events):
+        """
+        Add or update a number of events in a single transaction.
+
+        Parameters
+        ----------
+        events : list
+           The events, as `asimov.event.Event` objects.
+        """
+        events = list(events)
+        self.db.put_events([event.to_dict() for event in events])
+        for event in events:
+            owner = getattr(event, "ledger", None)
+            if hasattr(owner, "unwrap"):
+                owner = owner.unwrap()
+            if owner is self:
+                self._event_cache[event.name] = event
+            else:
+                self._event_cache.pop(event.name, None)
+        self._commit()
+
+    def add_event(self, event):
+        self.update_event(event)
+
+    def add_production(self, event, production):
+        event.add_production(production)
+        self.update_event(event)
+
+    def delete_event(self, event_name):
         """
-        event_dict = self.db.query("event", "name", event)[0]
-        return Event.from_dict(event_dict)
+        Remove an event from the ledger.
+
+        Parameters
+        ----------
+        event_name : str
+           The name of the event to remove from the ledger.
+        """
+        event = self.db.get_event(event_name)
+        if event is None:
+            raise KeyError(event_name)
+        self._event_cache.pop(event_name, None)
+        self.db.delete_event(event_name)
+        self.data.setdefault("trash", {}).setdefault("events", {})[event_name] = event
+        self.save()
+
+    def save(self):
+        """
+        Write the project-level data to the database.
+        """
+        self.db.set_project(self.data)
+        self._commit()
 
     def get_productions(self, event=None, filters=None):
         """Get a list of productions either for a single event or for all events.
@@ -255,33 +1077,23 @@ class DatabaseLedger(Ledger):
 
         filters : dict
            A dictionary of parameters to filter on.
+           See `asimov.query` for the filters which can be used.
 
-        Examples
-        --------
-        FIXME: Add docs.
-
+        Notes
+        -----
+        Filters on the status, pipeline, event, review status, and job id of
+        a production are evaluated by the database, so only the events
+        containing matching productions are read.
         """
+        filters = filters or {}
+        found = self.db.find_productions(event, filters)
+        names = defaultdict(set)
+        for event_name, production_name in found:
+            names[event_name].add(production_name)
 
-        if event:
-            productions = self.get_event(event).productions
-        else:
-            productions = []
-            for event_i in self.get_event():
-                for production in event_i.productions:
+        productions = []
+        for event_name, production_names in names.items():
+            for production in self._load_event(event_name).productions:
+                if production.name in production_names and matches(production, filters):
                     productions.append(production)
-
-        def apply_filter(productions, parameter, value):
-            productions = filter(
-                lambda x: x.meta[parameter] == value
-                if (parameter in x.meta)
-                else (
-                    getattr(x, parameter) == value if hasattr(x, parameter) else False
-                ),
-                productions,
-            )
-            return productions
-
-        if filters:
-            for parameter, value in filters.items():
-                productions = apply_filter(productions, parameter, value)
-        return list(productions)
+        return productions
@@ -1,11 +1,18 @@
 """
 The locutus script.
 """
+import glob
 import os
 
 import click
 
-from asimov.storage import AlreadyPresentException, NotAStoreError, Store
+from asimov.storage import (
+    AlreadyPresentException,
+    CODECS,
+    DatabaseManifest,
+    NotAStoreError,
+    Store,
+)
 
 cwd = os.getcwd()
 try:
@@ -33,6 +40,20 @@ def init(name):
     Store.create(cwd, name)
 
 
+@cli.command()
+def migrate():
+    """
+    Move the Store's manifest into an indexed database.
+    """
+    if isinstance(this_store.manifest, DatabaseManifest):
+        click.echo("This store already has a manifest database.")
+        return
+    manifest = DatabaseManifest.migrate(this_store)
+    click.echo(
+        f"Imported {len(list(manifest.records()))} records into {manifest.location}"
+    )
+
+
 @cli.command()
 def info():
     """
@@ -44,18 +65,70 @@ def info():
     click.echo(store.manifest.data)
 
 
-@click.argument("filename")  # , help="The file to add.")
+def _expand(filenames):
+    """
+    Find the files to store from a list of files, directories, and glob
+    patterns.
+    """
+    files = []
+    for filename in filenames:
+        if os.path.isdir(filename):
+            files += sorted(
+                os.path.join(filename, name)
+                for name in os.listdir(filename)
+                if os.path.isfile(os.path.join(filename, name))
+            )
+        elif any(character in filename for character in "*?["):
+            files += sorted(glob.glob(filename))
+        else:
+            files.append(filename)
+    return files
+
+
+@click.option(
+    "--threads",
+    "-t",
+    "threads",
+    default=None,
+    type=int,
+    help="The number of files to copy at once.",
+)
+@click.argument("filenames", nargs=-1, required=True)  # , help="The files to add.")
 @click.argument("production")  # , help="The production name.")
 @click.argument("event")  # , help="The event label.")
 @cli.command()
-def store(event, production, filename):
+def store(event, production, filenames, threads=None):
     """
-    Store a file in the Store.
+    Store files in the Store.
+
+    Each filename can be a file, a directory, all of whose files are
+    stored, or a glob pattern.
     """
-    try:
-        click.echo(this_store.add_file(event, production, filename))
-    except AlreadyPresentException:
-        click.echo("This resource has already been stored.")
+    files = _expand(filenames)
+    if len(filenames) == 1 and files == [filenames[0]]:
+        try:
+            click.echo(this_store.add_file(event, production, filenames[0]))
+        except AlreadyPresentException:
+            click.echo("This resource has already been stored.")
+        return
+
+    report = this_store.add_files(event, production, files, threads=threads)
+    for record in report["stored"]:
+        rate = record["size"] / 1e6 / record["seconds"] if record["seconds"] else 0
+        duplicate = " (already stored)" if record["duplicate"] else ""
+        click.echo(
+            f"{record['file']:30} {record['hash']:32} {rate:8.1f} MB/s{duplicate}"
+        )
+    for path, error in report["failed"].items():
+        if isinstance(error, AlreadyPresentException):
+            error = "This resource has already been stored."
+        click.echo(f"{path}: {error}")
+    rate = report["bytes"] / 1e6 / report["elapsed"] if report["elapsed"] else 0
+    click.echo(
+        f"Stored {len(report['stored'])} files ({report['bytes'] / 1e6:.1f} MB) "
+        f"in {report['elapsed']:.2f} seconds ({rate:.1f} MB/s), "
+        f"{len(report['failed'])} failed."
+    )
 
 
 @click.option(
@@ -88,3 +161,98 @@ def list(event, production):
         event, production
     ).items():
         click.echo(f"{resource:30} {details['hash']:32} {details['uuid']:32}")
+
+
+@click.option(
+    "--full",
+    "full",
+    is_flag=True,
+    help="Hash every file, even those which haven't changed since they were last verified.",
+)
+@click.argument("production", required=False)
+@click.argument("event", required=False)
+@cli.command()
+@click.pass_context
+def verify(ctx, event=None, production=None, full=False):
+    """
+    Check the files in the Store against the manifest.
+    """
+    report = this_store.verify(event, production, full=full)
+    for path, error in report["failed"].items():
+        click.echo(f"{path}: {error}")
+    click.echo(
+        f"Verified {report['hashed'] + report['cached']} files "
+        f"({report['hashed']} hashed, {report['cached']} unchanged), "
+        f"{len(report['failed'])} failed."
+    )
+    if report["failed"]:
+        ctx.exit(1)
+
+
+def _size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return f"{size:.1f} {unit}"
+
+
+@click.option(
+    "--age",
+    "age",
+    type=float,
+    default=None,
+    help="The number of days after which files are compressed.",
+)
+@click.option(
+    "--codec",
+    "codec",
+    type=click.Choice(sorted(CODECS)),
+    default=None,
+    help="The compression to use.",
+)
+@click.option(
+    "--dry-run",
+    "dry_run",
+    is_flag=True,
+    help="Report the files which would be compressed without compressing them.",
+)
+@cli.command()
+@click.pass_context
+def tier(ctx, age=None, codec=None, dry_run=False):
+    """
+    Compress the files in the Store which haven't changed recently.
+    """
+    report = this_store.tier(age=age, codec=codec, dry_run=dry_run)
+    for hash, error in report["failed"].items():
+        click.echo(f"{hash}: {error}")
+    if dry_run:
+        click.echo(
+            f"Would compress {len(report['compressed'])} files "
+            f"({_size(report['before'])})."
+        )
+    else:
+        click.echo(
+            f"Compressed {len(report['compressed'])} files from "
+            f"{_size(report['before'])} to {_size(report['after'])}, "
+            f"reclaiming {_size(report['before'] - report['after'])}."
+        )
+    if report["failed"]:
+        ctx.exit(1)
+
+
+@cli.command()
+def space():
+    """
+    Report the space used by the Store.
+    """
+    report = this_store.space()
+    click.echo(f"Uncompressed files: {_size(report['hot'])}")
+    click.echo(
+        f"Compressed files:   {_size(report['cold'])} "
+        f"({_size(report['uncompressed'])} uncompressed)"
+    )
+    click.echo(f"Decompressed cache: {_size(report['cache'])}")
+    click.echo(f"Space reclaimed:    {_size(report['uncompressed'] - report['cold'])}")
@@ -18,6 +18,7 @@ from asimov.cli import (  # NoQA
     application,
     configuration,
     event,
+    ledger,
     manage,
     monitor,
     production,
@@ -55,6 +56,7 @@ olivaw.add_command(manage.manage)
 olivaw.add_command(report.report)
 # Configuration commands
 olivaw.add_command(configuration.configuration)
+olivaw.add_command(ledger.ledger)
 # Monitoring commands
 olivaw.add_command(monitor.start)
 olivaw.add_command(monitor.stop)
@@ -3,7 +3,6 @@
 import configparser
 import os
 import subprocess
-import time
 import warnings
 
 warnings.filterwarnings("ignore", module="htcondor")
@@ -11,7 +10,7 @@ warnings.filterwarnings("ignore", module="htcondor")
 
 import htcondor  # NoQA
 
-from asimov import utils  # NoQA
+from asimov import condor, utils  # NoQA
 from asimov import config, logger, logging, LOGGER_LEVEL  # NoQA
 
 import otter  # NoQA
@@ -166,8 +165,8 @@ class Pipeline:
             f"{self.production.name}_skymap.fits",
         ]
 
-        for filename in files:
-            results = os.path.join(
+        results = [
+            os.path.join(
                 config.get("general", "webroot"),
                 self.production.event.name,
                 self.production.name,
@@ -175,10 +174,14 @@ class Pipeline:
                 "samples",
                 filename,
             )
-            store = Store(root=config.get("storage", "directory"))
-            store.add_file(
-                self.production.event.name, self.production.name, file=results
-            )
+            for filename in files
+        ]
+        store = Store.get(config.get("storage", "directory"))
+        report = store.add_files(
+            self.production.event.name, self.production.name, results
+        )
+        for path, error in report["failed"].items():
+            self.logger.error(f"{path} could not be stored: {error}")
 
     def detect_completion_processing(self):
         files = f"{self.production.name}_pesummary.dat"
@@ -223,7 +226,17 @@ class Pipeline:
 
         stdout, stderr = dagman.communicate()
         if not stderr:
-            time.sleep(20)
+            cluster_id = self.production.meta["job id"]
+            try:
+                utils.wait_until(
+                    lambda: not condor.is_queued(cluster_id),
+                    config.getfloat("condor", "removal_timeout", fallback=60),
+                    description=f"job {cluster_id} to leave the queue",
+                )
+            except (htcondor.HTCondorIOError, htcondor.HTCondorLocateError) as error:
+                self.logger.warning(
+                    f"Could not check that job {cluster_id} has been removed: {error}"
+                )
             self.production.meta.pop("job id")
 
     def clean(self, dryrun=False):
@@ -483,17 +496,11 @@ class PESummaryPipeline(PostPipeline):
                 with open("pesummary.sub", "w") as subfile:
                     subfile.write(hostname_job.__str__())
 
-            try:
-                # There should really be a specified submit node, and if there is, use it.
-                schedulers = htcondor.Collector().locate(
-                    htcondor.DaemonTypes.Schedd, config.get("condor", "scheduler")
-                )
-                schedd = htcondor.Schedd(schedulers)
-            except:  # NoQA
-                # If you can't find a specified scheduler, use the first one you find
-                schedd = htcondor.Schedd()
-            with schedd.transaction() as txn:
-                cluster_id = hostname_job.queue(txn)
+            def queue(schedd):
+                with schedd.transaction() as txn:
+                    return hostname_job.queue(txn)
+
+            cluster_id = condor.scheduler.run(queue)
 
         else:
             cluster_id = 0
@@ -401,21 +401,22 @@ class BayesWave(Pipeline):
         """
 
         sample_rate = self.production.meta["likelihood"]["sample rate"]
-        self.logger.info(self.collect_assets())
-        for detector, asset in self.collect_assets()["psds"].items():
-            store = Store(root=config.get("storage", "directory"))
-            try:
-                store.add_file(
-                    self.production.event.name,
-                    self.production.name,
-                    file=asset,
-                    new_name=f"{detector}-{sample_rate}-psd.dat",
-                )
-            except Exception as e:
-                self.logger.error(
-                    f"There was a problem committing the PSD for {detector} to the store."
-                )
-                self.logger.exception(e)
+        assets = self.collect_assets()
+        self.logger.info(assets)
+        detectors = {asset: detector for detector, asset in assets["psds"].items()}
+        store = Store.get(config.get("storage", "directory"))
+        report = store.add_files(
+            self.production.event.name,
+            self.production.name,
+            {
+                asset: f"{detector}-{sample_rate}-psd.dat"
+                for asset, detector in detectors.items()
+            },
+        )
+        for asset, error in report["failed"].items():
+            self.logger.error(
+                f"There was a problem committing the PSD for {detectors[asset]} to the store: {error}"
+            )
 
     def collect_logs(self):
         """
@@ -482,7 +483,7 @@ class BayesWave(Pipeline):
         Author: Carl-Johan Haster - August 2020
         (Updated for asimov by Daniel Williams - November 2020
         """
-        store = Store(root=config.get("storage", "directory"))
+        store = Store.get(config.get("storage", "directory"))
         sample_rate = self.production.meta["quality"]["sample-rate"]
         orig_PSD_file = np.genfromtxt(
             os.path.join(
@@ -6,9 +6,7 @@ import re
 import subprocess
 import configparser
 
-import time
-
-from .. import config
+from .. import config, utils
 from ..pipeline import Pipeline, PipelineException, PipelineLogger, PESummaryPipeline
 
 
@@ -164,7 +162,14 @@ class Bilby(Pipeline):
                     production=self.production.name,
                 )
             else:
-                time.sleep(10)
+                dag = os.path.join(
+                    self.production.rundir, "submit", f"dag_{job_label}.submit"
+                )
+                utils.wait_until(
+                    lambda: os.path.exists(dag),
+                    config.getfloat("pipelines", "dag_timeout", fallback=60),
+                    description=f"the DAG file for {self.production.name}",
+                )
                 return PipelineLogger(message=out, production=self.production.name)
 
     def submit_dag(self, dryrun=False):
@@ -0,0 +1,359 @@
+"""
+Searching for productions in the ledger.
+
+Productions can be selected using a dictionary of filters, in which each
+key names a property of the production, and each value gives the value
+that property must have.
+A filter value can be
+
+- a single value, which the property must be equal to;
+- a list, tuple, or set of values, one of which the property must be
+  equal to;
+- a `Not` object, which matches any production which the filter it wraps
+  does not match.
+
+Properties are looked up first among the indexed properties listed in
+`INDEXED`, then in the production's metadata, and finally as attributes
+of the production.
+Nested metadata can be reached by separating the keys with a full stop,
+for example ``likelihood.sample rate``.
+
+Examples
+--------
+>>> ledger.get_productions(
+...     filters={
+...         "status": {"ready", "running"},
+...         "pipeline": Not("bayeswave"),
+...         "likelihood.sample rate": 4096,
+...     }
+... )
+"""
+
+import itertools
+from collections import defaultdict
+from collections.abc import Mapping
+
+
+class Not:
+    """
+    Negate a filter value.
+
+    Parameters
+    ----------
+    value : object
+       The filter value which should not be matched.
+       This can be a single value or a collection of values.
+
+    Examples
+    --------
+    >>> ledger.get_productions(filters={"status": Not(["finished", "uploaded"])})
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"Not({self.value!r})"
+
+
+#: A marker for a property which a production does not have.
+MISSING = object()
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _upper(value):
+    return value.upper() if isinstance(value, str) else value
+
+
+def _pipeline(production):
+    pipeline = production.pipeline
+    if isinstance(pipeline, str):
+        return pipeline.lower()
+    return pipeline.name.lower()
+
+
+#: The properties which are indexed by `ProductionIndex`.
+#: Each is given as a function which returns the property of a production,
+#: and a function which normalises a filter value so it can be compared
+#: with the property.
+INDEXED = {
+    "event": (lambda production: production.event.name, lambda value: value),
+    "status": (lambda production: production.status, _lower),
+    "pipeline": (_pipeline, _lower),
+    "review status": (lambda production: production.review.status, _upper),
+    "job id": (lambda production: production.job_id, lambda value: value),
+}
+
+#: Alternative names which can be used for the indexed properties.
+ALIASES = {"review": "review status", "job_id": "job id"}
+
+
+def get_value(production, parameter):
+    """
+    Find the value of a property of a production.
+
+    Parameters
+    ----------
+    production : `asimov.event.Production`
+       The production.
+    parameter : str
+       The name of the property.
+
+    Returns
+    -------
+    object
+       The value of the property, or `MISSING` if the production does not
+       have this property.
+    """
+    parameter = ALIASES.get(parameter, parameter)
+    if parameter in INDEXED:
+        return INDEXED[parameter][0](production)
+    if parameter in production.meta:
+        return production.meta[parameter]
+    if "." in parameter:
+        value = production.meta
+        for key in parameter.split("."):
+            if not isinstance(value, Mapping) or key not in value:
+                break
+            value = value[key]
+        else:
+            return value
+    return getattr(production, parameter, MISSING)
+
+
+def normalise(parameter, value):
+    """
+    Normalise a filter value so that it can be compared with the value of
+    a property, for example by converting statuses to lower case.
+
+    Parameters
+    ----------
+    parameter : str
+       The name of the property.
+    value : object
+       The filter value.
+
+    Returns
+    -------
+    object
+       The normalised value.
+    """
+    parameter = ALIASES.get(parameter, parameter)
+    if parameter in INDEXED:
+        return INDEXED[parameter][1](value)
+    return value
+
+
+def match(value, condition, parameter=None):
+    """
+    Check whether a property value satisfies a filter.
+
+    Parameters
+    ----------
+    value : object
+       The value of the property.
+    condition : object
+       The filter value; see the module documentation.
+    parameter : str, optional
+       The name of the property, which is used to normalise the filter
+       value for indexed properties, for example so that statuses are not
+       case sensitive.
+
+    Returns
+    -------
+    bool
+    """
+    if isinstance(condition, Not):
+        return not match(value, condition.value, parameter)
+    if value is MISSING:
+        return False
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        return any(match(value, option, parameter) for option in condition)
+    return value == normalise(parameter, condition)
+
+
+def matches(production, filters):
+    """
+    Check whether a production satisfies all of a set of filters.
+
+    Parameters
+    ----------
+    production : `asimov.event.Production`
+       The production.
+    filters : dict
+       The filters, see the module documentation.
+
+    Returns
+    -------
+    bool
+    """
+    return all(
+        match(get_value(production, parameter), condition, parameter)
+        for parameter, condition in filters.items()
+    )
+
+
+class ProductionIndex:
+    """
+    An in-memory index of productions, which allows productions to be
+    found by their indexed properties without checking every production.
+
+    Productions are indexed by each of the properties in `INDEXED`.
+    The index is updated one event at a time, replacing all of the
+    productions for that event.
+    """
+
+    def __init__(self):
+        self.productions = {}
+        self.events = {}
+        self.indexes = {parameter: defaultdict(set) for parameter in INDEXED}
+        self._values = {}
+        self._unindexed = {parameter: set() for parameter in INDEXED}
+        self._order = {}
+        self._positions = itertools.count()
+
+    def __len__(self):
+        return len(self.productions)
+
+    def add_event(self, event):
+        """
+        Index all of the productions for an event, replacing any which
+        were previously indexed for it.
+
+        Parameters
+        ----------
+        event : `asimov.event.Event`
+           The event.
+        """
+        self._discard(event.name)
+        if event.name not in self._order:
+            self._order[event.name] = next(self._positions)
+        position = self._order[event.name]
+        keys = []
+        for number, production in enumerate(event.productions):
+            key = (position, number)
+            values = {}
+            for parameter, (getter, _) in INDEXED.items():
+                values[parameter] = getter(production)
+                try:
+                    self.indexes[parameter][values[parameter]].add(key)
+                except TypeError:
+                    # Unhashable values can't be indexed, so these
+                    # productions are checked individually instead.
+                    values[parameter] = MISSING
+                    self._unindexed[parameter].add(key)
+            self.productions[key] = production
+            self._values[key] = values
+            keys.append(key)
+        self.events[event.name] = keys
+
+    def remove_event(self, name):
+        """
+        Remove all of the productions for an event from the index.
+
+        Parameters
+        ----------
+        name : str
+           The name of the event.
+        """
+        self._discard(name)
+        self._order.pop(name, None)
+
+    def _discard(self, name):
+        for key in self.events.pop(name, []):
+            for parameter, value in self._values.pop(key).items():
+                if value is MISSING:
+                    self._unindexed[parameter].discard(key)
+                    continue
+                entries = self.indexes[parameter][value]
+                entries.discard(key)
+                if not entries:
+                    del self.indexes[parameter][value]
+            del self.productions[key]
+
+    def _lookup(self, parameter, condition, candidates=None):
+        """
+        Find the productions whose indexed property satisfies a filter.
+
+        Parameters
+        ----------
+        parameter : str
+           The name of the indexed property.
+        condition : object
+           The filter value.
+        candidates : set, optional
+           The keys of the productions to search.
+           If this is not provided all of the productions are searched.
+
+        Returns
+        -------
+        set
+           The keys of the matching productions.
+        """
+        if isinstance(condition, Not):
+            if candidates is None:
+                candidates = set(self.productions)
+            return candidates - self._lookup(parameter, condition.value, candidates)
+        if isinstance(condition, (list, tuple, set, frozenset)):
+            found = set()
+            for option in condition:
+                found |= self._lookup(parameter, option, candidates)
+            return found
+
+        try:
+            entries = self.indexes[parameter].get(
+                normalise(parameter, condition), set()
+            )
+        except TypeError:
+            entries = set()
+        unindexed = self._unindexed[parameter]
+        if candidates is not None:
+            entries = entries & candidates
+            unindexed = unindexed & candidates
+        getter = INDEXED[parameter][0]
+        return set(entries) | {
+            key
+            for key in unindexed
+            if match(getter(self.productions[key]), condition, parameter)
+        }
+
+    def query(self, event=None, filters=None):
+        """
+        Find the productions which satisfy a set of filters.
+
+        Parameters
+        ----------
+        event : str, optional
+           The name of an event to restrict the search to.
+        filters : dict, optional
+           The filters, see the module documentation.
+
+        Returns
+        -------
+        list
+           The matching productions, in the order in which they appear in
+           the ledger.
+           A production is only returned if it matches the filters when
+           the query is made.
+        """
+        filters = filters or {}
+        candidates = set(self.events.get(event, [])) if event else None
+
+        for parameter, condition in filters.items():
+            name = ALIASES.get(parameter, parameter)
+            if name in INDEXED:
+                candidates = self._lookup(name, condition, candidates)
+
+        if candidates is None:
+            candidates = self.productions
+        # The index only narrows down the productions which are checked;
+        # each of them is checked against every filter, in case it has
+        # changed since it was indexed.
+        return [
+            self.productions[key]
+            for key in sorted(candidates)
+            if matches(self.productions[key], filters)
+        ]
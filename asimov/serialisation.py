@@ -0,0 +1,99 @@
+"""
+Reading and writing YAML.
+
+All of the YAML files which asimov reads and writes (the ledger, the
+results store manifest, and the condor job cache) should be handled
+through this module, which uses the libyaml C bindings for PyYAML when
+they are available, and falls back to the pure-python implementation
+when they are not.
+
+The loader is always a "safe" loader, equivalent to ``yaml.safe_load``,
+and the dumper produces the same output as ``yaml.dump``.
+"""
+
+from collections.abc import Mapping
+
+import yaml
+
+try:
+    from yaml import CDumper as BaseDumper
+    from yaml import CSafeLoader as SafeLoader
+
+    LIBYAML = True
+except ImportError:
+    from yaml import Dumper as BaseDumper
+    from yaml import SafeLoader
+
+    LIBYAML = False
+
+
+class Dumper(BaseDumper):
+    """
+    A YAML dumper which writes any mapping, such as the layered metadata
+    of a production, as an ordinary dictionary.
+    """
+
+
+Dumper.add_multi_representer(
+    Mapping, lambda dumper, data: dumper.represent_dict(dict(data))
+)
+
+
+def load(stream):
+    """
+    Parse a single YAML document.
+
+    Parameters
+    ----------
+    stream : str or file
+       The YAML document, or an open file containing it.
+
+    Returns
+    -------
+    object
+       The parsed document.
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_all(stream):
+    """
+    Parse all of the YAML documents in a stream.
+
+    Parameters
+    ----------
+    stream : str or file
+       The YAML documents, or an open file containing them.
+
+    Returns
+    -------
+    generator
+       A generator which yields each parsed document in turn.
+    """
+    return yaml.load_all(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None, **kwargs):
+    """
+    Serialise an object as YAML.
+
+    Parameters
+    ----------
+    data : object
+       The object to be serialised.
+    stream : file, optional
+       An open file to write the YAML to.
+       If this is not provided the YAML is returned as a string.
+
+    Other Parameters
+    ----------------
+    **kwargs
+       Additional keyword arguments are passed to `yaml.dump`,
+       for example ``default_flow_style``.
+
+    Returns
+    -------
+    str or None
+       The YAML, if no stream was provided.
+    """
+    return yaml.dump(data, stream, Dumper=Dumper, **kwargs)
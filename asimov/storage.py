@@ -13,19 +13,85 @@ Configuration options for the storage API can be found in the `storage` namespac
 ```
 [storage]
 root = /path/to/the/storage/root
+hash_algorithm = blake2b
+manifest = sqlite
+cold_age = 90
+cold_codec = gzip
 
 ```
 
+The hash algorithm is used for new files, and can be any of the names in
+`HASH_ALGORITHMS`.
+The algorithm used for each file is recorded in the manifest, so files
+which were stored with a different algorithm can still be verified.
+
+Files which haven't changed for `storage>cold_age` days can be
+compressed with `Store.tier`, using `storage>cold_codec`, and are
+decompressed into `storage>cold_cache` when they are fetched.
+
+New stores keep their manifest in an SQLite database, which is indexed
+by hash and UUID; stores with a YAML manifest can be converted with
+`DatabaseManifest.migrate`.
+
 """
 
+import functools
+import gzip
 import hashlib
+import json
 import os
 import pathlib
+import sqlite3
 import stat
+import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copyfile
 
-import yaml
+from asimov import config, logger, serialisation
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#: The ioctl request which clones a file on Linux.
+FICLONE = 0x40049409
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#: The codecs which can be used to compress files in cold storage, with
+#: the extension for compressed files and a function to open them.
+CODECS = {"gzip": (".gz", gzip.open)}
+if zstandard:
+    CODECS["zstd"] = (".zst", zstandard.open)
+
+
+#: The hash algorithms which can be used to verify files, keyed by the name
+#: which is recorded in the manifest.
+HASH_ALGORITHMS = {
+    "md5": hashlib.md5,
+    "sha256": hashlib.sha256,
+    "blake2b": lambda: hashlib.blake2b(digest_size=16),
+}
+if xxhash:
+    HASH_ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+
+#: The algorithm which was used for records which don't give one.
+LEGACY_ALGORITHM = "md5"
+
+#: The number of bytes which are read from a file at a time.
+CHUNK_SIZE = 1024 * 1024
 
 
 class NotAStoreError(Exception):
@@ -61,7 +127,7 @@ class Manifest:
 
         try:
             with self._open() as f:
-                self.data = yaml.safe_load(f)
+                self.data = serialisation.load(f)
         except FileNotFoundError:
             raise NotAStoreError
 
@@ -81,7 +147,7 @@ class Manifest:
             for p_name, production in event.items():
                 for r_name, resource in production.items():
                     data[resource["uuid"]] = os.path.join(
-                        self.root, e_name, p_name, resource["uuid"]
+                        self.root, e_name, p_name, r_name
                     )
         return data
 
@@ -94,6 +160,111 @@ class Manifest:
                         self.uuid_hash[resource["uuid"]] = resource["hash"]
         return self.uuid_hash[uuid]
 
+    def get_record(self, event, production, filename):
+        """
+        Find the manifest record for a resource.
+
+        Parameters
+        ----------
+        event : str
+           The name of the event.
+        production : str
+           The name of the production.
+        filename : str
+           The name of the resource.
+
+        Returns
+        -------
+        dict
+           The record, which contains the resource's ``uuid``, ``hash``, and
+           the ``algorithm`` used to calculate the hash.
+        """
+        try:
+            record = self.data["events"][event][production][filename]
+        except KeyError:
+            raise FileNotFoundError
+        return {"algorithm": LEGACY_ALGORITHM, **record}
+
+    def has_record(self, event, production, filename):
+        """
+        Check whether a resource is recorded in the manifest.
+
+        Parameters
+        ----------
+        event : str
+           The name of the event.
+        production : str
+           The name of the production.
+        filename : str
+           The name of the resource.
+
+        Returns
+        -------
+        bool
+        """
+        return filename in self.data["events"].get(event, {}).get(production, {})
+
+    def has_hash(self, hash):
+        """
+        Check whether a resource with a given hash is recorded in the
+        manifest.
+
+        Parameters
+        ----------
+        hash : str
+           The hash of the resource.
+
+        Returns
+        -------
+        bool
+        """
+        return hash in self.hash_dict
+
+    def locate(self, uuid):
+        """
+        Find the path to a resource from its UUID.
+
+        Parameters
+        ----------
+        uuid : str
+           The UUID of the resource.
+
+        Returns
+        -------
+        str
+           The path to the resource.
+        """
+        return self.uuid_dict[uuid]
+
+    def records(self, event=None, production=None):
+        """
+        Iterate over the records in the manifest.
+
+        Parameters
+        ----------
+        event : str, optional
+           Only include the records for this event.
+        production : str, optional
+           Only include the records for this production.
+
+        Yields
+        ------
+        tuple
+           The event, production, and name of each resource, and its
+           record.
+        """
+        for e_name, event_data in self.data["events"].items():
+            if event and e_name != event:
+                continue
+            for p_name, production_data in event_data.items():
+                if production and p_name != production:
+                    continue
+                for r_name, record in production_data.items():
+                    yield e_name, p_name, r_name, {
+                        "algorithm": LEGACY_ALGORITHM,
+                        **record,
+                    }
+
     def _open(self):
         """
         Open the manifest file.
@@ -112,7 +283,7 @@ class Manifest:
         manifest = os.path.join(self.root, ".manifest", "manifest.yaml")
         if os.path.isfile(manifest):
             with open(manifest, "w") as f:
-                f.write(yaml.dump(self.data))
+                f.write(serialisation.dump(self.data))
         else:
             raise FileNotFoundError
 
@@ -134,7 +305,7 @@ class Manifest:
 
         if not os.path.isfile(manifest):
             with open(manifest, "w") as f:
-                f.write(yaml.dump(contents))
+                f.write(serialisation.dump(contents))
         else:
             raise FileExistsError
 
@@ -155,7 +326,9 @@ class Manifest:
         """
         return self.data["events"][event][production]
 
-    def add_record(self, event, production, resource, hash, resource_uuid):
+    def add_record(
+        self, event, production, resource, hash, resource_uuid, algorithm=None
+    ):
         """
         Add a resource record to the manifest.
 
@@ -172,6 +345,9 @@ class Manifest:
            The hash of the resource being recorded.
         uuid : UUID
            The UUID of the object being recorded.
+        algorithm : str, optional
+           The name of the algorithm used to calculate the hash.
+           Defaults to MD5.
         """
         # This function should store the name, location, event, production of the file
         # then calculate the hash and uuid for the file, and store them in the manifest
@@ -188,6 +364,468 @@ class Manifest:
             "uuid": resource_uuid.hex,
             "hash": hash,
         }
+        if algorithm and algorithm != LEGACY_ALGORITHM:
+            self.data["events"][event][production][resource]["algorithm"] = algorithm
+
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resources (
+    event TEXT NOT NULL,
+    production TEXT NOT NULL,
+    name TEXT NOT NULL,
+    uuid TEXT NOT NULL UNIQUE,
+    hash TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    PRIMARY KEY (event, production, name)
+);
+CREATE INDEX IF NOT EXISTS resources_hash ON resources(hash);
+"""
+
+
+class DatabaseManifest(Manifest):
+    """
+    A storage manifest kept in an SQLite database.
+
+    The resources are indexed by their hashes and UUIDs, so that files
+    can be found, and duplicates detected, without reading the whole
+    manifest, and new records are added without rewriting it.
+    Records which are added are only written to the database when
+    `update` is called.
+
+    Parameters
+    ----------
+    store : `asimov.storage.Store`
+       The results store which this should be the manifest of.
+    """
+
+    filename = "manifest.db"
+
+    def __init__(self, store):
+        self.root = store.root
+        self.store = store
+        self.location = os.path.join(self.root, ".manifest", self.filename)
+        if not os.path.isfile(self.location):
+            raise NotAStoreError
+        self.connection = self._connect(self.location)
+
+    @staticmethod
+    def _connect(location):
+        # The store may be shared between the threads of the monitor.
+        connection = sqlite3.connect(location, check_same_thread=False)
+        connection.executescript(MANIFEST_SCHEMA)
+        return connection
+
+    @classmethod
+    def create(cls, store):
+        """
+        Create the manifest database.
+        This should only be run on a new store, and will fail if the
+        store already has a manifest database.
+        """
+        location = os.path.join(store["root"], ".manifest", cls.filename)
+        if os.path.isfile(location):
+            raise FileExistsError
+        connection = cls._connect(location)
+        connection.execute(
+            "INSERT INTO store (key, value) VALUES ('name', ?)", (store["name"],)
+        )
+        connection.commit()
+        connection.close()
+
+    @classmethod
+    def migrate(cls, store):
+        """
+        Import the records from a store's YAML manifest into a new
+        manifest database.
+
+        The YAML manifest is left in place, but is no longer used once
+        the database exists.
+
+        Parameters
+        ----------
+        store : `asimov.storage.Store`
+           The store, which should be using a YAML manifest.
+
+        Returns
+        -------
+        `asimov.storage.DatabaseManifest`
+           The new manifest.
+        """
+        manifest = Manifest(store)
+        cls.create({"name": manifest.data["name"], "root": store.root})
+        database = cls(store)
+        database.connection.executemany(
+            "INSERT INTO resources (event, production, name, uuid, hash, algorithm) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    event,
+                    production,
+                    name,
+                    record["uuid"],
+                    record["hash"],
+                    record["algorithm"],
+                )
+                for event, production, name, record in manifest.records()
+            ],
+        )
+        database.update()
+        return database
+
+    @staticmethod
+    def _record(uuid, hash, algorithm):
+        record = {"uuid": uuid, "hash": hash}
+        if algorithm != LEGACY_ALGORITHM:
+            record["algorithm"] = algorithm
+        return record
+
+    @property
+    def data(self):
+        """
+        The contents of the manifest, in the same layout as a YAML
+        manifest.
+        """
+        (name,) = self.connection.execute(
+            "SELECT value FROM store WHERE key = 'name'"
+        ).fetchone()
+        data = {"name": name, "events": {}}
+        for event, production, r_name, record in self.records():
+            if record["algorithm"] == LEGACY_ALGORITHM:
+                record.pop("algorithm")
+            data["events"].setdefault(event, {}).setdefault(production, {})[
+                r_name
+            ] = record
+        return data
+
+    @property
+    def hash_dict(self):
+        return {
+            record["hash"]: self._record(record["uuid"], record["hash"], algorithm)
+            for *_, record in self.records()
+            for algorithm in [record["algorithm"]]
+        }
+
+    @property
+    def uuid_dict(self):
+        return {
+            record["uuid"]: os.path.join(self.root, event, production, name)
+            for event, production, name, record in self.records()
+        }
+
+    def get_hash(self, uuid):
+        row = self.connection.execute(
+            "SELECT hash FROM resources WHERE uuid = ?", (uuid,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(uuid)
+        return row[0]
+
+    def get_uuid(self, event, production, filename):
+        return self.get_record(event, production, filename)["uuid"]
+
+    def get_record(self, event, production, filename):
+        row = self.connection.execute(
+            "SELECT uuid, hash, algorithm FROM resources "
+            "WHERE event = ? AND production = ? AND name = ?",
+            (event, production, filename),
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError
+        return {"uuid": row[0], "hash": row[1], "algorithm": row[2]}
+
+    def has_record(self, event, production, filename):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM resources WHERE event = ? AND production = ? AND name = ?",
+                (event, production, filename),
+            ).fetchone()
+            is not None
+        )
+
+    def has_hash(self, hash):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM resources WHERE hash = ? LIMIT 1", (hash,)
+            ).fetchone()
+            is not None
+        )
+
+    def locate(self, uuid):
+        row = self.connection.execute(
+            "SELECT event, production, name FROM resources WHERE uuid = ?", (uuid,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(uuid)
+        return os.path.join(self.root, *row)
+
+    def records(self, event=None, production=None):
+        query = "SELECT event, production, name, uuid, hash, algorithm FROM resources"
+        conditions, values = [], []
+        if event:
+            conditions.append("event = ?")
+            values.append(event)
+        if production:
+            conditions.append("production = ?")
+            values.append(production)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid"
+        for (
+            e_name,
+            p_name,
+            r_name,
+            resource_uuid,
+            hash,
+            algorithm,
+        ) in self.connection.execute(query, values).fetchall():
+            yield e_name, p_name, r_name, {
+                "uuid": resource_uuid,
+                "hash": hash,
+                "algorithm": algorithm,
+            }
+
+    def list_resources(self, event, production):
+        """
+        List all of the resources available for a production.
+        """
+        resources = {
+            name: self._record(record["uuid"], record["hash"], record["algorithm"])
+            for _, _, name, record in self.records(event, production)
+        }
+        if not resources:
+            raise KeyError(production)
+        return resources
+
+    def add_record(
+        self, event, production, resource, hash, resource_uuid, algorithm=None
+    ):
+        try:
+            self.connection.execute(
+                "INSERT INTO resources (event, production, name, uuid, hash, algorithm) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    event,
+                    production,
+                    resource,
+                    resource_uuid.hex,
+                    hash,
+                    algorithm or LEGACY_ALGORITHM,
+                ),
+            )
+        except sqlite3.IntegrityError:
+            raise FileExistsError
+
+    def update(self):
+        """
+        Write the records which have been added to the database.
+        """
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def reflink(source, destination):
+    """
+    Clone a file, so that the copy shares the original's data until
+    either is changed.
+
+    This is only possible on Linux, for filesystems such as btrfs and
+    XFS which support it, and when both files are on the same
+    filesystem.
+
+    Parameters
+    ----------
+    source : str
+       The path to the file to be cloned.
+    destination : str
+       The path to the clone, which is replaced if it exists.
+
+    Returns
+    -------
+    bool
+       True if the file was cloned.
+    """
+    if fcntl is None:
+        return False
+    with open(source, "rb") as infile, open(destination, "wb") as outfile:
+        try:
+            fcntl.ioctl(outfile.fileno(), FICLONE, infile.fileno())
+            return True
+        except OSError:
+            return False
+
+
+def link(source, destination):
+    """
+    Make a file which has the same contents as another, with a hard
+    link if possible, otherwise by cloning the file, and otherwise by
+    copying it.
+
+    Parameters
+    ----------
+    source : str
+       The path to the original file.
+    destination : str
+       The path to the new file, which must not already exist.
+
+    Returns
+    -------
+    str
+       How the file was made: "hardlink", "reflink", or "copy".
+    """
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        pass
+    if reflink(source, destination):
+        return "reflink"
+    copyfile(source, destination)
+    return "copy"
+
+
+class VerificationCache:
+    """
+    Remember which stored files have been verified against the manifest,
+    so that files which haven't changed since don't need to be hashed
+    again.
+
+    A file is treated as unchanged if its inode, size, and modification
+    time are the same as when it was verified.
+    The cache is kept in the store's ``.manifest`` directory, so that it
+    is shared between asimov commands.
+
+    Parameters
+    ----------
+    store : `asimov.storage.Store`
+       The results store.
+
+    Attributes
+    ----------
+    hits : int
+       The number of files which didn't need to be hashed.
+    misses : int
+       The number of files which were hashed.
+    """
+
+    def __init__(self, store):
+        self.location = os.path.join(store.root, ".manifest", "verified.json")
+        self.root = store.root
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.location, "r") as cache_file:
+                self.entries = {
+                    name: tuple(key) for name, key in json.load(cache_file).items()
+                }
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as error:
+            logger.warning(f"The verification cache could not be read: {error}")
+            self.entries = {}
+
+    @staticmethod
+    def _key(path, record):
+        status = os.stat(path)
+        return (
+            status.st_ino,
+            status.st_size,
+            status.st_mtime_ns,
+            record["algorithm"],
+            record["hash"],
+        )
+
+    def check(self, path, record):
+        """
+        Check whether a file has been verified against a record since it
+        last changed.
+
+        Parameters
+        ----------
+        path : str
+           The path to the stored file.
+        record : dict
+           The file's manifest record.
+
+        Returns
+        -------
+        bool
+        """
+        name = os.path.relpath(path, self.root)
+        if self.entries.get(name) == self._key(path, record):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, path, record):
+        """
+        Note that a file has been verified against a record.
+
+        Parameters
+        ----------
+        path : str
+           The path to the stored file.
+        record : dict
+           The file's manifest record.
+        """
+        self.entries[os.path.relpath(path, self.root)] = self._key(path, record)
+
+    def discard(self, path):
+        """
+        Forget that a file has been verified.
+
+        Parameters
+        ----------
+        path : str
+           The path to the stored file.
+        """
+        self.entries.pop(os.path.relpath(path, self.root), None)
+
+    def clear(self):
+        """
+        Forget every file which has been verified.
+        """
+        self.entries = {}
+        self.save()
+
+    def save(self):
+        """
+        Write the cache to the store.
+
+        Failing to write the cache is not an error, since files can
+        always be verified by hashing them.
+        """
+        try:
+            with open(self.location + "_tmp", "w") as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(self.location + "_tmp", self.location)
+        except OSError as error:
+            logger.warning(f"The verification cache could not be written: {error}")
+
+
+def _locked(method):
+    """
+    Hold a store's lock while a method runs.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+#: The stores which have been opened by `Store.get`, keyed by the path to
+#: their root, with the state of their manifest when they were opened.
+stores = {}
+_stores_lock = threading.Lock()
 
 
 class Store:
@@ -206,11 +844,86 @@ class Store:
         Initiate an asimov store.
         """
         self.root = root
+        self._load()
+        self.verified = VerificationCache(self)
+        # The same store can be used by several threads, see `Store.get`,
+        # so changes to the manifest and to the files are made one at a
+        # time.
+        self._lock = threading.RLock()
 
-        self.manifest = Manifest(self)
+    @classmethod
+    def get(cls, root):
+        """
+        Find the store at a given path, reusing the store which was
+        opened there before if its manifest hasn't changed since.
+
+        This avoids reading the manifest each time that a production's
+        results are listed or fetched.
+
+        Parameters
+        ----------
+        root : str
+           The path to the results store.
+
+        Returns
+        -------
+        `asimov.storage.Store`
+        """
+        key = os.path.realpath(root)
+        with _stores_lock:
+            if key not in stores:
+                stores[key] = (cls(root=root), cls._signature(key))
+                return stores[key][0]
+            store = stores[key][0]
+        # Keep a single store, and so a single lock, for each root, and
+        # read the manifest again if something else has changed it.
+        with store._lock:
+            signature = cls._signature(key)
+            if stores[key][1] != signature:
+                store._load()
+                stores[key] = (store, signature)
+        return store
+
+    def _load(self):
+        """
+        Read the store's manifest.
+        """
+        if os.path.isfile(
+            os.path.join(self.root, ".manifest", DatabaseManifest.filename)
+        ):
+            self.manifest = DatabaseManifest(self)
+        else:
+            self.manifest = Manifest(self)
+
+    def _written(self):
+        """
+        Note the state of the manifest after the store has changed it,
+        so that `Store.get` doesn't read the store's own changes back.
+        """
+        key = os.path.realpath(self.root)
+        with _stores_lock:
+            if key in stores and stores[key][0] is self:
+                stores[key] = (self, self._signature(key))
+
+    @staticmethod
+    def _signature(root):
+        """
+        Describe the state of the manifest of the store at a path, so
+        that changes to it can be detected.
+        """
+        manifest = os.path.join(root, ".manifest")
+        if os.path.isfile(os.path.join(manifest, DatabaseManifest.filename)):
+            # The database is always read directly, so it only matters
+            # that the store has one.
+            return DatabaseManifest.filename
+        try:
+            status = os.stat(os.path.join(manifest, "manifest.yaml"))
+        except FileNotFoundError:
+            return None
+        return (status.st_ino, status.st_size, status.st_mtime_ns)
 
     @classmethod
-    def create(cls, root, name):
+    def create(cls, root, name, manifest=None):
         """
         Create this results store.
 
@@ -220,14 +933,23 @@ class Store:
            The path to the results store.
         name : str
            A name for this Store.
+        manifest : {"sqlite", "yaml"}, optional
+           The type of manifest to keep for the store.
+           Defaults to the value of `storage>manifest` in the
+           configuration file, or "sqlite".
         """
+        if manifest is None:
+            manifest = config.get("storage", "manifest", fallback="sqlite")
         pathlib.Path(root).mkdir(parents=False, exist_ok=False)
         manifest_dir = os.path.join(root, ".manifest")
         pathlib.Path(manifest_dir).mkdir(parents=False, exist_ok=False)
         store = {}
         store["name"] = name
         store["root"] = root
-        _ = Manifest.create(store)
+        if manifest == "sqlite":
+            DatabaseManifest.create(store)
+        else:
+            Manifest.create(store)
 
     def _check(self):
         """
@@ -241,21 +963,482 @@ class Store:
         """
         pass
 
-    def _hash(self, path):
+    @property
+    def algorithm(self):
+        """
+        The name of the hash algorithm used for new files.
+        """
+        algorithm = config.get("storage", "hash_algorithm", fallback=LEGACY_ALGORITHM)
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"{algorithm} is not a supported hash algorithm.")
+        return algorithm
+
+    def _hash(self, path, algorithm=LEGACY_ALGORITHM):
         """
         Calculate the hash of a file.
 
+        The file is read a piece at a time, so that large files don't
+        need to fit in memory.
+
         Parameters
         ----------
         path : str
            The filepath of the file to be hashed.
+        algorithm : str, optional
+           The name of the hash algorithm.
+           Defaults to MD5.
         """
-        hasher = hashlib.md5()
+        hasher = HASH_ALGORITHMS[algorithm]()
         with open(path, "rb") as afile:
-            buf = afile.read()
-            hasher.update(buf)
+            for chunk in iter(lambda: afile.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
         return hasher.hexdigest()
 
+    def _copy(self, source, destination, algorithm=LEGACY_ALGORITHM):
+        """
+        Copy a file, calculating its hash at the same time.
+
+        Parameters
+        ----------
+        source : str
+           The path to the file to be copied.
+        destination : str
+           The path to copy the file to.
+        algorithm : str, optional
+           The name of the hash algorithm.
+           Defaults to MD5.
+
+        Returns
+        -------
+        str
+           The hash of the file.
+        """
+        with open(source, "rb") as infile, open(destination, "wb") as outfile:
+            return self._stream(infile, outfile, algorithm)
+
+    @staticmethod
+    def _stream(infile, outfile=None, algorithm=LEGACY_ALGORITHM):
+        """
+        Read an open file a piece at a time, calculating its hash, and
+        optionally writing it to another open file.
+
+        Returns
+        -------
+        str
+           The hash of the file.
+        """
+        hasher = HASH_ALGORITHMS[algorithm]()
+        buffer = memoryview(bytearray(CHUNK_SIZE))
+        while True:
+            size = infile.readinto(buffer)
+            if not size:
+                break
+            hasher.update(buffer[:size])
+            if outfile:
+                outfile.write(buffer[:size])
+        return hasher.hexdigest()
+
+    def _object(self, hash, algorithm):
+        """
+        Find the path of the object which holds the content with a
+        given hash.
+        """
+        return os.path.join(self.root, ".objects", algorithm, hash[:2], hash)
+
+    def _cold(self, hash, algorithm):
+        """
+        Find the compressed object which holds the content with a given
+        hash, if the content has been moved to cold storage.
+
+        Returns
+        -------
+        tuple or None
+           The path to the compressed object and the name of its codec.
+        """
+        for codec, (extension, _) in CODECS.items():
+            path = self._object(hash, algorithm) + extension
+            if os.path.exists(path):
+                return path, codec
+        return None
+
+    @property
+    def cache_directory(self):
+        """
+        The directory which files are decompressed into from cold
+        storage.
+        """
+        return config.get("storage", "cold_cache", fallback=None) or os.path.join(
+            self.root, ".cache"
+        )
+
+    @_locked
+    def _thaw(self, record, event, production, file):
+        """
+        Decompress a file from cold storage into the cache directory,
+        checking its hash as it is decompressed.
+
+        Returns
+        -------
+        str
+           The path to the decompressed file.
+        """
+        cold, codec = self._cold(record["hash"], record["algorithm"])
+        destination = os.path.join(self.cache_directory, event, production, file)
+        if os.path.exists(destination):
+            return destination
+        pathlib.Path(os.path.dirname(destination)).mkdir(parents=True, exist_ok=True)
+        partial = destination + ".partial"
+        try:
+            with CODECS[codec][1](cold, "rb") as infile, open(partial, "wb") as outfile:
+                hash = self._stream(infile, outfile, record["algorithm"])
+            if hash != record["hash"]:
+                raise HashError(
+                    "The file in the file store's hash does not match the manifest."
+                )
+            os.chmod(partial, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(partial, destination)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        if self._use_cache:
+            self.verified.add(destination, record)
+        return destination
+
+    def _compress(self, source, hash, algorithm, codec):
+        """
+        Compress a file into cold storage, checking its hash as it is
+        compressed.
+
+        Returns
+        -------
+        str
+           The path to the compressed object.
+        """
+        cold = self._object(hash, algorithm) + CODECS[codec][0]
+        pathlib.Path(os.path.dirname(cold)).mkdir(parents=True, exist_ok=True)
+        partial = cold + ".partial"
+        try:
+            with open(source, "rb") as infile, CODECS[codec][1](
+                partial, "wb"
+            ) as outfile:
+                if self._stream(infile, outfile, algorithm) != hash:
+                    raise HashError(f"{source} does not match the manifest.")
+            os.chmod(partial, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(partial, cold)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return cold
+
+    @_locked
+    def tier(self, age=None, codec=None, dry_run=False):
+        """
+        Compress the files which haven't changed for a given time.
+
+        Each distinct file is compressed once, alongside the objects in
+        the store's ``.objects`` directory, and the uncompressed copies
+        are removed.
+        The manifest still records the hash of the original file, which
+        is checked when the file is decompressed by `fetch_file`.
+
+        Parameters
+        ----------
+        age : float, optional
+           The number of days since a file was stored or last changed
+           after which it is compressed.
+           Defaults to the value of `storage>cold_age` in the
+           configuration file, or 90 days.
+        codec : str, optional
+           The compression to use, which can be any of the names in
+           `CODECS`.
+           Defaults to the value of `storage>cold_codec` in the
+           configuration file, or "gzip".
+        dry_run : bool, optional
+           If true the files which would be compressed are reported, but
+           are not compressed.
+
+        Returns
+        -------
+        dict
+           The hashes of the files which were ``compressed``, the errors
+           for those which couldn't be, keyed by hash, the number of
+           bytes which the files took up ``before`` they were compressed,
+           and the number which they take up ``after``.
+        """
+        if age is None:
+            age = config.getfloat("storage", "cold_age", fallback=90)
+        if codec is None:
+            codec = config.get("storage", "cold_codec", fallback="gzip")
+        if codec not in CODECS:
+            raise ValueError(f"{codec} is not a supported compression codec.")
+        cutoff = time.time() - age * 86400
+
+        contents = {}
+        for e_name, p_name, r_name, record in self.manifest.records():
+            contents.setdefault((record["algorithm"], record["hash"]), []).append(
+                os.path.join(self.root, e_name, p_name, r_name)
+            )
+
+        report = {"compressed": [], "failed": {}, "before": 0, "after": 0}
+        for (algorithm, hash), entries in contents.items():
+            paths = [
+                path
+                for path in [self._object(hash, algorithm)] + entries
+                if os.path.exists(path)
+            ]
+            if not paths:
+                continue
+            statuses = {path: os.stat(path) for path in paths}
+            if max(status.st_mtime for status in statuses.values()) > cutoff:
+                continue
+            # Each copy of the file is counted once, however many
+            # productions it is linked into.
+            before = sum(
+                {
+                    (status.st_dev, status.st_ino): status.st_size
+                    for status in statuses.values()
+                }.values()
+            )
+            if dry_run:
+                report["compressed"].append(hash)
+                report["before"] += before
+                continue
+
+            # Copies which were stored again after the file was
+            # compressed only need to be removed.
+            existing = self._cold(hash, algorithm)
+            if not existing:
+                try:
+                    cold = self._compress(paths[0], hash, algorithm, codec)
+                except (HashError, OSError) as error:
+                    report["failed"][hash] = error
+                    continue
+
+            for path in paths:
+                os.remove(path)
+                self.verified.discard(path)
+            report["compressed"].append(hash)
+            report["before"] += before
+            if not existing:
+                report["after"] += os.path.getsize(cold)
+
+        if self._use_cache and report["compressed"] and not dry_run:
+            self.verified.save()
+        logger.info(
+            f"Compressed {len(report['compressed'])} files from {report['before']} "
+            f"to {report['after']} bytes"
+        )
+        return report
+
+    def space(self):
+        """
+        Report the space used by the store.
+
+        Returns
+        -------
+        dict
+           The number of bytes used by uncompressed files (``hot``), by
+           compressed files (``cold``), and by files decompressed into the
+           cache directory (``cache``), and the number of bytes which the
+           compressed files would use if they were decompressed
+           (``uncompressed``).
+        """
+        extensions = tuple(extension for extension, _ in CODECS.values())
+        sizes = {"hot": {}, "cold": {}, "cache": {}}
+        excluded = {".manifest", ".cache"}
+        for directory, subdirectories, files in os.walk(self.root):
+            if directory == self.root:
+                subdirectories[:] = [d for d in subdirectories if d not in excluded]
+            for name in files:
+                status = os.stat(os.path.join(directory, name))
+                tier = "cold" if name.endswith(extensions) else "hot"
+                sizes[tier][(status.st_dev, status.st_ino)] = status.st_size
+        for directory, _, files in os.walk(self.cache_directory):
+            for name in files:
+                status = os.stat(os.path.join(directory, name))
+                sizes["cache"][(status.st_dev, status.st_ino)] = status.st_size
+
+        uncompressed = 0
+        for extension, opener in CODECS.values():
+            for cold in pathlib.Path(self.root, ".objects").glob(f"*/*/*{extension}"):
+                with opener(cold, "rb") as infile:
+                    uncompressed += infile.seek(0, os.SEEK_END)
+        report = {tier: sum(values.values()) for tier, values in sizes.items()}
+        report["uncompressed"] = uncompressed
+        return report
+
+    def _ingest(self, source, algorithm):
+        """
+        Copy a file into a temporary file in the store's object
+        directory, calculating its hash at the same time.
+
+        Where the filesystem supports it the file is cloned rather than
+        copied, so that only its hash needs to be calculated.
+
+        Returns
+        -------
+        tuple
+           The path to the temporary file, the hash and size of the file,
+           and the time taken in seconds.
+        """
+        start = time.perf_counter()
+        directory = os.path.join(self.root, ".objects")
+        pathlib.Path(directory).mkdir(exist_ok=True)
+        handle, partial = tempfile.mkstemp(dir=directory, prefix=".", suffix=".partial")
+        os.close(handle)
+        try:
+            if reflink(source, partial):
+                hash = self._hash(partial, algorithm)
+            else:
+                hash = self._copy(source, partial, algorithm)
+        except BaseException:
+            os.remove(partial)
+            raise
+        return partial, hash, os.path.getsize(partial), time.perf_counter() - start
+
+    def add_files(self, event, production, files, threads=None):
+        """
+        Add several files to the store at once.
+
+        The files are copied and hashed in parallel, and the records for
+        all of them are written to the manifest together.
+        A file which can't be stored doesn't prevent the others from
+        being stored.
+
+        Each distinct file is only kept once, as an object named after
+        its hash in the store's ``.objects`` directory, and the file for
+        each production is linked to the object.
+
+        Parameters
+        ----------
+        event : str
+           The name of the event which the files are for.
+        production : str
+           The name of the production which the files are for.
+        files : list or dict
+           The paths to the files to be stored, or a dictionary of the
+           names which the files should be stored with, keyed by their
+           paths.
+           A name of None keeps the file's original name.
+        threads : int, optional
+           The largest number of files to copy at once.
+           Defaults to the value of `storage>ingest_threads` in the
+           configuration file, or 4.
+
+        Returns
+        -------
+        dict
+           A record of each file which was ``stored``, containing its
+           name, hash, UUID, hash algorithm, size in bytes, the number
+           of seconds taken to copy it, whether its content was already
+           in the store, and how it was linked to the object; the errors
+           for the files which ``failed``, keyed by their paths; and the
+           total number of ``bytes`` stored and the time ``elapsed`` in
+           seconds.
+        """
+        start = time.perf_counter()
+        algorithm = self.algorithm
+        if threads is None:
+            threads = config.getint("storage", "ingest_threads", fallback=4)
+        if not isinstance(files, dict):
+            files = dict.fromkeys(files)
+        report = {"stored": [], "failed": {}, "bytes": 0, "elapsed": 0}
+
+        names = {}
+        with self._lock:
+            for path, name in files.items():
+                name = name or os.path.basename(path)
+                if name in names.values() or self.manifest.has_record(
+                    event, production, name
+                ):
+                    report["failed"][path] = FileExistsError(
+                        f"{name} is already stored for {event}/{production}"
+                    )
+                else:
+                    names[path] = name
+
+        directory = os.path.join(self.root, event, production)
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(threads, len(names) or 1))
+        ) as pool:
+            copies = {
+                path: pool.submit(self._ingest, path, algorithm) for path in names
+            }
+
+        with self._lock:
+            for path, copy in copies.items():
+                self._record(
+                    event, production, names[path], path, copy, algorithm, report
+                )
+            if report["stored"]:
+                self.manifest.update()
+                self._written()
+                if self._use_cache:
+                    self.verified.save()
+        report["elapsed"] = time.perf_counter() - start
+        logger.info(
+            f"Stored {len(report['stored'])} files ({report['bytes']} bytes) for "
+            f"{event}/{production} in {report['elapsed']:.2f}s, "
+            f"{len(report['failed'])} failed"
+        )
+        return report
+
+    def _record(self, event, production, name, path, copy, algorithm, report):
+        """
+        Move a file which has been copied into the store into place, and
+        record it in the manifest.
+
+        This must be called while holding the store's lock.
+        """
+        try:
+            partial, hash, size, seconds = copy.result()
+        except OSError as error:
+            report["failed"][path] = error
+            return
+        directory = os.path.join(self.root, event, production)
+        destination = os.path.join(directory, name)
+        try:
+            # Another thread may have stored a file with this name since
+            # the names were checked.
+            if self.manifest.has_record(event, production, name):
+                raise FileExistsError(
+                    f"{name} is already stored for {event}/{production}"
+                )
+            stored = self._object(hash, algorithm)
+            duplicate = os.path.exists(stored)
+            if not duplicate:
+                pathlib.Path(os.path.dirname(stored)).mkdir(parents=True, exist_ok=True)
+                os.chmod(partial, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.replace(partial, stored)
+            method = link(stored, destination)
+        except OSError as error:
+            report["failed"][path] = error
+            return
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+        os.chmod(destination, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        this_uuid = uuid.uuid4()
+        self.manifest.add_record(event, production, name, hash, this_uuid, algorithm)
+        if self._use_cache:
+            self.verified.add(destination, {"algorithm": algorithm, "hash": hash})
+        report["stored"].append(
+            {
+                "file": name,
+                "hash": hash,
+                "uuid": this_uuid.urn,
+                "algorithm": algorithm,
+                "size": size,
+                "seconds": seconds,
+                "duplicate": duplicate,
+                "link": method,
+            }
+        )
+        report["bytes"] += size
+
     def add_file(self, event, production, file, new_name=None):
         """
         Add a file to the store.
@@ -274,33 +1457,107 @@ class Store:
 
         Returns
         -------
-        hash : str
-           The MD5 hash of the stored file.
+        dict
+           The name, hash, and UUID of the stored file, and the name of
+           the hash algorithm.
         """
-        hash = self._hash(file)
-        if hash in self.manifest.hash_dict:
-            raise AlreadyPresentException
-
-        pathlib.Path(os.path.join(self.root, event, production)).mkdir(
-            parents=True, exist_ok=True
-        )
+        report = self.add_files(event, production, {file: new_name}, threads=1)
+        if report["failed"]:
+            raise report["failed"][file]
+        record = report["stored"][0]
+        return {key: record[key] for key in ("file", "hash", "uuid", "algorithm")}
 
-        this_uuid = uuid.uuid4()
-
-        name = new_name if new_name else os.path.basename(file)
+    @property
+    def _use_cache(self):
+        return config.getboolean("storage", "verification_cache", fallback=True)
 
-        self.manifest.add_record(event, production, name, hash, this_uuid)
+    def _verify(self, path, record, full=False):
+        """
+        Check a stored file against its manifest record.
 
-        destination = os.path.join(self.root, event, production, name)
+        Parameters
+        ----------
+        path : str
+           The path to the stored file.
+        record : dict
+           The file's manifest record.
+        full : bool, optional
+           If true the file is hashed even if it has been verified before
+           and hasn't changed since.
 
-        copyfile(file, destination)
+        Returns
+        -------
+        bool
+           True if the file needed to be hashed.
 
-        os.chmod(destination, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        Raises
+        ------
+        HashError
+           If the file's hash doesn't match the record.
+        """
+        if self._use_cache and not full and self.verified.check(path, record):
+            return False
+        if self._hash(path, record["algorithm"]) != record["hash"]:
+            self.verified.discard(path)
+            raise HashError(
+                "The file in the file store's hash does not match the manifest."
+            )
+        if self._use_cache:
+            self.verified.add(path, record)
+        return True
 
-        self.manifest.update()
+    @_locked
+    def verify(self, event=None, production=None, full=False):
+        """
+        Check the stored files against the manifest.
 
-        return {"file": name, "hash": self._hash(destination), "uuid": this_uuid.urn}
+        Parameters
+        ----------
+        event : str, optional
+           The event whose files should be checked.
+           Defaults to all of the events.
+        production : str, optional
+           The production whose files should be checked.
+           Defaults to all of the productions.
+        full : bool, optional
+           If true every file is hashed, rather than only the files which
+           have changed since they were last verified.
 
+        Returns
+        -------
+        dict
+           The number of files which were ``hashed`` and which were
+           ``cached``, and the errors for those which ``failed``, keyed by
+           the path to the file.
+        """
+        report = {"hashed": 0, "cached": 0, "failed": {}}
+        for e_name, p_name, r_name, record in self.manifest.records(event, production):
+            path = os.path.join(self.root, e_name, p_name, r_name)
+            cold = None
+            if not os.path.exists(path):
+                cold = self._cold(record["hash"], record["algorithm"])
+            try:
+                if cold:
+                    with CODECS[cold[1]][1](cold[0], "rb") as infile:
+                        if (
+                            self._stream(infile, None, record["algorithm"])
+                            != record["hash"]
+                        ):
+                            raise HashError(
+                                "The compressed file's hash does not match the manifest."
+                            )
+                    hashed = True
+                else:
+                    hashed = self._verify(path, record, full=full)
+            except (HashError, OSError) as error:
+                report["failed"][path] = error
+                continue
+            report["hashed" if hashed else "cached"] += 1
+        if self._use_cache:
+            self.verified.save()
+        return report
+
+    @_locked
     def fetch_file(self, event, production, file, hash=None):
         """
         Retrieve a file from the store.
@@ -315,32 +1572,90 @@ class Store:
         file : str
            The name of the file to be retrieved.
         hash : str, optional
-           The expected MD5 hash of the file.
+           The expected hash of the file.
            If this is not provided the file will be verified against the store's manifest
            before being returned, but if a hash is provided it will be checked against
            the provided value.
+           Files which have already been verified are only hashed again
+           if their inode, size, or modification time has changed; use
+           `verify` to check every file in full.
+           Files which have been compressed by `tier` are decompressed
+           into the cache directory, and the path to the decompressed
+           file is returned.
 
         Returns
         -------
         path : str
            The path to the file.
         """
-        this_uuid = self.manifest.get_uuid(event, production, file)
-        resource = self.fetch_uuid(this_uuid)
-        stored_hash = self.manifest.get_hash(this_uuid)
-        file_hash = self._hash(resource)
-
-        if file_hash != stored_hash:
-            raise HashError(
-                "The file in the file store's hash does not match the manifest."
-            )
+        record = self.manifest.get_record(event, production, file)
+        resource, hashed = self._fetch(
+            self.fetch_uuid(record["uuid"]), record, event, production, file
+        )
+        if hashed and self._use_cache:
+            self.verified.save()
 
         if hash:
-            if hash != stored_hash:
+            if hash != record["hash"]:
                 raise HashError("The manifest hash does not match the check hash.")
 
         return resource
 
+    def _fetch(self, resource, record, event, production, file):
+        """
+        Verify a stored file, decompressing it first if it is in cold
+        storage.
+
+        Returns
+        -------
+        tuple
+           The path to the file, and whether it had to be hashed.
+        """
+        if not os.path.exists(resource) and self._cold(
+            record["hash"], record["algorithm"]
+        ):
+            resource = self._thaw(record, event, production, file)
+        return resource, self._verify(resource, record)
+
+    @_locked
+    def fetch_files(self, event=None, production=None):
+        """
+        Retrieve every file for an event or production, or every file in
+        the store, reading the manifest once.
+
+        Each file is verified in the same way as by `fetch_file`.
+
+        Parameters
+        ----------
+        event : str, optional
+           The name of the event whose files should be retrieved.
+        production : str, optional
+           The name of the production whose files should be retrieved.
+
+        Returns
+        -------
+        dict
+           The paths to the files which were ``fetched``, keyed by event,
+           production, and file name, and the errors for those which
+           couldn't be verified, keyed by their path in the store.
+        """
+        report = {"fetched": {}, "failed": {}}
+        hashed = False
+        for e_name, p_name, r_name, record in self.manifest.records(event, production):
+            path = os.path.join(self.root, e_name, p_name, r_name)
+            try:
+                path, checked = self._fetch(path, record, e_name, p_name, r_name)
+            except (HashError, OSError) as error:
+                report["failed"][path] = error
+                continue
+            hashed = hashed or checked
+            report["fetched"].setdefault(e_name, {}).setdefault(p_name, {})[
+                r_name
+            ] = path
+        if hashed and self._use_cache:
+            self.verified.save()
+        return report
+
     def fetch_uuid(self, uuid):
         """
         Retrieve a file from the store from its uuid.
@@ -355,4 +1670,4 @@ class Store:
         file : str
            The path to the file.
         """
-        return self.manifest.uuid_dict[uuid]
+        return self.manifest.locate(uuid)
@@ -1,13 +1,22 @@
 import collections
+import datetime
 import glob
 import os
+import threading
+import time
 from contextlib import contextmanager
 from copy import deepcopy
 from pathlib import Path
 
 import numpy as np
 
-from asimov import logger
+from asimov import config, logger
+
+
+#: The working directory is shared by every thread, so this lock is held
+#: while a thread works in another directory. Threads which use relative
+#: paths while others may be changing directory should also hold it.
+directory_lock = threading.RLock()
 
 
 @contextmanager
@@ -15,6 +24,8 @@ def set_directory(path: (Path, str)):
     """
     Change to a different directory for the duration of the context.
 
+    Only one thread can work in another directory at a time.
+
     Args:
         path (Path): The path to the cwd
 
@@ -22,14 +33,78 @@ def set_directory(path: (Path, str)):
         None
     """
 
-    origin = Path().absolute()
-    try:
-        logger.info(f"Working temporarily in {path}")
-        os.chdir(path)
-        yield
-    finally:
-        os.chdir(origin)
-        logger.info(f"Now working in {origin} again")
+    with directory_lock:
+        origin = Path().absolute()
+        try:
+            logger.info(f"Working temporarily in {path}")
+            os.chdir(path)
+            yield
+        finally:
+            os.chdir(origin)
+            logger.info(f"Now working in {origin} again")
+
+
+#: The time spent waiting in `wait_until`, keyed by what was waited for.
+waits = collections.defaultdict(
+    lambda: {"count": 0, "total": 0.0, "longest": 0.0, "timeouts": 0}
+)
+
+
+def wait_until(check, timeout, description="a condition", interval=None, backoff=None):
+    """
+    Wait until a condition is met, checking it repeatedly with an
+    increasing interval between checks.
+
+    The time spent waiting is logged and added to `waits`.
+
+    Parameters
+    ----------
+    check : callable
+       A function which returns true once the condition is met.
+    timeout : float
+       The longest time to wait, in seconds.
+    description : str, optional
+       A description of what is being waited for, which is used in the
+       log and as the key in `waits`.
+    interval : float, optional
+       The time between the first two checks, in seconds.
+       Defaults to the value of `general>poll_interval` in the
+       configuration file, or 0.5 seconds.
+    backoff : float, optional
+       The factor by which the interval increases after each check, up
+       to a maximum of 10 seconds.
+       Defaults to the value of `general>poll_backoff` in the
+       configuration file, or 2.
+
+    Returns
+    -------
+    bool
+       True if the condition was met before the timeout.
+    """
+    if interval is None:
+        interval = config.getfloat("general", "poll_interval", fallback=0.5)
+    if backoff is None:
+        backoff = config.getfloat("general", "poll_backoff", fallback=2)
+
+    start = time.monotonic()
+    while True:
+        ready = check()
+        elapsed = time.monotonic() - start
+        if ready or elapsed >= timeout:
+            break
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * backoff, 10)
+
+    record = waits[description]
+    record["count"] += 1
+    record["total"] += elapsed
+    record["longest"] = max(record["longest"], elapsed)
+    if ready:
+        logger.info(f"Waited {elapsed:.1f}s for {description}")
+    else:
+        record["timeouts"] += 1
+        logger.warning(f"Gave up waiting for {description} after {elapsed:.1f}s")
+    return bool(ready)
 
 
 def find_calibrations(time):
@@ -79,6 +154,144 @@ def update(d, u, inplace=True):
     return d
 
 
+#: Types which can be shared between layers without being copied.
+IMMUTABLE = (str, bytes, int, float, complex, bool, type(None), datetime.date)
+
+
+class LayeredDict(collections.abc.MutableMapping):
+    """
+    A dictionary which combines several layers of settings without
+    copying them.
+
+    Looking up a key returns the value from the highest layer which
+    contains it.
+    If the value is a dictionary in more than one layer the result is
+    itself a `LayeredDict`, so that nested settings are combined in the
+    same way as `update`.
+
+    The layers are never changed.
+    Values which are set or deleted are stored in the `LayeredDict`
+    itself, and lists and other mutable values are copied the first
+    time that they are looked up, so that changing them does not affect
+    the layers.
+
+    Changes which are made to the layers later are seen by the
+    `LayeredDict`, but only for keys which it hasn't looked up yet.
+    Strings, numbers and other immutable values are always looked up in
+    the layers. A list or other mutable value is only copied once, so
+    changes to a layer after that copy are not seen. A nested dictionary
+    is combined from the layers which contained it when it was first
+    looked up.
+    Deleting a key with ``del`` doesn't copy its value, but ``pop``
+    does, because it has to return the value.
+
+    Parameters
+    ----------
+    *layers : dict
+       The layers, starting with the lowest priority layer.
+
+    Examples
+    --------
+    >>> project = {"likelihood": {"sample rate": 2048, "psd length": 4}}
+    >>> analysis = LayeredDict(project, {"likelihood": {"sample rate": 4096}})
+    >>> analysis["likelihood"]["sample rate"]
+    4096
+    >>> analysis["likelihood"]["psd length"] = 8
+    >>> project["likelihood"]["psd length"]
+    4
+    """
+
+    def __init__(self, *layers):
+        self.layers = list(layers)
+        self.local = {}
+        self.deleted = set()
+
+    def __getitem__(self, key):
+        if key in self.local:
+            return self.local[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        mappings = []
+        for layer in reversed(self.layers):
+            if key not in layer:
+                continue
+            value = layer[key]
+            if isinstance(value, collections.abc.Mapping):
+                mappings.append(value)
+            elif mappings:
+                break
+            elif isinstance(value, IMMUTABLE):
+                return value
+            else:
+                self.local[key] = deepcopy(value)
+                return self.local[key]
+        if not mappings:
+            raise KeyError(key)
+        self.local[key] = LayeredDict(*reversed(mappings))
+        return self.local[key]
+
+    def __setitem__(self, key, value):
+        self.local[key] = value
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.local.pop(key, None)
+        self.deleted.add(key)
+
+    def __contains__(self, key):
+        if key in self.local:
+            return True
+        if key in self.deleted:
+            return False
+        return any(key in layer for layer in self.layers)
+
+    def _keys(self):
+        keys = {}
+        for layer in self.layers + [self.local]:
+            for key in layer:
+                if key not in self.deleted or key in self.local:
+                    keys[key] = None
+        return list(keys)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.materialise()!r})"
+
+    def materialise(self):
+        """
+        Return the combined settings as an ordinary dictionary.
+
+        Returns
+        -------
+        dict
+           A dictionary which does not share any mutable values with the
+           layers.
+        """
+        return {
+            key: (
+                value.materialise()
+                if isinstance(value, LayeredDict)
+                else deepcopy(dict(value))
+                if isinstance(value, collections.abc.Mapping)
+                else deepcopy(value)
+            )
+            for key, value in self.items()
+        }
+
+    def __copy__(self):
+        return self.materialise()
+
+    def __deepcopy__(self, memo):
+        return self.materialise()
+
+
 # The following function adapted from https://stackoverflow.com/a/69908295
 def diff_dict(d1, d2):
     d1_keys = set(d1.keys())
@@ -95,7 +308,7 @@ def diff_dict(d1, d2):
 def parse_deltas(deltas: dict):
     res = {}
     for k, v in deltas.items():
-        if isinstance(v[0], dict):
+        if isinstance(v[0], collections.abc.Mapping):
             tmp = diff_dict(v[0], v[1])
             if tmp:
                 res[k] = tmp
@@ -0,0 +1,55 @@
+"""
+Benchmark the SQLite ledger database against the YAML ledger.
+
+This measures the time taken to open each ledger and find a single
+production by its job id, and the time taken to migrate the YAML ledger
+into a database.
+
+Usage::
+
+   python database_ledger.py [N_PRODUCTIONS ...]
+"""
+
+import os
+import shutil
+import sys
+import time
+
+from asimov.ledger import DatabaseLedger, YAMLLedger
+
+from synthetic import make_project_ledger
+
+PRODUCTIONS_PER_EVENT = 10
+
+
+def measure(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(
+        f"{'Productions':>12} {'Migrate (s)':>12} {'YAML (s)':>10} {'SQLite (s)':>11}"
+    )
+    for size in sizes:
+        events = size // PRODUCTIONS_PER_EVENT
+        location = make_project_ledger(events, productions=PRODUCTIONS_PER_EVENT)
+        database = os.path.join(os.path.dirname(location), "ledger.db")
+        job = {"job id": 1000 + size // 2}
+
+        migrate = measure(lambda: DatabaseLedger.migrate(location, database))
+        yaml_time = measure(
+            lambda: YAMLLedger(location, cache=False).get_productions(filters=job)
+        )
+        sqlite_time = measure(
+            lambda: DatabaseLedger(database).get_productions(filters=job)
+        )
+        print(f"{size:>12} {migrate:>12.3f} {yaml_time:>10.3f} {sqlite_time:>11.3f}")
+        os.chdir(os.path.expanduser("~"))
+        shutil.rmtree(os.path.dirname(os.path.dirname(location)))
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000]
+    main(sizes)
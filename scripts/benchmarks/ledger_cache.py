@@ -0,0 +1,48 @@
+"""
+Benchmark the snapshot cache of the parsed ledger.
+
+This compares the time taken to open a YAML ledger when it is parsed
+from the ledger file with the time taken when it is read from the
+snapshot cache.
+
+Usage::
+
+   python ledger_cache.py [N_EVENTS ...]
+"""
+
+import os
+import shutil
+import sys
+import time
+
+from asimov.ledger import YAMLLedger
+
+from synthetic import make_project_ledger
+
+
+def measure(location, cache, repeats=5):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        YAMLLedger(location, cache=cache)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    print(f"{'Events':>8} {'Parsed (s)':>12} {'Cached (s)':>12}")
+    for size in sizes:
+        location = make_project_ledger(size)
+        # Open the ledger once so that the snapshot exists.
+        YAMLLedger(location, cache=True)
+        parsed = measure(location, cache=False)
+        cached = measure(location, cache=True)
+        print(f"{size:>8} {parsed:>12.3f} {cached:>12.3f}")
+        os.chdir(os.path.expanduser("~"))
+        shutil.rmtree(os.path.dirname(os.path.dirname(location)))
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10, 100, 1000]
+    main(sizes)
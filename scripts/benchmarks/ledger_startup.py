@@ -0,0 +1,46 @@
+"""
+Benchmark the cost of opening a ledger as the number of events grows.
+
+This compares the time taken to open a YAML ledger and retrieve a single
+event when all events are constructed eagerly and when they are
+constructed lazily.
+
+Usage::
+
+   python ledger_startup.py [N_EVENTS ...]
+"""
+
+import os
+import shutil
+import sys
+import time
+
+from asimov.ledger import YAMLLedger
+
+from synthetic import make_project_ledger
+
+
+def measure(location, lazy, event):
+    start = time.perf_counter()
+    ledger = YAMLLedger(location, lazy=lazy)
+    ledger.get_event(event)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'Events':>8} {'Eager (s)':>12} {'Lazy (s)':>12}")
+    for size in sizes:
+        location = make_project_ledger(size)
+        # Open the ledger once so that working directories exist
+        # before any timing is performed.
+        YAMLLedger(location, lazy=False)
+        eager = measure(location, lazy=False, event="S000000xx")
+        lazy = measure(location, lazy=True, event="S000000xx")
+        print(f"{size:>8} {eager:>12.3f} {lazy:>12.3f}")
+        os.chdir(os.path.expanduser("~"))
+        shutil.rmtree(os.path.dirname(os.path.dirname(location)))
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10, 50, 100, 250]
+    main(sizes)
@@ -0,0 +1,70 @@
+"""
+Benchmark the cost of applying project and pipeline defaults to
+productions.
+
+This measures the time and memory taken to construct every production
+in a ledger whose pipeline defaults and postprocessing settings are
+large, as they are shared between all of the productions.
+
+Usage::
+
+   python production_defaults.py [N_PRODUCTIONS ...]
+"""
+
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+from asimov import serialisation
+from asimov.ledger import YAMLLedger
+
+from synthetic import make_project_ledger
+
+PRODUCTIONS_PER_EVENT = 10
+DEFAULT_SETTINGS = 200
+
+
+def add_defaults(location):
+    """
+    Add large pipeline defaults and postprocessing settings to a ledger.
+    """
+    with open(location, "r") as ledger_file:
+        data = serialisation.load(ledger_file)
+    settings = {
+        f"section {i}": {f"setting {j}": [j, j + 1] for j in range(10)}
+        for i in range(DEFAULT_SETTINGS // 10)
+    }
+    data["pipelines"] = {"bilby": {"sampler": settings, "scheduler": {"cpus": 4}}}
+    data["postprocessing"] = {"pesummary": settings}
+    with open(location, "w") as ledger_file:
+        ledger_file.write(serialisation.dump(data, default_flow_style=False))
+
+
+def main(sizes):
+    print(f"{'Productions':>12} {'Time (s)':>10} {'Peak memory (MB)':>17}")
+    for size in sizes:
+        location = make_project_ledger(
+            size // PRODUCTIONS_PER_EVENT, productions=PRODUCTIONS_PER_EVENT
+        )
+        add_defaults(location)
+        ledger = YAMLLedger(location, cache=False)
+        events = ledger.get_event()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        for event in events:
+            event.productions
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{size:>12} {elapsed:>10.3f} {peak / 1e6:>17.1f}")
+        os.chdir(os.path.expanduser("~"))
+        shutil.rmtree(os.path.dirname(os.path.dirname(location)))
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [100, 1000]
+    main(sizes)
@@ -0,0 +1,84 @@
+"""
+Benchmark finding productions in the ledger.
+
+This compares the time taken to find productions by checking every
+production in the ledger against a set of filters with the time taken
+using the production index.
+
+Usage::
+
+   python production_queries.py [N_PRODUCTIONS ...]
+"""
+
+import os
+import shutil
+import sys
+import time
+
+from asimov.ledger import YAMLLedger
+from asimov.query import Not, matches
+
+from synthetic import make_project_ledger
+
+PRODUCTIONS_PER_EVENT = 10
+
+
+def scan(ledger, event=None, filters=None):
+    """
+    Find productions by checking every production in the ledger.
+    """
+    events = ledger.get_event(event)
+    return [
+        production
+        for event_i in events
+        for production in event_i.productions
+        if matches(production, filters or {})
+    ]
+
+
+def measure(function, repeats=20):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(sizes):
+    print(
+        f"{'Productions':>12} {'Query':>28} {'Matches':>8}"
+        f" {'Scan (ms)':>10} {'Index (ms)':>11}"
+    )
+    for size in sizes:
+        events = size // PRODUCTIONS_PER_EVENT
+        location = make_project_ledger(events, productions=PRODUCTIONS_PER_EVENT)
+        ledger = YAMLLedger(location, lazy=False)
+
+        start = time.perf_counter()
+        ledger.production_index
+        print(
+            f"{size:>12} {'(build index)':>28} {'':>8} {'':>10}"
+            f" {1000 * (time.perf_counter() - start):>11.1f}"
+        )
+
+        queries = {
+            "job id": dict(filters={"job id": 1000 + size // 2}),
+            "event + status": dict(event="S000001xx", filters={"status": "running"}),
+            "status in {stuck, ready}": dict(filters={"status": {"stuck", "ready"}}),
+            "not uploaded": dict(filters={"status": Not("uploaded")}),
+        }
+        for name, query in queries.items():
+            found = len(ledger.get_productions(**query))
+            assert found == len(scan(ledger, **query))
+            linear = measure(lambda: scan(ledger, **query))
+            indexed = measure(lambda: ledger.get_productions(**query))
+            print(
+                f"{size:>12} {name:>28} {found:>8}"
+                f" {1000 * linear:>10.2f} {1000 * indexed:>11.2f}"
+            )
+        os.chdir(os.path.expanduser("~"))
+        shutil.rmtree(os.path.dirname(os.path.dirname(location)))
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000]
+    main(sizes)
@@ -0,0 +1,73 @@
+"""
+Benchmark fetching files from the cold tier of the results store.
+
+This compares the time taken to fetch every file in a store when the
+files are uncompressed, when they have been compressed and must be
+decompressed, and when they have already been decompressed into the
+cache.
+
+Usage::
+
+   python store_tiering.py [FILE_SIZE_MB] [N_FILES ...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from asimov.storage import CODECS, Store
+
+
+def make_store(files, size):
+    root = tempfile.mkdtemp(prefix="asimov-benchmark-")
+    store_root = os.path.join(root, "store")
+    Store.create(store_root, "Benchmark store")
+    store = Store(root=store_root)
+    for i in range(files):
+        source = os.path.join(root, f"posterior_{i}.dat")
+        with open(source, "wb") as f:
+            # Half random and half repeated, so that the files compress
+            # about as well as posterior samples do.
+            f.write(os.urandom(size // 2) + b"0123456789abcdef" * (size // 32))
+        store.add_file("S000000xx", f"Prod{i}", source)
+        os.remove(source)
+    return root, store_root
+
+
+def measure(store_root, files):
+    start = time.perf_counter()
+    store = Store(root=store_root)
+    for i in range(files):
+        store.fetch_file("S000000xx", f"Prod{i}", f"posterior_{i}.dat")
+    return time.perf_counter() - start
+
+
+def main(size, counts):
+    print(
+        f"{'Files':>8} {'Size (MB)':>10} {'Codec':>6} {'Hot (s)':>10} "
+        f"{'Cold (s)':>10} {'Cached (s)':>11} {'Reclaimed (MB)':>15}"
+    )
+    for files in counts:
+        for codec in sorted(CODECS):
+            root, store_root = make_store(files, int(size * 1024 * 1024))
+            hot = measure(store_root, files)
+            report = Store(root=store_root).tier(age=0, codec=codec)
+            reclaimed = (report["before"] - report["after"]) / 1024**2
+            cold = measure(store_root, files)
+            cached = measure(store_root, files)
+            print(
+                f"{files:>8} {size:>10} {codec:>6} {hot:>10.3f} "
+                f"{cold:>10.3f} {cached:>11.3f} {reclaimed:>15.1f}"
+            )
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    os.chmod(os.path.join(directory, name), 0o600)
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 16
+    counts = [int(count) for count in sys.argv[2:]] or [10, 50]
+    main(size, counts)
@@ -0,0 +1,62 @@
+"""
+Benchmark the verification cache of the results store.
+
+This compares the time taken to fetch every file in a store when each
+file is hashed with the time taken when unchanged files are found in
+the verification cache.
+
+Usage::
+
+   python store_verification.py [FILE_SIZE_MB] [N_FILES ...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from asimov import config
+from asimov.storage import Store
+
+
+def make_store(files, size):
+    root = tempfile.mkdtemp(prefix="asimov-benchmark-")
+    store_root = os.path.join(root, "store")
+    Store.create(store_root, "Benchmark store")
+    store = Store(root=store_root)
+    for i in range(files):
+        source = os.path.join(root, f"posterior_{i}.dat")
+        with open(source, "wb") as f:
+            f.write(os.urandom(size))
+        store.add_file("S000000xx", f"Prod{i}", source)
+        os.remove(source)
+    return root, store_root
+
+
+def measure(store_root, files, cache):
+    config.set("storage", "verification_cache", str(cache))
+    start = time.perf_counter()
+    store = Store(root=store_root)
+    for i in range(files):
+        store.fetch_file("S000000xx", f"Prod{i}", f"posterior_{i}.dat")
+    return time.perf_counter() - start
+
+
+def main(size, counts):
+    print(f"{'Files':>8} {'Size (MB)':>10} {'Hashed (s)':>12} {'Cached (s)':>12}")
+    for files in counts:
+        root, store_root = make_store(files, int(size * 1024 * 1024))
+        hashed = measure(store_root, files, cache=False)
+        cached = measure(store_root, files, cache=True)
+        print(f"{files:>8} {size:>10} {hashed:>12.3f} {cached:>12.3f}")
+        for directory, _, names in os.walk(root):
+            for name in names:
+                os.chmod(os.path.join(directory, name), 0o600)
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 16
+    counts = [int(count) for count in sys.argv[2:]] or [10, 50]
+    main(size, counts)
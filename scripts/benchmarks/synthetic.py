@@ -0,0 +1,98 @@
+"""
+Helpers for constructing synthetic asimov projects for benchmarking.
+
+These create a throwaway project containing an arbitrary number of
+events and productions, so that the cost of ledger operations can be
+measured as a function of the size of a project.
+"""
+
+import os
+import tempfile
+
+import git
+import yaml
+
+from asimov.cli.project import make_project
+
+
+def make_event(name, repository, productions=2, first_job=1000):
+    """
+    Make the ledger entry for a synthetic event.
+
+    Parameters
+    ----------
+    name : str
+       The name of the event.
+    repository : str
+       The path to a git repository to use as the event repository.
+    productions : int
+       The number of productions to attach to the event.
+    first_job : int
+       The job id of the first production; each subsequent production
+       has the next job id.
+    """
+    event = {
+        "name": name,
+        "repository": repository,
+        "event time": 1126259462.391,
+        "interferometers": ["H1", "L1"],
+        "likelihood": {"sample rate": 2048},
+        "quality": {"minimum frequency": {"H1": 20, "L1": 20}},
+        "productions": [],
+    }
+    statuses = ["ready", "running", "finished", "uploaded", "stuck"]
+    for i in range(productions):
+        event["productions"].append(
+            {
+                f"Prod{i}": {
+                    "pipeline": "bilby",
+                    "status": statuses[i % len(statuses)],
+                    "comment": "Synthetic production",
+                    "job id": first_job + i,
+                }
+            }
+        )
+    return event
+
+
+def make_project_ledger(events, productions=2, root=None):
+    """
+    Create a project with a synthetic ledger.
+
+    Parameters
+    ----------
+    events : int
+       The number of events to include in the ledger.
+    productions : int
+       The number of productions for each event.
+    root : str, optional
+       The directory to create the project in.
+       Defaults to a new temporary directory.
+
+    Returns
+    -------
+    str
+       The path to the ledger file.
+    """
+    if not root:
+        root = tempfile.mkdtemp(prefix="asimov-benchmark-")
+    make_project(name="Benchmark project", root=root)
+
+    # A single repository is shared by all of the events so that the
+    # cost of cloning repositories does not dominate the measurement.
+    repository = os.path.join(root, "checkouts", "shared")
+    os.makedirs(repository, exist_ok=True)
+    git.Repo.init(repository)
+
+    location = os.path.join(root, ".asimov", "ledger.yml")
+    with open(location, "r") as ledger_file:
+        data = yaml.safe_load(ledger_file)
+    data["events"] = [
+        make_event(
+            f"S{i:06d}xx", repository, productions, first_job=1000 + i * productions
+        )
+        for i in range(events)
+    ]
+    with open(location, "w") as ledger_file:
+        ledger_file.write(yaml.dump(data, default_flow_style=False))
+    return location
@@ -0,0 +1,59 @@
+"""
+Benchmark loading and dumping synthetic ledgers with and without libyaml.
+
+Usage::
+
+   python yaml_serialisation.py [N_PRODUCTIONS ...]
+"""
+
+import sys
+import time
+
+import yaml
+
+from asimov import serialisation
+
+from synthetic import make_event
+
+PRODUCTIONS_PER_EVENT = 10
+
+
+def make_ledger(productions):
+    events = max(1, productions // PRODUCTIONS_PER_EVENT)
+    return {
+        "project": {"name": "Benchmark project"},
+        "events": [
+            make_event(f"S{i:06d}xx", "checkouts/shared", PRODUCTIONS_PER_EVENT)
+            for i in range(events)
+        ],
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    output = function(*args, **kwargs)
+    return time.perf_counter() - start, output
+
+
+def main(sizes):
+    if not serialisation.LIBYAML:
+        print("libyaml is not available; both columns use the python implementation")
+    print(
+        f"{'Productions':>12} {'Load (py)':>10} {'Load (C)':>10} "
+        f"{'Dump (py)':>10} {'Dump (C)':>10}"
+    )
+    for size in sizes:
+        data = make_ledger(size)
+        dump_py, text = timed(yaml.dump, data, default_flow_style=False)
+        dump_c, _ = timed(serialisation.dump, data, default_flow_style=False)
+        load_py, _ = timed(yaml.safe_load, text)
+        load_c, _ = timed(serialisation.load, text)
+        print(
+            f"{size:>12} {load_py:>10.3f} {load_c:>10.3f} "
+            f"{dump_py:>10.3f} {dump_c:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [100, 1000, 10000]
+    main(sizes)
@@ -1,8 +1,10 @@
+import configparser
 import unittest
 import os
 import shutil
 from click.testing import CliRunner
 from asimov.cli import project
+from asimov.ledger import YAMLDirectoryLedger
 
 class TestCLI_Projects(unittest.TestCase):
     @classmethod
@@ -34,3 +36,24 @@ class TestCLI_Projects(unittest.TestCase):
         result = runner.invoke(project.init,
                                [ '--root', f"{self.cwd}/tests/tmp/project"])
         assert result.exit_code == 2
+
+    def test_clone_keeps_ledger_engine(self):
+        """Check that a project with a ledger directory can be cloned"""
+        source = f"{self.cwd}/tests/tmp/source"
+        os.makedirs(f"{source}/results")
+        YAMLDirectoryLedger.create(name="Source Project", location=f"{source}/ledger")
+        config = configparser.ConfigParser()
+        config["project"] = {"name": "Source Project"}
+        config["storage"] = {"results_store": "results"}
+        config["ledger"] = {"engine": "yamldirectory", "location": "ledger"}
+        with open(f"{source}/asimov.conf", "w") as config_file:
+            config.write(config_file)
+
+        os.makedirs(".asimov")
+        runner = CliRunner()
+        result = runner.invoke(project.clone, [source])
+        assert result.exit_code == 0, result.output
+        config.read(".asimov/asimov.conf")
+        assert config.get("ledger", "engine") == "yamldirectory"
+        ledger = YAMLDirectoryLedger(config.get("ledger", "location"))
+        assert ledger.data["project"]["name"] == "Source Project"
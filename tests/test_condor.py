@@ -1,26 +1,38 @@
+import contextlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import types
 import unittest
+from unittest import mock
 
 import asimov
 import asimov.condor
+from asimov import config
 
-class CondorTests(unittest.TestCase):
 
-# @classmethod
-#     def setUpClass(cls):
-#         cls.app = app = asimov.server.create_app()
-#         app.config.update({
-#         "TESTING": True,
-#         })
-#         cls.client = cls.app.test_client()
+class CondorTests(unittest.TestCase):
 
+    # @classmethod
+    #     def setUpClass(cls):
+    #         cls.app = app = asimov.server.create_app()
+    #         app.config.update({
+    #         "TESTING": True,
+    #         })
+    #         cls.client = cls.app.test_client()
 
     def test_job_from_dict(self):
         """Check that a CondorJob object can be created from a dictionary."""
 
-        dictionary = {"id": 450,
-                      "command": "test.sh",
-                      "hosts": "test.test.com",
-                      "status": 1}
+        dictionary = {
+            "id": 450,
+            "command": "test.sh",
+            "hosts": "test.test.com",
+            "status": 1,
+        }
 
         job = asimov.condor.CondorJob.from_dict(dictionary)
 
@@ -28,11 +40,441 @@ class CondorTests(unittest.TestCase):
 
     def test_status(self):
         """Check that status codes get translated to a human-readable string."""
-        dictionary = {"id": 450,
-                      "command": "test.sh",
-                      "hosts": "test.test.com",
-                      "status": 1}
+        dictionary = {
+            "id": 450,
+            "command": "test.sh",
+            "hosts": "test.test.com",
+            "status": 1,
+        }
 
         job = asimov.condor.CondorJob.from_dict(dictionary)
 
         self.assertEqual(job.status, "Idle")
+
+
+class FakeSchedd:
+    """A scheduler which returns a fixed list of jobs."""
+
+    #: The behaviour of each scheduler, keyed by name.
+    behaviour = {}
+
+    #: The number of scheduler handles which have been made.
+    created = 0
+
+    #: The schedulers which don't accept any jobs.
+    rejecting = set()
+
+    def __init__(self, schedd_ad):
+        FakeSchedd.created += 1
+        self.name = schedd_ad["Name"]
+        self.actions = []
+
+    @contextlib.contextmanager
+    def transaction(self):
+        if self.name in self.rejecting:
+            raise fake_htcondor.HTCondorIOError(self.name)
+        yield self
+
+    def act(self, action, constraint):
+        self.actions.append((action, constraint))
+
+    #: The jobs in the scheduler's history.
+    finished = []
+
+    def history(self, constraint, projection=None):
+        self.constraints.append(constraint)
+        return self._select(self.finished, constraint)
+
+    #: The constraints which the schedulers have been queried with.
+    constraints = []
+
+    def query(self, constraint="true", opts=None, projection=None):
+        self.constraints.append(constraint)
+        jobs, delay, error = self.behaviour[self.name]
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise error
+        return self._select(jobs, constraint)
+
+    @staticmethod
+    def _select(jobs, constraint):
+        if constraint == "true":
+            return jobs
+        if constraint.startswith("ClusterId == "):
+            ids = {int(constraint.split("==")[1])}
+        else:
+            ids = {
+                int(idno)
+                for idno in re.search(r"\{(.*?)\}", constraint).group(1).split(",")
+            }
+        return [
+            job
+            for job in jobs
+            if job["ClusterId"] in ids or job.get("DAGManJobId") in ids
+        ]
+
+
+class FakeSubmit:
+    def __init__(self, description):
+        self.description = description
+
+    def queue(self, txn):
+        return {"schedd1": 100, "schedd2": 200, "schedd3": 300}[txn.name]
+
+
+class FakeCollector:
+    schedulers = []
+
+    #: The number of times the collector has been asked for schedulers.
+    calls = 0
+
+    def locateAll(self, daemon_type):
+        FakeCollector.calls += 1
+        return [{"Name": name} for name in self.schedulers]
+
+    def locate(self, daemon_type, name):
+        FakeCollector.calls += 1
+        if name not in self.schedulers:
+            raise fake_htcondor.HTCondorLocateError(name)
+        return {"Name": name}
+
+
+fake_htcondor = types.SimpleNamespace(
+    Schedd=FakeSchedd,
+    Collector=FakeCollector,
+    Submit=FakeSubmit,
+    JobAction=types.SimpleNamespace(Remove="Remove"),
+    DaemonTypes=types.SimpleNamespace(Schedd="Schedd"),
+    QueryOpts=types.SimpleNamespace(DefaultMyJobsOnly=1),
+    HTCondorLocateError=type("HTCondorLocateError", (RuntimeError,), {}),
+    HTCondorIOError=type("HTCondorIOError", (RuntimeError,), {}),
+)
+
+
+def job(idno, dag=None):
+    ad = {
+        "ClusterId": idno,
+        "Cmd": "test.sh",
+        "CurrentHosts": 1,
+        "JobStatus": 2,
+    }
+    if dag:
+        ad["DAGManJobId"] = dag
+    return ad
+
+
+def finished(
+    idno,
+    dag=None,
+    cpus=1,
+    gpus=0,
+    runtime=3600,
+    suspended=0,
+    memory=None,
+    start=1699996000,
+):
+    ad = {
+        "ClusterId": idno,
+        "CompletionDate": 1700000000,
+        "EnteredCurrentStatus": 1700000000,
+        "JobStartDate": start,
+        "CpusProvisioned": cpus,
+        "GpusProvisioned": gpus,
+        "RemoteWallClockTime": runtime,
+        "CumulativeSuspensionTime": suspended,
+    }
+    if dag:
+        ad["DAGManJobId"] = dag
+    if memory:
+        ad["MemoryUsage"] = memory
+    return ad
+
+
+class FakeCondorTestCase(unittest.TestCase):
+    """Run tests in an empty project, with a fake condor pool."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.makedirs(".asimov")
+        self.settings = dict(config["condor"])
+        config.set("condor", "query_timeout", "60")
+        config.set("condor", "scheduler", "schedd2")
+        FakeCollector.schedulers = ["schedd1", "schedd2", "schedd3"]
+        FakeSchedd.constraints = []
+        FakeSchedd.created = 0
+        FakeSchedd.rejecting = set()
+        FakeCollector.calls = 0
+        FakeSchedd.finished = [
+            finished(200, runtime=100, suspended=10),
+            finished(10, runtime=5000, memory=50),
+            finished(11, dag=10, cpus=4, memory=2000, start=1699990000),
+            finished(12, dag=10, cpus=2, gpus=1, memory=3000),
+            finished(20, cpus=1),
+        ]
+        FakeSchedd.behaviour = {
+            "schedd1": ([job(1), job(2, dag=1)], 0, None),
+            "schedd2": ([job(3)], 0, None),
+            "schedd3": ([job(4)], 0, None),
+        }
+        for name, value in (
+            ("htcondor", fake_htcondor),
+            ("scheduler", asimov.condor.SchedulerConnection()),
+        ):
+            patcher = mock.patch.object(asimov.condor, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+        config.remove_section("condor")
+        config.add_section("condor")
+        for key, value in self.settings.items():
+            config.set("condor", key, value)
+
+
+class CondorRefreshTests(FakeCondorTestCase):
+    """Check that the job list is collected from several schedulers."""
+
+    def test_all_schedulers(self):
+        """Check that jobs are collected from every scheduler."""
+        jobs = asimov.condor.CondorJobList()
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+        self.assertEqual([subjob.idno for subjob in jobs.jobs[1].subjobs], [2])
+        self.assertEqual(jobs.stats["schedd1"]["jobs"], 2)
+        self.assertIsNone(jobs.stats["schedd1"]["error"])
+        self.assertTrue(os.path.exists(os.path.join(".asimov", "_cache_jobs.yaml")))
+
+    def test_failed_scheduler(self):
+        """Check that a failing scheduler doesn't prevent others being read."""
+        FakeSchedd.behaviour["schedd2"] = ([], 0, RuntimeError("Unavailable"))
+        jobs = asimov.condor.CondorJobList()
+        self.assertEqual(sorted(jobs.jobs), [1, 4])
+        self.assertEqual(jobs.stats["schedd2"]["error"], "Unavailable")
+
+    def test_slow_scheduler(self):
+        """Check that a scheduler which doesn't respond is skipped."""
+        config.set("condor", "query_timeout", "0.2")
+        FakeSchedd.behaviour["schedd3"] = ([job(4)], 3, None)
+        start = time.monotonic()
+        jobs = asimov.condor.CondorJobList()
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(sorted(jobs.jobs), [1, 3])
+        self.assertEqual(jobs.stats["schedd3"]["error"], "timed out")
+
+    def test_hung_scheduler_exit(self):
+        """Check that a scheduler which never responds can't block exiting."""
+        config.set("condor", "query_timeout", "0.2")
+        config.set("condor", "query_threads", "1")
+        release = threading.Event()
+        self.addCleanup(release.set)
+        query = FakeSchedd.query
+
+        def hang(schedd, *args, **kwargs):
+            if schedd.name == "schedd1":
+                release.wait(10)
+            return query(schedd, *args, **kwargs)
+
+        start = time.monotonic()
+        with mock.patch.object(FakeSchedd, "query", hang):
+            jobs = asimov.condor.CondorJobList()
+        self.assertLess(time.monotonic() - start, 2)
+        # The other schedulers are queried once the hung query gives up
+        # its place.
+        self.assertEqual(sorted(jobs.jobs), [3, 4])
+        hung = [
+            thread
+            for thread in threading.enumerate()
+            if thread.name == "asimov-scheduler-schedd1"
+        ]
+        self.assertTrue(hung)
+        self.assertTrue(all(thread.daemon for thread in hung))
+
+    def test_concurrent(self):
+        """Check that the schedulers are queried at the same time."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        class WaitingSchedd(FakeSchedd):
+            def query(self, constraint="true", opts=None, projection=None):
+                barrier.wait()
+                return super().query(constraint, opts, projection)
+
+        with mock.patch.object(fake_htcondor, "Schedd", WaitingSchedd):
+            jobs = asimov.condor.CondorJobList()
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+
+    def test_scheduler_only(self):
+        """Check that the search can be restricted to the configured scheduler."""
+        jobs = asimov.condor.CondorJobList()
+        jobs.refresh(scheduler_only=True)
+        self.assertEqual(list(jobs.jobs), [3])
+        self.assertEqual(list(jobs.stats), ["schedd2"])
+
+    def test_tracked_jobs(self):
+        """Check that only the tracked jobs are requested."""
+        jobs = asimov.condor.CondorJobList(cluster_ids=[1, "4", None])
+        self.assertEqual(sorted(jobs.jobs), [1, 4])
+        self.assertEqual([subjob.idno for subjob in jobs.jobs[1].subjobs], [2])
+        self.assertTrue(all("{1, 4}" in c for c in FakeSchedd.constraints))
+
+    def test_no_tracked_jobs(self):
+        """Check that the schedulers aren't queried when no jobs are tracked."""
+        jobs = asimov.condor.CondorJobList(cluster_ids=[])
+        self.assertEqual(jobs.jobs, {})
+        self.assertEqual(FakeSchedd.constraints, [])
+
+    def test_targeted_refresh(self):
+        """Check that refreshing a single job merges it into the list."""
+        jobs = asimov.condor.CondorJobList()
+        cache = os.path.join(".asimov", "_cache_jobs.yaml")
+        os.utime(cache, (1000, 1000))
+        FakeSchedd.constraints = []
+        FakeSchedd.behaviour["schedd2"] = ([{**job(3), "JobStatus": 5}], 0, None)
+        FakeSchedd.behaviour["schedd3"] = ([], 0, None)
+
+        jobs.refresh(cluster_ids=[3])
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+        self.assertEqual(jobs.jobs[3].status, "Held")
+        self.assertTrue(all("{3}" in c for c in FakeSchedd.constraints))
+        self.assertEqual(os.stat(cache).st_mtime, 1000)
+
+        jobs.refresh(cluster_ids=[4])
+        self.assertEqual(sorted(jobs.jobs), [1, 3])
+
+    def test_tracked_jobs_stale_cache(self):
+        """Check that tracked jobs are merged into a stale cache."""
+        asimov.condor.CondorJobList()
+        cache = os.path.join(".asimov", "_cache_jobs.yaml")
+        os.utime(cache, (1000, 1000))
+        FakeSchedd.constraints = []
+
+        jobs = asimov.condor.CondorJobList(cluster_ids=[3])
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+        self.assertTrue(all("{3}" in c for c in FakeSchedd.constraints))
+        self.assertEqual(os.stat(cache).st_mtime, 1000)
+
+        FakeSchedd.constraints = []
+        jobs = asimov.condor.CondorJobList(cluster_ids=[None, "not a job"])
+        self.assertEqual(FakeSchedd.constraints, [])
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+        self.assertEqual(os.stat(cache).st_mtime, 1000)
+
+    def test_tracked_jobs_without_cache(self):
+        """Check that a cache of only the tracked jobs isn't treated as fresh."""
+        asimov.condor.CondorJobList(cluster_ids=[3])
+        FakeSchedd.constraints = []
+        jobs = asimov.condor.CondorJobList()
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+        self.assertEqual(len(FakeSchedd.constraints), 3)
+
+    def test_new_jobs_added_to_cache(self):
+        """Check that tracked jobs missing from a fresh cache are requested."""
+        FakeSchedd.behaviour["schedd3"] = ([], 0, None)
+        asimov.condor.CondorJobList()
+        FakeSchedd.constraints = []
+        FakeSchedd.behaviour["schedd3"] = ([job(4)], 0, None)
+
+        jobs = asimov.condor.CondorJobList(cluster_ids=[1, 4])
+        self.assertEqual(sorted(jobs.jobs), [1, 3, 4])
+        self.assertTrue(all("{4}" in c for c in FakeSchedd.constraints))
+
+
+class SchedulerConnectionTests(FakeCondorTestCase):
+    """Check that schedulers are found once and then reused."""
+
+    def test_reuse(self):
+        """Check that the collector is only asked once for the scheduler."""
+        self.assertEqual(asimov.condor.submit_job({}), 200)
+        self.assertEqual(asimov.condor.submit_job({}), 200)
+        asimov.condor.delete_job(200)
+        self.assertEqual(asimov.condor.collect_history(200)["runtime"], 90)
+        self.assertEqual(FakeCollector.calls, 1)
+        self.assertEqual(FakeSchedd.created, 1)
+        self.assertEqual(asimov.condor.scheduler.lookups, 1)
+        self.assertEqual(asimov.condor.scheduler.avoided, 3)
+
+    def test_expiry(self):
+        """Check that the scheduler is found again after it expires."""
+        asimov.condor.scheduler.ttl = 0
+        asimov.condor.submit_job({})
+        asimov.condor.submit_job({})
+        self.assertEqual(asimov.condor.scheduler.lookups, 2)
+
+    def test_failover(self):
+        """Check that other schedulers are tried if the preferred one fails."""
+        FakeSchedd.rejecting = {"schedd2"}
+        self.assertEqual(asimov.condor.submit_job({}), 100)
+        FakeSchedd.rejecting = set()
+        self.assertEqual(asimov.condor.submit_job({}), 200)
+
+    def test_missing_scheduler(self):
+        """Check that the pool is searched if there is no preferred scheduler."""
+        config.set("condor", "scheduler", "schedd9")
+        self.assertEqual(asimov.condor.submit_job({}), 100)
+
+    def test_refresh_shares_schedulers(self):
+        """Check that refreshing the job list reuses the schedulers."""
+        asimov.condor.CondorJobList().refresh()
+        self.assertEqual(FakeCollector.calls, 1)
+        self.assertEqual(FakeSchedd.created, 3)
+
+
+class QueueTests(FakeCondorTestCase):
+    """Check whether jobs are in the queue."""
+
+    def test_is_queued(self):
+        self.assertTrue(asimov.condor.is_queued(3))
+        FakeSchedd.behaviour["schedd2"] = ([], 0, None)
+        self.assertFalse(asimov.condor.is_queued(3))
+
+
+class HistoryTests(FakeCondorTestCase):
+    """Check that the resources used by finished jobs are collected."""
+
+    def test_single_query(self):
+        """Check that the history of several jobs is found with one query."""
+        histories = asimov.condor.collect_histories([10, "20", 30])
+        self.assertEqual(sorted(histories), [10, 20])
+        self.assertEqual(len(FakeSchedd.constraints), 1)
+
+    def test_dag_totals(self):
+        """Check that the resources used by the jobs in a DAG are added up."""
+        history = asimov.condor.collect_histories([10])[10]
+        self.assertEqual(history["jobs"], 2)
+        self.assertEqual(history["runtime"], 7200)
+        self.assertEqual(history["cpu hours"], 6)
+        self.assertEqual(history["gpu hours"], 1)
+        self.assertEqual(history["wall time"], 10000)
+        self.assertEqual(history["peak memory"], 3000)
+        self.assertEqual(history["end"], "2023-11-14")
+
+    def test_single_job(self):
+        """Check the resources used by a job which isn't a DAG."""
+        history = asimov.condor.collect_history(200)
+        self.assertEqual(history["runtime"], 90)
+        self.assertEqual(history["cpus"], 1)
+        self.assertNotIn("peak memory", history)
+        with self.assertRaises(ValueError):
+            asimov.condor.collect_history(999)
+
+    def test_record_profiling(self):
+        """Check that the monitor stores the history of finished productions."""
+        from asimov.cli import monitor
+
+        productions = [
+            types.SimpleNamespace(name=name, job_id=job_id, meta={"job id": job_id})
+            for name, job_id in (("Prod0", 10), ("Prod1", 999))
+        ]
+        for production in productions:
+            production.event = production
+        ledger = mock.Mock()
+        with mock.patch.object(monitor, "ledger", ledger):
+            monitor.record_profiling([(p, p.job_id) for p in productions])
+        self.assertEqual(productions[0].meta["profiling"]["jobs"], 2)
+        self.assertIsNone(productions[0].meta["job id"])
+        self.assertNotIn("profiling", productions[1].meta)
+        self.assertEqual(len(FakeSchedd.constraints), 1)
+        ledger.update_event.assert_called_once_with(productions[0])
@@ -1,3 +1,144 @@
 """
 Database interface tests
 """
+
+import os
+
+from click.testing import CliRunner
+
+from asimov import config
+from asimov.cli import ledger as ledger_cli
+from asimov.cli.application import apply_page
+from asimov.database import AsimovSQLiteDatabase
+from asimov.event import Event
+from asimov.ledger import DatabaseLedger, Ledger
+from asimov.query import Not
+from asimov.testing import AsimovTestCase
+
+
+class DatabaseLedgerTests(AsimovTestCase):
+    """Check the ledger which is stored in an SQLite database."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bayeswave_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        self.ledger.update_event(Event(name="S000000yy", ledger=self.ledger))
+        self.ledger = DatabaseLedger.migrate(".asimov/ledger.yml")
+
+    def names(self, **kwargs):
+        return [production.name for production in self.ledger.get_productions(**kwargs)]
+
+    def test_migration(self):
+        """Check that the events and project data are copied to the database."""
+        self.assertEqual(list(self.ledger.events), ["Nonstandard fmin", "S000000yy"])
+        self.assertIn("pipelines", self.ledger.data)
+        self.assertEqual(len(self.ledger.get_event()), 2)
+        self.assertEqual(self.names(), ["bilby_test_job", "Prod0"])
+
+    def test_defaults(self):
+        """Check that project defaults are applied to events."""
+        self.ledger.data["quality"] = {"minimum frequency": {"H1": 62}}
+        event = self.ledger.events["S000000yy"]
+        self.assertEqual(event["quality"]["minimum frequency"]["H1"], 62)
+        self.assertIn("quality", self.ledger.get_defaults())
+
+    def test_missing_event(self):
+        """Check that requesting an unknown event raises an error."""
+        with self.assertRaises(KeyError):
+            self.ledger.get_event("S999999zz")
+
+    def test_update_event(self):
+        """Check that changes to an event are stored and indexed."""
+        production = self.ledger.get_productions(filters={"pipeline": "bayeswave"})[0]
+        production.status = "running"
+        ledger = DatabaseLedger()
+        self.assertEqual(
+            [p.name for p in ledger.get_productions(filters={"status": "running"})],
+            ["Prod0"],
+        )
+
+    def test_update_keeps_order(self):
+        """Check that updating an event keeps its place among the events."""
+        event = self.ledger.get_event("Nonstandard fmin")[0]
+        self.ledger.update_events([event, Event(name="S000000zz", ledger=self.ledger)])
+        self.assertEqual(
+            DatabaseLedger().db.event_names(),
+            ["Nonstandard fmin", "S000000yy", "S000000zz"],
+        )
+
+    def test_filters(self):
+        """Check that indexed and unindexed filters can be combined."""
+        self.assertEqual(self.names(filters={"pipeline": "Bilby"}), ["bilby_test_job"])
+        self.assertEqual(
+            self.names(filters={"pipeline": {"bilby", "bayeswave"}}),
+            ["bilby_test_job", "Prod0"],
+        )
+        self.assertEqual(self.names(filters={"pipeline": Not("bilby")}), ["Prod0"])
+        self.assertEqual(
+            self.names(
+                event="Nonstandard fmin",
+                filters={"review status": None, "likelihood.sample rate": 4000},
+            ),
+            ["bilby_test_job", "Prod0"],
+        )
+        self.assertEqual(self.names(filters={"likelihood.sample rate": 1}), [])
+
+    def test_batch(self):
+        """Check that changes in a batch are committed together."""
+        other = AsimovSQLiteDatabase(".asimov/ledger.db")
+        with self.ledger.batch():
+            self.ledger.update_events(
+                [
+                    Event(name="S000000zz", ledger=self.ledger),
+                    Event(name="S000001zz", ledger=self.ledger),
+                ]
+            )
+            self.assertEqual(other.count_events(), 2)
+        self.assertEqual(other.count_events(), 4)
+        other.close()
+
+    def test_delete_event(self):
+        """Check that deleted events are moved to the trash."""
+        self.ledger.delete_event("Nonstandard fmin")
+        ledger = DatabaseLedger()
+        self.assertNotIn("Nonstandard fmin", ledger.events)
+        self.assertIn("Nonstandard fmin", ledger.data["trash"]["events"])
+        self.assertEqual(self.names(), [])
+
+
+class DatabaseLedgerCreationTests(AsimovTestCase):
+    """Check that database ledgers can be created."""
+
+    def test_create(self):
+        """Check that an empty ledger database can be created."""
+        Ledger.create(name="Database project", engine="sqlite", location="test.db")
+        ledger = DatabaseLedger("test.db")
+        self.assertEqual(ledger.data["project"]["name"], "Database project")
+        self.assertEqual(ledger.get_event(), [])
+
+    def test_migrate_command(self):
+        """Check that the migration command updates the project configuration."""
+        runner = CliRunner()
+        result = runner.invoke(ledger_cli.ledger, ["migrate", "--engine", "sqlite"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(config.get("ledger", "engine"), "sqlite")
+        self.assertTrue(os.path.isfile(".asimov/ledger.db"))
@@ -0,0 +1,325 @@
+"""
+Tests for event repositories.
+"""
+
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import git
+
+import asimov.git
+from asimov import config
+from asimov.git import (
+    EventRepo,
+    RepositoryUpdates,
+    checkout_directory,
+    push_repositories,
+    sync_repositories,
+)
+
+
+class GitTestCase(unittest.TestCase):
+    """Run tests with an event repository cloned from a local remote."""
+
+    def setUp(self):
+        identity = {
+            f"GIT_{role}_{field}": value
+            for role in ("AUTHOR", "COMMITTER")
+            for field, value in (("NAME", "Asimov"), ("EMAIL", "asimov@example.com"))
+        }
+        patcher = mock.patch.dict(os.environ, identity)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = tempfile.mkdtemp()
+        self.remote = os.path.join(self.directory, "remote.git")
+        git.Repo.init(self.remote, bare=True)
+        EventRepo.create(os.path.join(self.directory, "initial"))
+        initial = git.Repo(os.path.join(self.directory, "initial"))
+        initial.create_remote("origin", self.remote)
+        initial.git.push("-u", "origin", "HEAD")
+        self.repo = self.clone("S000000xx")
+        self.source = os.path.join(self.directory, "config.ini")
+        with open(self.source, "w") as f:
+            f.write("[analysis]\n")
+
+    def clone(self, name):
+        checkout = os.path.join(self.directory, name)
+        git.Repo.clone_from(self.remote, checkout)
+        return EventRepo(checkout)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+class EventRepoTests(GitTestCase):
+    """Check changes to an event repository are pushed to its remote."""
+
+    def test_add_file_pushes(self):
+        """Check that an added file is on the remote when add_file returns."""
+        self.repo.add_file(self.source, "C01_offline/Prod0.ini")
+        remote = git.Repo(self.remote)
+        self.assertEqual(remote.head.commit.hexsha, self.repo.repo.head.commit.hexsha)
+        self.assertTrue(self.repo.wait_for_push(timeout=0))
+
+    def test_unpushed(self):
+        """Check that a commit which hasn't been pushed is detected."""
+        self.repo.repo.git.commit("--allow-empty", "-m", "Not pushed")
+        self.assertFalse(self.repo.wait_for_push(timeout=0.1))
+
+    def test_no_remote(self):
+        """Check that there is no wait for a repository without a remote."""
+        repo = EventRepo.create(os.path.join(self.directory, "local"))
+        repo.add_file(self.source, "C01_offline/Prod0.ini")
+        self.assertFalse(repo.wait_for_push())
+
+    def remote_commits(self):
+        return list(git.Repo(self.remote).iter_commits())
+
+    def test_batch(self):
+        """Check that the files added in a batch are committed together."""
+        before = len(self.remote_commits())
+        with self.repo.batch():
+            self.repo.add_file(self.source, "C01_offline/Prod0.ini")
+            self.repo.add_file(self.source, "C01_offline/Prod1.ini")
+            self.assertEqual(len(self.remote_commits()), before)
+        commits = self.remote_commits()
+        self.assertEqual(len(commits), before + 1)
+        self.assertEqual(
+            sorted(commits[0].stats.files),
+            ["C01_offline/Prod0.ini", "C01_offline/Prod1.ini"],
+        )
+        self.assertFalse(self.repo.unpushed)
+
+    def test_empty_batch(self):
+        """Check that nothing is committed if no files are added."""
+        before = self.repo.repo.head.commit
+        with self.repo.batch():
+            pass
+        self.assertEqual(self.repo.repo.head.commit, before)
+
+    def test_batch_exception(self):
+        """Check that files added before an error aren't left staged."""
+        before = len(self.remote_commits())
+        with self.assertRaises(RuntimeError):
+            with self.repo.batch(commit_message="Failed batch"):
+                self.repo.add_file(self.source, "C01_offline/Prod0.ini")
+                raise RuntimeError
+        self.assertEqual(self.repo._staged, [])
+        self.assertEqual(self.repo.repo.head.commit.message.strip(), "Failed batch")
+        self.assertEqual(len(self.remote_commits()), before)
+        self.assertTrue(self.repo.unpushed)
+
+        self.repo.add_file(self.source, "C01_offline/Prod1.ini", "Second file")
+        self.assertEqual(
+            list(self.repo.repo.head.commit.stats.files), ["C01_offline/Prod1.ini"]
+        )
+
+    def test_push_repositories(self):
+        """Check that several repositories can be pushed at once."""
+        # Each repository pushes to its own branch so that they don't conflict.
+        repositories = []
+        for name in ("S000001a", "S000002b"):
+            repository = self.clone(name)
+            repository.repo.git.checkout("-b", name)
+            repository.repo.git.push("-u", "origin", name)
+            with repository.batch(push=False):
+                repository.add_file(self.source, f"C01_offline/{name}.ini")
+            self.assertTrue(repository.unpushed)
+            repositories.append(repository)
+
+        self.assertEqual(push_repositories(repositories), {})
+        remote = git.Repo(self.remote)
+        for repository in repositories:
+            self.assertFalse(repository.unpushed)
+            self.assertEqual(
+                remote.commit(repository.repo.active_branch.name),
+                repository.repo.head.commit,
+            )
+
+    def test_push_not_confirmed(self):
+        """Check that a push which can't be confirmed isn't an error."""
+        self.repo.repo.git.commit("--allow-empty", "-m", "Pushed")
+        self.repo.unpushed = True
+        error = git.exc.GitCommandError(["git", "ls-remote"], 128)
+        with mock.patch.object(
+            git.cmd.Git, "ls_remote", create=True, side_effect=error
+        ), self.assertLogs(asimov.git.logger, "WARNING"):
+            self.assertEqual(push_repositories([self.repo]), {})
+        self.assertFalse(self.repo.unpushed)
+        self.assertTrue(self.repo.wait_for_push(timeout=0))
+
+    def test_push_timeout(self):
+        """Check that a push which isn't seen on the remote is reported."""
+        with mock.patch.object(
+            asimov.git, "wait_until", return_value=False
+        ), self.assertLogs(asimov.git.logger, "WARNING") as logs:
+            self.assertFalse(self.repo.push())
+        self.assertIn("did not show the new commits", logs.output[0])
+
+
+class RepositoryUpdateTests(GitTestCase):
+    """Check that event repositories are only pulled when they need to be."""
+
+    def setUp(self):
+        super().setUp()
+        self.updates = RepositoryUpdates()
+        patcher = mock.patch.object(asimov.git, "updates", self.updates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(config.remove_option, "git", "update_interval")
+
+    def test_pulled_once(self):
+        """Check that a repository is only pulled once by default."""
+        repo = EventRepo.create(os.path.join(self.directory, "local"))
+        self.assertTrue(repo.update())
+        repo.find_prods("Prod0")
+        repo.find_prods("Prod1")
+        self.assertEqual(self.updates.pulls, 1)
+        self.assertEqual(self.updates.avoided, 2)
+
+    @unittest.skipUnless(shutil.which("git-lfs"), "git-lfs is not installed")
+    def test_forced(self):
+        """Check that an update can be forced."""
+        other = self.clone("other")
+        other.add_file(self.source, "C01_offline/Prod0.ini")
+
+        self.repo.update()
+        self.assertFalse(self.repo.update())
+        self.assertTrue(self.repo.update(force=True))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.repo.directory, "C01_offline/Prod0.ini"))
+        )
+
+        self.updates.force = True
+        self.assertTrue(self.repo.update())
+        self.assertEqual(self.updates.pulls, 3)
+
+    def test_interval(self):
+        """Check that a repository is pulled again after the update interval."""
+        repo = EventRepo.create(os.path.join(self.directory, "local"))
+        config.set("git", "update_interval", "0")
+        repo.update()
+        self.assertTrue(repo.update())
+        config.set("git", "update_interval", "3600")
+        self.assertFalse(repo.update())
+
+
+class CloneTests(GitTestCase):
+    """Check that event repositories can be cloned without all of their contents."""
+
+    def setUp(self):
+        super().setUp()
+        git.Repo(self.remote).git.config("uploadpack.allowFilter", "true")
+        self.pointer = (
+            "version https://git-lfs.github.com/spec/v1\n"
+            "oid sha256:4d7a214614ab2935c943f9e0ff69d22eadbb8f32b1258daaa5e2ca24d17e2393\n"
+            "size 12345\n"
+        )
+        with self.repo.batch():
+            self.repo.add_file(self.source, "C01_offline/Prod0.ini")
+            self.repo.add_file(self.source, "Other/large.dat")
+        with open(os.path.join(self.directory, "psd.xml.gz"), "w") as f:
+            f.write(self.pointer)
+        self.repo.add_file(
+            os.path.join(self.directory, "psd.xml.gz"), "C01_offline/psd.xml.gz"
+        )
+
+    def from_url(self, name, **kwargs):
+        kwargs.setdefault("lazy_lfs", True)
+        return EventRepo.from_url(
+            self.remote, name, directory=os.path.join(self.directory, name), **kwargs
+        )
+
+    def test_shallow(self):
+        """Check that a shallow clone only has the latest commit."""
+        clone = self.from_url("shallow", depth=1)
+        self.assertEqual(clone.repo.git.rev_list("--count", "HEAD"), "1")
+        self.assertTrue(
+            os.path.exists(os.path.join(clone.directory, "C01_offline", "Prod0.ini"))
+        )
+
+    def test_partial(self):
+        """Check that a partial clone records its filter."""
+        clone = self.from_url("partial", clone_filter="blob:none")
+        self.assertEqual(
+            clone.repo.git.config("remote.origin.partialclonefilter"), "blob:none"
+        )
+        self.assertTrue(
+            os.path.exists(os.path.join(clone.directory, "C01_offline", "Prod0.ini"))
+        )
+
+    def test_sparse(self):
+        """Check that a sparse clone only checks out the calibration directory."""
+        clone = self.from_url("sparse", sparse=True, clone_filter="blob:none")
+        self.assertTrue(
+            os.path.exists(os.path.join(clone.directory, "C01_offline", "Prod0.ini"))
+        )
+        self.assertFalse(os.path.exists(os.path.join(clone.directory, "Other")))
+        self.assertEqual(clone.sparse_directories(), ["C01_offline"])
+
+        clone.add_file(self.source, "Preferred/summary.ini")
+        self.assertIn("Preferred", clone.sparse_directories())
+        self.assertEqual(
+            git.Repo(self.remote).head.commit.hexsha, clone.repo.head.commit.hexsha
+        )
+
+    def test_lazy_lfs(self):
+        """Check that LFS files are only fetched when they are read."""
+        clone = self.from_url("lazy")
+        self.assertTrue(clone.lazy_lfs)
+        psd = os.path.join(clone.directory, "C01_offline", "psd.xml.gz")
+        self.assertTrue(asimov.git.is_lfs_pointer(psd))
+        with mock.patch.object(
+            git.cmd.Git, "execute", autospec=True, side_effect=git.cmd.Git.execute
+        ) as execute:
+            clone.find_prods("Prod0")
+            self.assertFalse(
+                [call for call in execute.call_args_list if "lfs" in call[0][1]]
+            )
+            clone.fetch_lfs(psd)
+        command = execute.call_args[0][1]
+        self.assertEqual(command[:3], ["git", "lfs", "pull"])
+        self.assertIn("C01_offline/psd.xml.gz", command)
+
+
+class SyncTests(GitTestCase):
+    """Check that many event repositories can be cloned and updated together."""
+
+    def setUp(self):
+        super().setUp()
+        default = config.get("general", "git_default")
+        config.set("general", "git_default", os.path.join(self.directory, "checkouts"))
+        self.addCleanup(config.set, "general", "git_default", default)
+        self.url = pathlib.Path(self.remote).as_uri()
+        # git-lfs isn't needed to clone or update these repositories.
+        config.set("git", "lazy_lfs", "True")
+        self.addCleanup(config.remove_option, "git", "lazy_lfs")
+
+    def test_sync(self):
+        """Check that repositories are cloned, then updated."""
+        missing = pathlib.Path(self.directory, "missing.git").as_uri()
+        report = sync_repositories(
+            {"S000001a": self.url, "S000002b": self.url, "S000003c": missing}
+        )
+        self.assertEqual(sorted(report["cloned"]), ["S000001a", "S000002b"])
+        self.assertEqual(list(report["failed"]), ["S000003c"])
+        for name in report["cloned"]:
+            self.assertTrue(
+                os.path.exists(os.path.join(checkout_directory(name), "C01_offline"))
+            )
+
+        report = sync_repositories({"S000001a": self.url, "S000002b": self.url})
+        self.assertEqual(sorted(report["updated"]), ["S000001a", "S000002b"])
+        self.assertEqual(report["cloned"], [])
+
+    def test_existing_checkout(self):
+        """Check that a synchronised repository isn't cloned again."""
+        sync_repositories({"S000001a": self.url})
+        with mock.patch.object(git.Repo, "clone_from") as clone_from:
+            repository = EventRepo.from_url(self.url, "S000001a")
+        clone_from.assert_not_called()
+        self.assertEqual(repository.directory, checkout_directory("S000001a"))
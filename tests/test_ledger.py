@@ -0,0 +1,401 @@
+"""
+Tests for the YAML ledger.
+"""
+
+import os
+from copy import deepcopy
+from unittest import mock
+
+from click.testing import CliRunner
+
+from asimov import config
+from asimov.cli import ledger as ledger_cli
+from asimov.cli.application import apply_page
+from asimov.event import Event
+from asimov.ledger import YAMLDirectoryLedger, YAMLLedger
+from asimov.testing import AsimovTestCase
+
+
+class LazyLedgerTests(AsimovTestCase):
+    """Check that events are only constructed when they are requested."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+
+    def test_events_not_loaded(self):
+        """Check that no events are constructed when the ledger is opened."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertEqual(ledger._event_cache, {})
+        self.assertIn("Nonstandard fmin", ledger.events)
+
+    def test_eager_loading(self):
+        """Check that all events are constructed if lazy loading is disabled."""
+        ledger = YAMLLedger(".asimov/ledger.yml", lazy=False)
+        self.assertIn("Nonstandard fmin", ledger._event_cache)
+
+    def test_event_is_cached(self):
+        """Check that repeated requests return the same event object."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        event = ledger.get_event("Nonstandard fmin")[0]
+        self.assertIs(ledger.get_event("Nonstandard fmin")[0], event)
+        self.assertIs(ledger.get_event()[0], event)
+
+    def test_productions_loaded_on_access(self):
+        """Check that productions are only constructed when they are accessed."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        event = ledger.get_event("Nonstandard fmin")[0]
+        self.assertIsNone(event._productions)
+        self.assertEqual(event.productions[0].name, "bilby_test_job")
+
+    def test_get_productions_single_event(self):
+        """Check that productions can be retrieved for a single event."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        productions = ledger.get_productions(
+            "Nonstandard fmin", filters={"status": "ready"}
+        )
+        self.assertEqual(len(productions), 1)
+
+    def test_single_event_query_loads_one_event(self):
+        """Check that finding one event's productions doesn't load the others."""
+        self.ledger.add_event(Event(name="S000000yy", ledger=self.ledger))
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        productions = ledger.get_productions(
+            "Nonstandard fmin", filters={"status": "ready"}
+        )
+        self.assertEqual([p.name for p in productions], ["bilby_test_job"])
+        self.assertEqual(list(ledger._event_cache), ["Nonstandard fmin"])
+        self.assertIsNone(ledger._index)
+
+    def test_updated_event_is_saved(self):
+        """Check that changes to a cached event are written to the ledger."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        event = ledger.get_event("Nonstandard fmin")[0]
+        event.productions[0].status = "running"
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        production = ledger.get_productions("Nonstandard fmin")[0]
+        self.assertEqual(production.status, "running")
+
+
+class BatchTests(AsimovTestCase):
+    """Check that ledger writes can be deferred until the end of a batch."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+
+    def read_status(self):
+        ledger = YAMLLedger(self.ledger.location)
+        return ledger.get_productions("Nonstandard fmin")[0].status
+
+    def test_batch_defers_writes(self):
+        """Check that the ledger file is only written when the batch ends."""
+        production = self.ledger.get_productions("Nonstandard fmin")[0]
+        with self.ledger.batch():
+            production.status = "running"
+            self.assertEqual(self.read_status(), "ready")
+        self.assertEqual(self.read_status(), "running")
+
+    def test_nested_batches(self):
+        """Check that nothing is written until the outermost batch ends."""
+        production = self.ledger.get_productions("Nonstandard fmin")[0]
+        with self.ledger.batch():
+            with self.ledger.batch():
+                production.status = "running"
+            self.assertEqual(self.read_status(), "ready")
+        self.assertEqual(self.read_status(), "running")
+
+    def test_batch_written_after_exception(self):
+        """Check that changes are still written if the batch is interrupted."""
+        production = self.ledger.get_productions("Nonstandard fmin")[0]
+        with self.assertRaises(ValueError):
+            with self.ledger.batch():
+                production.status = "running"
+                raise ValueError
+        self.assertEqual(self.read_status(), "running")
+
+    def test_directory_ledger_batch(self):
+        """Check that a ledger directory only writes events when the batch ends."""
+        ledger = YAMLDirectoryLedger.migrate(".asimov/ledger.yml")
+        production = ledger.get_productions("Nonstandard fmin")[0]
+        with ledger.batch():
+            production.status = "running"
+            ledger.update_event(Event(name="S000000yy", ledger=ledger))
+            self.assertNotIn("S000000yy", YAMLDirectoryLedger().events)
+        reloaded = YAMLDirectoryLedger()
+        self.assertIn("S000000yy", reloaded.events)
+        self.assertEqual(
+            reloaded.get_productions("Nonstandard fmin")[0].status, "running"
+        )
+
+        with ledger.batch():
+            ledger.delete_event("S000000yy")
+            self.assertTrue(os.path.exists(".asimov/ledger/events/S000000yy.yml"))
+        self.assertFalse(os.path.exists(".asimov/ledger/events/S000000yy.yml"))
+        self.assertNotIn("S000000yy", YAMLDirectoryLedger().events)
+
+
+class DirectoryLedgerTests(AsimovTestCase):
+    """Check the ledger which stores each event in a separate file."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        self.ledger.update_event(Event(name="S000000yy", ledger=self.ledger))
+        self.ledger = YAMLDirectoryLedger.migrate(".asimov/ledger.yml")
+
+    def test_migration(self):
+        """Check that each event is written to its own file."""
+        self.assertEqual(
+            sorted(os.listdir(".asimov/ledger/events")),
+            ["Nonstandard_fmin.yml", "S000000yy.yml"],
+        )
+        self.assertIn("pipelines", self.ledger.data)
+        self.assertEqual(len(self.ledger.get_event()), 2)
+
+    def test_events_read_on_access(self):
+        """Check that event files are only read when an event is requested."""
+        self.assertEqual(self.ledger.events.loaded, [])
+        event = self.ledger.get_event("S000000yy")[0]
+        self.assertEqual(event.name, "S000000yy")
+        self.assertEqual(self.ledger.events.loaded, ["S000000yy"])
+
+    def test_update_single_event(self):
+        """Check that updating an event only rewrites that event's file."""
+        other = os.stat(".asimov/ledger/events/S000000yy.yml").st_mtime_ns
+        event = self.ledger.get_event("Nonstandard fmin")[0]
+        event.productions[0].status = "running"
+
+        self.assertEqual(
+            os.stat(".asimov/ledger/events/S000000yy.yml").st_mtime_ns, other
+        )
+        ledger = YAMLDirectoryLedger()
+        production = ledger.get_productions("Nonstandard fmin")[0]
+        self.assertEqual(production.status, "running")
+
+    def test_add_and_delete_event(self):
+        """Check that the index is updated when events are added and removed."""
+        self.ledger.update_event(Event(name="S000000zz", ledger=self.ledger))
+        self.assertIn("S000000zz", YAMLDirectoryLedger().events)
+
+        self.ledger.delete_event("S000000yy")
+        ledger = YAMLDirectoryLedger()
+        self.assertNotIn("S000000yy", ledger.events)
+        self.assertIn("S000000yy", ledger.data["trash"]["events"])
+        self.assertFalse(os.path.exists(".asimov/ledger/events/S000000yy.yml"))
+
+
+class LedgerCacheTests(AsimovTestCase):
+    """Check the snapshot cache of the parsed ledger."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+
+    def test_cache_written(self):
+        """Check that a snapshot is made when the ledger is read."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertTrue(os.path.isfile(".asimov/_cache_ledger.pickle"))
+        self.assertTrue(ledger.cache_info()["valid"])
+
+    def test_cache_used(self):
+        """Check that the snapshot is used instead of the ledger file."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        snapshot = ledger._read_cache()
+        snapshot["events"]["Nonstandard fmin"]["marker"] = True
+        ledger._write_cache(snapshot)
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertTrue(ledger.events["Nonstandard fmin"]["marker"])
+
+    def test_shared_cache_ignored(self):
+        """Check that a snapshot which others could have changed isn't used."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        snapshot = ledger._read_cache()
+        snapshot["events"]["Nonstandard fmin"]["marker"] = True
+        ledger._write_cache(snapshot)
+        os.chmod(ledger.cache_location, 0o666)
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertNotIn("marker", ledger.events["Nonstandard fmin"])
+        ledger._write_cache(snapshot)
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertNotIn("marker", ledger.events["Nonstandard fmin"])
+
+    def test_cache_used_after_touch(self):
+        """Check that the snapshot is still used if only the modification time changes."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        snapshot = ledger._read_cache()
+        snapshot["events"]["Nonstandard fmin"]["marker"] = True
+        ledger._write_cache(snapshot)
+        os.utime(".asimov/ledger.yml", ns=(0, 0))
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertTrue(ledger.events["Nonstandard fmin"]["marker"])
+        self.assertEqual(ledger._read_cache()["key"]["mtime"], 0)
+
+    def test_cache_invalidated_by_save(self):
+        """Check that writing the ledger invalidates the snapshot."""
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        event = ledger.get_event("Nonstandard fmin")[0]
+        event.productions[0].status = "running"
+        self.assertFalse(os.path.exists(".asimov/_cache_ledger.pickle"))
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertEqual(
+            ledger.get_productions("Nonstandard fmin")[0].status, "running"
+        )
+
+    def test_cache_invalidated_by_edit(self):
+        """Check that editing the ledger file invalidates the snapshot."""
+        YAMLLedger(".asimov/ledger.yml")
+        with open(".asimov/ledger.yml", "a") as ledger_file:
+            ledger_file.write("extra: value\n")
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertEqual(ledger.data["extra"], "value")
+
+    def test_cache_disabled(self):
+        """Check that no snapshot is made if the cache is switched off."""
+        YAMLLedger(".asimov/ledger.yml", cache=False)
+        self.assertFalse(os.path.exists(".asimov/_cache_ledger.pickle"))
+
+    def test_corrupt_cache(self):
+        """Check that an unreadable snapshot is replaced."""
+        with open(".asimov/_cache_ledger.pickle", "wb") as cache_file:
+            cache_file.write(b"not a pickle")
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertIn("Nonstandard fmin", ledger.events)
+        self.assertTrue(ledger.cache_info()["valid"])
+
+
+class LedgerCliTests(AsimovTestCase):
+    """Check the ledger management commands."""
+
+    def test_migrate_command(self):
+        """Check that the migration command updates the project configuration."""
+        runner = CliRunner()
+        result = runner.invoke(ledger_cli.ledger, ["migrate"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(config.get("ledger", "engine"), "yamldirectory")
+        self.assertTrue(os.path.isfile(".asimov/ledger/index.yml"))
+
+    def test_cache_commands(self):
+        """Check that the cache can be rebuilt, inspected, and removed."""
+        runner = CliRunner()
+        result = runner.invoke(ledger_cli.ledger, ["cache", "rebuild"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertTrue(os.path.isfile(".asimov/_cache_ledger.pickle"))
+
+        result = runner.invoke(ledger_cli.ledger, ["cache", "info"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("up to date", result.output)
+
+        result = runner.invoke(ledger_cli.ledger, ["cache", "clear"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertFalse(os.path.exists(".asimov/_cache_ledger.pickle"))
+
+
+class LedgerCopyTests(AsimovTestCase):
+    """Check that a ledger can be copied once its events have been loaded."""
+
+    def test_deepcopy(self):
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        event = ledger.get_event("Nonstandard fmin")[0]
+        ledger.get_productions(filters={"status": "ready"})
+
+        copied = deepcopy(ledger)
+        copied_event = copied.get_event("Nonstandard fmin")[0]
+        self.assertIsNot(copied_event, event)
+        self.assertIs(copied_event.ledger, copied)
+        self.assertEqual(copied_event.productions[0].name, "bilby_test_job")
+        self.assertIs(ledger.get_event("Nonstandard fmin")[0], event)
+
+    def test_deepcopy_in_batch(self):
+        """Check that a copy made during a batch writes its own changes."""
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        with ledger.batch():
+            copied = deepcopy(ledger)
+            self.assertEqual(copied._batch_depth, 0)
+            event = copied.get_event("Nonstandard fmin")[0]
+            event.meta["checked"] = True
+            copied.update_event(event)
+            reread = YAMLLedger(".asimov/ledger.yml")
+            self.assertTrue(reread.get_event("Nonstandard fmin")[0].meta["checked"])
@@ -0,0 +1,220 @@
+"""
+Tests for monitoring the analyses in a project.
+"""
+
+import os
+import threading
+from unittest import mock
+
+import yaml
+from click.testing import CliRunner
+
+from asimov import condor, utils
+from asimov.cli import monitor
+from asimov.cli.application import apply_page
+from asimov.ledger import YAMLLedger
+from asimov.pipelines.bilby import Bilby
+from asimov.testing import AsimovTestCase
+
+EVENTS = ["S000001a", "S000002b"]
+
+
+class WaitingJobs(dict):
+    """
+    A set of jobs which can only be looked up once every event is being
+    checked at the same time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.barrier = threading.Barrier(len(EVENTS), timeout=5)
+
+    def __contains__(self, key):
+        self.barrier.wait()
+        return super().__contains__(key)
+
+
+class MonitorTests(AsimovTestCase):
+    """Check that the monitor checks several events at once."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        with open(".asimov/ledger.yml") as ledger_file:
+            data = yaml.safe_load(ledger_file)
+        template = data["events"][0]
+        data["events"] = []
+        # The events are stored in reverse order to check that the output
+        # is sorted.
+        for number, name in reversed(list(enumerate(EVENTS))):
+            event = dict(template, name=name)
+            event["productions"] = [
+                {
+                    "bilby_test_job": dict(
+                        template["productions"][0]["bilby_test_job"],
+                        status="running",
+                        **{"job id": 100 + number},
+                    )
+                }
+            ]
+            data["events"].append(event)
+        with open(".asimov/ledger.yml", "w") as ledger_file:
+            yaml.dump(data, ledger_file)
+        self.ledger = YAMLLedger(".asimov/ledger.yml")
+
+    def run_monitor(self, jobs):
+        job_list = mock.Mock(jobs=jobs)
+        with mock.patch.object(monitor, "ledger", self.ledger), mock.patch.object(
+            condor, "CondorJobList", return_value=job_list
+        ):
+            return CliRunner().invoke(monitor.monitor, [])
+
+    def test_concurrent_events(self):
+        """Check that the events are checked at the same time, in order."""
+        jobs = WaitingJobs(
+            {
+                100 + number: condor.CondorJob(100 + number, "bilby", 1, 2)
+                for number in range(len(EVENTS))
+            }
+        )
+        result = self.run_monitor(jobs)
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        lines = result.output.splitlines()
+        self.assertEqual(lines[0], EVENTS[0])
+        self.assertIn("bilby_test_job is running (condor id: 100)", lines[2])
+        self.assertEqual(lines[3], EVENTS[1])
+        self.assertIn("bilby_test_job is running (condor id: 101)", lines[5])
+        self.assertTrue(lines[-1].startswith(f"Checked {len(EVENTS)} events"))
+
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        for name in EVENTS:
+            production = ledger.get_event(name)[0].productions[0]
+            self.assertEqual(production.meta["profiling"], {})
+
+    def test_serialised_ledger(self):
+        """Check that only one thread uses a shared ledger at a time."""
+        active = []
+        overlaps = []
+
+        def update_event(event):
+            active.append(event)
+            overlaps.append(len(active))
+            threading.Event().wait(0.01)
+            active.remove(event)
+
+        shared = monitor.SerialisedLedger(mock.Mock(update_event=update_event))
+        threads = [
+            threading.Thread(target=shared.update_event, args=(number,))
+            for number in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [1] * 8)
+
+    def test_shared_ledger_keeps_events(self):
+        """Check that events updated through the shared ledger stay cached."""
+        event = self.ledger.get_event(EVENTS[0])[0]
+        shared = monitor.SerialisedLedger(self.ledger)
+        event.ledger = shared
+        shared.update_event(event)
+        self.assertIs(self.ledger.get_event(EVENTS[0])[0], event)
+
+    def test_hooks_after_all_events(self):
+        """Check that the post-monitor hooks run once every event is checked."""
+        checked = []
+        seen = []
+        monitor_event = monitor.monitor_event
+
+        def record(*args, **kwargs):
+            result = monitor_event(*args, **kwargs)
+            checked.append(args[0].name)
+            return result
+
+        hook = mock.Mock()
+        hook.name = "check"
+        hook.load.return_value.return_value.run.side_effect = lambda: seen.append(
+            len(checked)
+        )
+        self.ledger.data["hooks"] = {"postmonitor": {"check": {}}}
+        jobs = WaitingJobs(
+            {
+                100 + number: condor.CondorJob(100 + number, "bilby", 1, 2)
+                for number in range(len(EVENTS))
+            }
+        )
+        with mock.patch.object(
+            monitor, "monitor_event", side_effect=record
+        ), mock.patch.object(monitor, "entry_points", return_value=[hook]):
+            result = self.run_monitor(jobs)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(seen, [len(EVENTS)])
+
+    def test_hook_changes_saved(self):
+        """Check that changes saved by the post-monitor hooks are kept."""
+
+        def check(ledger):
+            def run():
+                event = ledger.get_event(EVENTS[0])[0]
+                event.meta["checked"] = True
+                ledger.update_event(event)
+
+            return mock.Mock(run=run)
+
+        hook = mock.Mock()
+        hook.name = "check"
+        hook.load.return_value.side_effect = check
+        self.ledger.data["hooks"] = {"postmonitor": {"check": {}}}
+        jobs = {
+            100 + number: condor.CondorJob(100 + number, "bilby", 1, 2)
+            for number in range(len(EVENTS))
+        }
+        with mock.patch.object(monitor, "entry_points", return_value=[hook]):
+            result = self.run_monitor(jobs)
+        self.assertEqual(result.exit_code, 0, result.output)
+        ledger = YAMLLedger(".asimov/ledger.yml")
+        self.assertTrue(ledger.get_event(EVENTS[0])[0].meta.get("checked"))
+
+    def test_pipelines_one_at_a_time(self):
+        """Check that a pipeline doesn't run while another changes directory."""
+        directories = []
+        inside = threading.Event()
+        os.makedirs("rundir")
+
+        def after_completion(pipe):
+            if not inside.is_set():
+                with utils.set_directory("rundir"):
+                    inside.set()
+                    # Give the other event the chance to be checked.
+                    threading.Event().wait(0.2)
+            else:
+                directories.append(os.getcwd())
+
+        jobs = WaitingJobs(
+            {
+                100 + number: condor.CondorJob(100 + number, "bilby", 1, 4)
+                for number in range(len(EVENTS))
+            }
+        )
+        with mock.patch.object(
+            Bilby, "after_completion", autospec=True, side_effect=after_completion
+        ):
+            result = self.run_monitor(jobs)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(directories, [os.getcwd()])
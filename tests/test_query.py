@@ -0,0 +1,119 @@
+"""
+Tests for searching for productions in the ledger.
+"""
+
+from asimov.cli.application import apply_page
+from asimov.event import Event
+from asimov.ledger import YAMLLedger
+from asimov.query import Not
+from asimov.testing import AsimovTestCase
+
+
+class ProductionQueryTests(AsimovTestCase):
+    """Check that productions can be found using filters."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bayeswave_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        self.ledger = YAMLLedger(".asimov/ledger.yml")
+        self.ledger.get_productions("Nonstandard fmin")[1].status = "running"
+
+    def names(self, **kwargs):
+        return [production.name for production in self.ledger.get_productions(**kwargs)]
+
+    def test_all_productions(self):
+        """Check that all productions are returned in ledger order."""
+        self.assertEqual(self.names(), ["bilby_test_job", "Prod0"])
+        self.assertEqual(
+            self.names(event="Nonstandard fmin"), ["bilby_test_job", "Prod0"]
+        )
+
+    def test_equality(self):
+        """Check that productions can be found by an indexed property."""
+        self.assertEqual(self.names(filters={"status": "running"}), ["Prod0"])
+        self.assertEqual(self.names(filters={"pipeline": "bilby"}), ["bilby_test_job"])
+        self.assertEqual(self.names(filters={"pipeline": "Bilby"}), ["bilby_test_job"])
+        self.assertEqual(self.names(filters={"status": "finished"}), [])
+
+    def test_membership(self):
+        """Check that productions can be found using a set of values."""
+        self.assertEqual(
+            self.names(filters={"status": {"ready", "running"}}),
+            ["bilby_test_job", "Prod0"],
+        )
+
+    def test_negation(self):
+        """Check that filters can be negated."""
+        self.assertEqual(
+            self.names(filters={"status": Not("running")}), ["bilby_test_job"]
+        )
+        self.assertEqual(
+            self.names(filters={"pipeline": Not(["bilby", "bayeswave"])}), []
+        )
+
+    def test_nested_metadata(self):
+        """Check that nested metadata can be used as a filter."""
+        self.assertEqual(
+            self.names(filters={"likelihood.sample rate": 4000, "pipeline": "bilby"}),
+            ["bilby_test_job"],
+        )
+        self.assertEqual(self.names(filters={"likelihood.sample rate": 1024}), [])
+
+    def test_metadata(self):
+        """Check that top-level metadata can be used as a filter."""
+        self.assertEqual(
+            self.names(filters={"comment": "Bilby primary parameter estimation job"}),
+            ["bilby_test_job"],
+        )
+
+    def test_index_updated(self):
+        """Check that the index follows changes written to the ledger."""
+        production = self.ledger.get_productions(filters={"status": "running"})[0]
+        production.status = "finished"
+        self.assertEqual(self.names(filters={"status": "running"}), [])
+        self.assertEqual(self.names(filters={"status": "finished"}), ["Prod0"])
+
+    def test_index_follows_events(self):
+        """Check that the index follows events being added and removed."""
+        self.ledger.get_productions()
+        self.ledger.update_event(Event(name="S000000yy", ledger=self.ledger))
+        self.assertIn("S000000yy", self.ledger.production_index.events)
+        self.ledger.delete_event("Nonstandard fmin")
+        self.assertEqual(self.names(), [])
+
+    def test_unwritten_changes(self):
+        """Check that the index and direct paths agree about unwritten changes."""
+        direct = YAMLLedger(".asimov/ledger.yml")
+        self.ledger.get_productions()
+        self.assertIsNotNone(self.ledger._index)
+        for ledger in (self.ledger, direct):
+            production = ledger.get_event("Nonstandard fmin")[0].productions[1]
+            # Change the status without writing it to the ledger.
+            production.status_str = "stuck"
+        self.assertIsNone(direct._index)
+        for ledger in (self.ledger, direct):
+            self.assertEqual(
+                ledger.get_productions(
+                    "Nonstandard fmin", filters={"status": "running"}
+                ),
+                [],
+            )
@@ -0,0 +1,39 @@
+"""
+Tests for YAML serialisation.
+"""
+
+import unittest
+
+import yaml
+
+from asimov import serialisation
+from asimov.condor import CondorJob
+
+
+class SerialisationTests(unittest.TestCase):
+    def test_round_trip(self):
+        """Check that data survive being dumped and loaded."""
+        data = {"name": "S000000xx", "productions": [{"Prod0": {"status": "ready"}}]}
+        self.assertEqual(serialisation.load(serialisation.dump(data)), data)
+
+    def test_matches_pyyaml(self):
+        """Check that the output is the same as the pure-python dumper."""
+        data = {"quality": {"minimum frequency": {"H1": 20, "L1": 20}}, "ifos": ["H1"]}
+        self.assertEqual(
+            serialisation.dump(data, default_flow_style=False),
+            yaml.dump(data, default_flow_style=False),
+        )
+
+    def test_load_is_safe(self):
+        """Check that arbitrary python objects cannot be loaded."""
+        with self.assertRaises(yaml.constructor.ConstructorError):
+            serialisation.load("!!python/object/apply:os.system ['true']")
+
+    def test_condor_job(self):
+        """Check that condor jobs can be stored in the job cache."""
+        job = CondorJob.from_dict(
+            {"id": 450, "command": "test.sh", "hosts": 1, "status": 2}
+        )
+        loaded = serialisation.load(serialisation.dump({450: job}))
+        self.assertEqual(loaded[450].idno, 450)
+        self.assertEqual(loaded[450].status, "Running")
@@ -0,0 +1,478 @@
+"""
+Tests for the results store.
+"""
+
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from click.testing import CliRunner
+
+import asimov.locutus
+import asimov.storage
+from asimov import config
+from asimov.storage import (
+    DatabaseManifest,
+    HashError,
+    Store,
+)
+
+
+class StoreTestCase(unittest.TestCase):
+    """Run tests with a new results store."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root = os.path.join(self.directory, "store")
+        Store.create(self.root, "Test store")
+        self.store = Store(root=self.root)
+        self.source = self.make_file("samples.dat", b"0123456789" * 1000)
+
+    def make_file(self, name, contents):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(contents)
+        return path
+
+    def tearDown(self):
+        for directory, _, files in os.walk(self.directory):
+            for name in files:
+                os.chmod(os.path.join(directory, name), stat.S_IWUSR | stat.S_IRUSR)
+        shutil.rmtree(self.directory)
+
+
+class HashTests(StoreTestCase):
+    """Check that stored files are hashed and verified."""
+
+    def test_streamed_hash(self):
+        """Check that files are hashed correctly a piece at a time."""
+        with open(self.source, "rb") as f:
+            expected = hashlib.md5(f.read()).hexdigest()
+        with mock.patch.object(asimov.storage, "CHUNK_SIZE", 64):
+            self.assertEqual(self.store._hash(self.source), expected)
+            copy = os.path.join(self.directory, "copy.dat")
+            self.assertEqual(self.store._copy(self.source, copy), expected)
+        self.assertEqual(self.store._hash(copy), expected)
+
+    def test_add_and_fetch(self):
+        """Check that a stored file can be fetched and verified."""
+        record = self.store.add_file("S000000xx", "Prod0", self.source)
+        self.assertEqual(record["algorithm"], self.store.algorithm)
+        self.assertEqual(
+            record["hash"], self.store._hash(self.source, record["algorithm"])
+        )
+        path = self.store.fetch_file("S000000xx", "Prod0", "samples.dat")
+        self.assertEqual(
+            path, os.path.join(self.root, "S000000xx", "Prod0", "samples.dat")
+        )
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["samples.dat"])
+
+    def test_algorithm_recorded(self):
+        """Check that the hash algorithm is recorded for each file."""
+        config.set("storage", "hash_algorithm", "sha256")
+        self.addCleanup(config.set, "storage", "hash_algorithm", "blake2b")
+        self.store.add_file("S000000xx", "Prod0", self.source)
+        record = Store(root=self.root).manifest.get_record(
+            "S000000xx", "Prod0", "samples.dat"
+        )
+        self.assertEqual(record["algorithm"], "sha256")
+        self.assertEqual(len(record["hash"]), 64)
+
+    def test_legacy_record(self):
+        """Check that files recorded with MD5 hashes can still be verified."""
+        shutil.rmtree(self.root)
+        Store.create(self.root, "Test store", manifest="yaml")
+        self.store = Store(root=self.root)
+        destination = os.path.join(self.root, "S000000xx", "Prod0")
+        os.makedirs(destination)
+        shutil.copyfile(self.source, os.path.join(destination, "samples.dat"))
+        self.store.manifest.data["events"]["S000000xx"] = {
+            "Prod0": {
+                "samples.dat": {
+                    "uuid": uuid.uuid4().hex,
+                    "hash": self.store._hash(self.source),
+                }
+            }
+        }
+        self.store.manifest.update()
+
+        store = Store(root=self.root)
+        self.assertEqual(
+            store.manifest.get_record("S000000xx", "Prod0", "samples.dat")["algorithm"],
+            "md5",
+        )
+        store.fetch_file("S000000xx", "Prod0", "samples.dat")
+
+    def test_modified_file(self):
+        """Check that a file which has changed is not returned."""
+        self.store.add_file("S000000xx", "Prod0", self.source)
+        path = os.path.join(self.root, "S000000xx", "Prod0", "samples.dat")
+        os.chmod(path, stat.S_IWUSR | stat.S_IRUSR)
+        with open(path, "ab") as f:
+            f.write(b"changed")
+        with self.assertRaises(HashError):
+            self.store.fetch_file("S000000xx", "Prod0", "samples.dat")
+
+    def test_duplicate(self):
+        """Check that a file which is already stored is only kept once."""
+        self.store.add_file("S000000xx", "Prod0", self.source)
+        report = self.store.add_files("S000000xx", "Prod1", [self.source])
+        self.assertTrue(report["stored"][0]["duplicate"])
+        first, second = (
+            os.path.join(self.root, "S000000xx", production, "samples.dat")
+            for production in ("Prod0", "Prod1")
+        )
+        if report["stored"][0]["link"] == "hardlink":
+            self.assertTrue(os.path.samefile(first, second))
+        self.store.fetch_file("S000000xx", "Prod1", "samples.dat")
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.root, ".objects", self.store.algorithm))),
+            1,
+        )
+
+    def test_link_fallback(self):
+        """Check that files are copied where they can't be linked."""
+        with mock.patch.object(os, "link", side_effect=OSError), mock.patch.object(
+            asimov.storage, "reflink", return_value=False
+        ):
+            report = self.store.add_files("S000000xx", "Prod0", [self.source])
+        self.assertEqual(report["stored"][0]["link"], "copy")
+        self.store.fetch_file("S000000xx", "Prod0", "samples.dat")
+
+
+class VerificationCacheTests(StoreTestCase):
+    """Check that unchanged files aren't hashed each time they are fetched."""
+
+    def setUp(self):
+        super().setUp()
+        self.store.add_file("S000000xx", "Prod0", self.source)
+
+    def test_fetch_cached(self):
+        """Check that an unchanged file is not hashed again."""
+        for store in (self.store, Store(root=self.root)):
+            with mock.patch.object(store, "_hash") as hasher:
+                store.fetch_file("S000000xx", "Prod0", "samples.dat")
+            hasher.assert_not_called()
+            self.assertEqual(store.verified.hits, 1)
+
+    def test_unreadable_cache(self):
+        """Check that a cache which can't be read is ignored."""
+        with open(self.store.verified.location, "wb") as cache_file:
+            cache_file.write(b"\x80\x04not json")
+        store = Store(root=self.root)
+        self.assertEqual(store.verified.entries, {})
+        store.fetch_file("S000000xx", "Prod0", "samples.dat")
+        self.assertEqual(store.verified.misses, 1)
+
+    def test_changed_file(self):
+        """Check that a changed file is hashed, and rejected."""
+        path = os.path.join(self.root, "S000000xx", "Prod0", "samples.dat")
+        os.chmod(path, stat.S_IWUSR | stat.S_IRUSR)
+        with open(path, "r+b") as f:
+            f.write(b"9")
+        with self.assertRaises(HashError):
+            Store(root=self.root).fetch_file("S000000xx", "Prod0", "samples.dat")
+
+    def test_verify(self):
+        """Check that a full verification hashes every file."""
+        self.assertEqual(self.store.verify()["cached"], 1)
+        report = self.store.verify(full=True)
+        self.assertEqual((report["hashed"], report["cached"]), (1, 0))
+        self.assertEqual(report["failed"], {})
+
+
+class DatabaseManifestTests(StoreTestCase):
+    """Check that the manifest can be kept in an indexed database."""
+
+    def test_default(self):
+        """Check that new stores keep their manifest in a database."""
+        self.assertIsInstance(self.store.manifest, DatabaseManifest)
+        record = self.store.add_file("S000000xx", "Prod0", self.source)
+
+        store = Store(root=self.root)
+        self.assertTrue(store.manifest.has_hash(record["hash"]))
+        self.assertEqual(
+            list(store.manifest.list_resources("S000000xx", "Prod0")), ["samples.dat"]
+        )
+        self.assertEqual(
+            store.manifest.data["events"]["S000000xx"]["Prod0"]["samples.dat"]["hash"],
+            record["hash"],
+        )
+        with self.assertRaises(KeyError):
+            store.manifest.list_resources("S000000xx", "Prod1")
+
+    def test_indexed_lookups(self):
+        """Check that adding and fetching files doesn't read every record."""
+        self.store.add_file("S000000xx", "Prod0", self.source)
+        with mock.patch.object(
+            DatabaseManifest, "records", side_effect=AssertionError
+        ), mock.patch.object(DatabaseManifest, "data", new_callable=mock.PropertyMock):
+            other = self.make_file("other.dat", b"other")
+            self.store.add_file("S000000xx", "Prod1", other)
+            self.store.fetch_file("S000000xx", "Prod0", "samples.dat")
+            self.store.add_file("S000000xx", "Prod2", other)
+
+    def test_migrate(self):
+        """Check that a YAML manifest can be imported."""
+        shutil.rmtree(self.root)
+        config.set("storage", "hash_algorithm", "md5")
+        self.addCleanup(config.set, "storage", "hash_algorithm", "blake2b")
+        Store.create(self.root, "Test store", manifest="yaml")
+        Store(root=self.root).add_file("S000000xx", "Prod0", self.source)
+        before = Store(root=self.root).manifest.data
+
+        DatabaseManifest.migrate(Store(root=self.root))
+        store = Store(root=self.root)
+        self.assertIsInstance(store.manifest, DatabaseManifest)
+        self.assertEqual(store.manifest.data, before)
+        store.fetch_file("S000000xx", "Prod0", "samples.dat")
+        report = store.add_files("S000000xx", "Prod1", [self.source])
+        self.assertTrue(report["stored"][0]["duplicate"])
+
+
+class BulkIngestTests(StoreTestCase):
+    """Check that many files can be stored together."""
+
+    def setUp(self):
+        super().setUp()
+        self.results = os.path.join(self.directory, "results")
+        os.makedirs(self.results)
+        self.files = []
+        for i in range(5):
+            path = os.path.join(self.results, f"result_{i}.dat")
+            with open(path, "wb") as f:
+                f.write(os.urandom(1000 + i))
+            self.files.append(path)
+
+    def test_add_files(self):
+        """Check that the files are stored and recorded together."""
+        with mock.patch.object(
+            self.store.manifest, "update", wraps=self.store.manifest.update
+        ) as update:
+            report = self.store.add_files("S000000xx", "Prod0", self.files, threads=3)
+        update.assert_called_once()
+        self.assertEqual(report["failed"], {})
+        self.assertEqual(len(report["stored"]), 5)
+        self.assertEqual(report["bytes"], sum(os.path.getsize(f) for f in self.files))
+
+        store = Store(root=self.root)
+        self.assertEqual(
+            sorted(store.manifest.list_resources("S000000xx", "Prod0")),
+            [os.path.basename(f) for f in self.files],
+        )
+        store.fetch_file("S000000xx", "Prod0", "result_3.dat")
+
+    def test_failures(self):
+        """Check that files which can't be stored don't stop the others."""
+        self.store.add_file("S000000xx", "Prod0", self.files[0])
+        copy = os.path.join(self.directory, "copy.dat")
+        shutil.copyfile(self.files[1], copy)
+        missing = os.path.join(self.directory, "missing.dat")
+
+        report = self.store.add_files(
+            "S000000xx", "Prod0", self.files + [copy, missing]
+        )
+        self.assertEqual(len(report["stored"]), 5)
+        self.assertEqual(sorted(report["failed"]), sorted([self.files[0], missing]))
+        self.assertIsInstance(report["failed"][self.files[0]], FileExistsError)
+        self.assertIsInstance(report["failed"][missing], FileNotFoundError)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.root, "S000000xx", "Prod0"))),
+            ["copy.dat"] + [os.path.basename(f) for f in self.files],
+        )
+
+    def test_locutus_directory(self):
+        """Check that locutus can store a directory of files."""
+        with mock.patch.object(asimov.locutus, "this_store", self.store):
+            result = CliRunner().invoke(
+                asimov.locutus.cli, ["store", "S000000xx", "Prod0", self.results]
+            )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Stored 5 files", result.output)
+        self.assertEqual(
+            len(self.store.manifest.list_resources("S000000xx", "Prod0")), 5
+        )
+
+
+class TieringTests(StoreTestCase):
+    """Check that old files can be compressed and fetched again."""
+
+    def setUp(self):
+        super().setUp()
+        self.store.add_file("S000000xx", "Prod0", self.source)
+        self.store.add_files("S000000xx", "Prod1", [self.source])
+        config.set("storage", "cold_cache", os.path.join(self.directory, "cache"))
+        self.addCleanup(config.remove_option, "storage", "cold_cache")
+
+    def test_recent_files(self):
+        """Check that files which have changed recently are not compressed."""
+        report = self.store.tier(age=1)
+        self.assertEqual(report["compressed"], [])
+        self.store.fetch_file("S000000xx", "Prod0", "samples.dat")
+
+    def test_tier_and_fetch(self):
+        """Check that compressed files are decompressed when they are fetched."""
+        report = self.store.tier(age=0)
+        self.assertEqual(len(report["compressed"]), 1)
+        self.assertLess(report["after"], report["before"])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, "S000000xx", "Prod0", "samples.dat"))
+        )
+
+        store = Store(root=self.root)
+        path = store.fetch_file("S000000xx", "Prod1", "samples.dat")
+        self.assertTrue(path.startswith(os.path.join(self.directory, "cache")))
+        with open(path, "rb") as f, open(self.source, "rb") as original:
+            self.assertEqual(f.read(), original.read())
+        with mock.patch.object(store, "_stream") as stream:
+            self.assertEqual(
+                store.fetch_file("S000000xx", "Prod1", "samples.dat"), path
+            )
+        stream.assert_not_called()
+
+        report = store.verify()
+        self.assertEqual((report["hashed"], report["failed"]), (2, {}))
+        space = store.space()
+        self.assertEqual(space["hot"], 0)
+        self.assertEqual(space["uncompressed"], os.path.getsize(self.source))
+
+    def test_dry_run(self):
+        """Check that a dry run doesn't compress anything."""
+        report = self.store.tier(age=0, dry_run=True)
+        self.assertEqual(len(report["compressed"]), 1)
+        self.assertEqual(self.store.space()["cold"], 0)
+
+    def test_corrupt_cold_file(self):
+        """Check that a compressed file which has changed is rejected."""
+        self.store.tier(age=0)
+        record = self.store.manifest.get_record("S000000xx", "Prod0", "samples.dat")
+        cold, codec = self.store._cold(record["hash"], record["algorithm"])
+        os.chmod(cold, stat.S_IWUSR | stat.S_IRUSR)
+        with asimov.storage.CODECS[codec][1](cold, "wb") as f:
+            f.write(b"changed")
+        with self.assertRaises(HashError):
+            self.store.fetch_file("S000000xx", "Prod0", "samples.dat")
+        self.assertEqual(
+            os.listdir(os.path.join(self.directory, "cache", "S000000xx", "Prod0")),
+            [],
+        )
+
+    def test_locutus_space(self):
+        """Check that locutus reports the space reclaimed."""
+        with mock.patch.object(asimov.locutus, "this_store", self.store):
+            result = CliRunner().invoke(asimov.locutus.cli, ["tier", "--age", "0"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("Compressed 1 files", result.output)
+            result = CliRunner().invoke(asimov.locutus.cli, ["space"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Space reclaimed", result.output)
+
+
+class SharedStoreTests(StoreTestCase):
+    """Check that the manifest is only read once for each store."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(asimov.storage.stores.clear)
+
+    def test_shared(self):
+        """Check that the same store is returned until its manifest changes."""
+        store = Store.get(self.root)
+        self.assertIs(Store.get(self.root), store)
+        store.add_file("S000000xx", "Prod0", self.source)
+        self.assertIs(Store.get(self.root), store)
+
+    def test_yaml_changed(self):
+        """Check that a YAML manifest is read again once it has changed."""
+        shutil.rmtree(self.root)
+        Store.create(self.root, "Test store", manifest="yaml")
+        store = Store.get(self.root)
+        self.assertIs(Store.get(self.root), store)
+        Store(root=self.root).add_file("S000000xx", "Prod0", self.source)
+        self.assertIs(Store.get(self.root), store)
+        self.assertEqual(
+            list(store.manifest.list_resources("S000000xx", "Prod0")), ["samples.dat"]
+        )
+
+    def test_yaml_own_changes(self):
+        """Check that a store's own changes to a YAML manifest are kept."""
+        shutil.rmtree(self.root)
+        Store.create(self.root, "Test store", manifest="yaml")
+        first = Store.get(self.root)
+        first.add_file("S000000xx", "Prod0", self.source)
+        Store.get(self.root).add_file("S000000xx", "Prod1", self.source)
+        first.add_file("S000000xx", "Prod2", self.source)
+        store = Store(root=self.root)
+        for production in ("Prod0", "Prod1", "Prod2"):
+            self.assertEqual(
+                list(store.manifest.list_resources("S000000xx", production)),
+                ["samples.dat"],
+            )
+
+    def test_threads(self):
+        """Check that threads sharing a store don't store a name twice."""
+        store = Store.get(self.root)
+        sources = [
+            self.make_file(f"source_{i}.dat", os.urandom(1000)) for i in range(8)
+        ]
+        # Every thread checks the names before any of them records a file.
+        barrier = threading.Barrier(16, timeout=10)
+        ingest = store._ingest
+
+        def wait(*args):
+            barrier.wait()
+            return ingest(*args)
+
+        with mock.patch.object(store, "_ingest", side_effect=wait), ThreadPoolExecutor(
+            max_workers=8
+        ) as pool:
+            reports = list(
+                pool.map(
+                    lambda source: store.add_files(
+                        "S000000xx",
+                        "Prod0",
+                        {source: "samples.dat", self.source: os.path.basename(source)},
+                    ),
+                    sources,
+                )
+            )
+        self.assertEqual(sum(len(report["stored"]) for report in reports), 9)
+        for report in reports:
+            for error in report["failed"].values():
+                self.assertIsInstance(error, FileExistsError)
+        self.assertEqual(
+            len(Store(root=self.root).manifest.list_resources("S000000xx", "Prod0")), 9
+        )
+        Store(root=self.root).fetch_file("S000000xx", "Prod0", "samples.dat")
+
+    def test_fetch_files(self):
+        """Check that every file can be fetched together."""
+        other = self.make_file("other.dat", b"other")
+        self.store.add_files("S000000xx", "Prod0", [self.source, other])
+        self.store.add_file("S000001xx", "Prod0", other)
+        path = os.path.join(self.root, "S000001xx", "Prod0", "other.dat")
+
+        with mock.patch.object(
+            self.store.manifest, "get_record", side_effect=AssertionError
+        ):
+            report = self.store.fetch_files()
+        self.assertEqual(report["failed"], {})
+        self.assertEqual(
+            sorted(report["fetched"]["S000000xx"]["Prod0"]),
+            ["other.dat", "samples.dat"],
+        )
+        self.assertEqual(report["fetched"]["S000001xx"]["Prod0"]["other.dat"], path)
+
+        os.chmod(path, stat.S_IWUSR | stat.S_IRUSR)
+        with open(path, "ab") as f:
+            f.write(b"changed")
+        report = self.store.fetch_files("S000001xx")
+        self.assertEqual(list(report["failed"]), [path])
+        self.assertEqual(report["fetched"], {})
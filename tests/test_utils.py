@@ -0,0 +1,157 @@
+"""
+Tests for the utility functions.
+"""
+
+import time
+import unittest
+from copy import deepcopy
+
+from asimov import serialisation
+from asimov.cli.application import apply_page
+from asimov.ledger import YAMLLedger
+from asimov.testing import AsimovTestCase
+from asimov import utils
+from asimov.utils import LayeredDict, update, wait_until
+
+
+class LayeredDictTests(unittest.TestCase):
+    """Check the layered view of settings."""
+
+    def setUp(self):
+        self.project = {
+            "likelihood": {"sample rate": 2048, "psd length": 4},
+            "interferometers": ["H1", "L1"],
+            "name": "project",
+        }
+        self.event = {"likelihood": {"sample rate": 4096}, "name": "event"}
+        self.layered = LayeredDict(self.project, self.event)
+
+    def test_matches_update(self):
+        """Check that the layers are combined in the same way as update."""
+        expected = update(deepcopy(self.project), deepcopy(self.event))
+        self.assertEqual(self.layered, expected)
+        self.assertEqual(list(self.layered), list(expected))
+        self.assertEqual(self.layered.materialise(), expected)
+
+    def test_write_does_not_change_layers(self):
+        """Check that changes are not written to the layers."""
+        self.layered["likelihood"]["psd length"] = 8
+        self.layered["interferometers"].append("V1")
+        self.layered["name"] = "analysis"
+        self.assertEqual(self.layered["likelihood"]["psd length"], 8)
+        self.assertEqual(self.layered["interferometers"], ["H1", "L1", "V1"])
+        self.assertEqual(self.project["likelihood"]["psd length"], 4)
+        self.assertEqual(self.project["interferometers"], ["H1", "L1"])
+        self.assertEqual(self.event["name"], "event")
+
+    def test_delete(self):
+        """Check that keys can be removed without changing the layers."""
+        self.layered["likelihood"].pop("sample rate")
+        del self.layered["name"]
+        self.assertNotIn("name", self.layered)
+        self.assertNotIn("sample rate", self.layered["likelihood"])
+        self.assertEqual(self.event["likelihood"]["sample rate"], 4096)
+        self.layered["name"] = "analysis"
+        self.assertEqual(self.layered["name"], "analysis")
+
+    def test_delete_without_copying(self):
+        """Check that deleting a key doesn't copy its value."""
+        del self.layered["interferometers"]
+        self.assertNotIn("interferometers", self.layered.local)
+        self.assertNotIn("interferometers", self.layered)
+
+    def test_later_changes(self):
+        """Check which changes to the layers are seen after a lookup."""
+        self.assertEqual(self.layered["name"], "event")
+        self.assertEqual(self.layered["interferometers"], ["H1", "L1"])
+        self.event["name"] = "renamed"
+        self.project["interferometers"].append("V1")
+        self.assertEqual(self.layered["name"], "renamed")
+        self.assertEqual(self.layered["interferometers"], ["H1", "L1"])
+
+    def test_copy(self):
+        """Check that copies are ordinary dictionaries."""
+        copied = deepcopy(self.layered)
+        self.assertIsInstance(copied, dict)
+        self.assertIsInstance(copied["likelihood"], dict)
+
+    def test_serialise(self):
+        """Check that layered settings can be written as YAML."""
+        self.assertEqual(
+            serialisation.load(serialisation.dump(self.layered)),
+            self.layered.materialise(),
+        )
+
+
+class ProductionDefaultsTests(AsimovTestCase):
+    """Check that productions share the project defaults without changing them."""
+
+    def setUp(self):
+        super().setUp()
+        apply_page(
+            f"{self.cwd}/tests/test_data/testing_pe.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/event_non_standard_settings.yaml",
+            event=None,
+            ledger=self.ledger,
+        )
+        apply_page(
+            f"{self.cwd}/tests/test_data/bilby_settings_nodeps.yaml",
+            event="Nonstandard fmin",
+            ledger=self.ledger,
+        )
+        self.ledger = YAMLLedger(".asimov/ledger.yml")
+
+    def test_defaults_unchanged(self):
+        """Check that changing a production does not change the pipeline defaults."""
+        production = self.ledger.get_productions("Nonstandard fmin")[0]
+        self.assertEqual(production.meta["sampler"]["sampler"], "dynesty")
+        production.meta["sampler"]["sampler"] = "nessai"
+        production.meta["postprocessing"]["pesummary"]["multiprocess"] = 1
+        pipelines = self.ledger.data["pipelines"]
+        self.assertEqual(pipelines["bilby"]["sampler"]["sampler"], "dynesty")
+        self.assertEqual(
+            self.ledger.data["postprocessing"]["pesummary"]["multiprocess"], 4
+        )
+        self.assertEqual(
+            production.to_dict()["bilby_test_job"]["sampler"]["sampler"], "nessai"
+        )
+
+
+class WaitTests(unittest.TestCase):
+    """Check waiting for a condition to be met."""
+
+    def test_ready(self):
+        """Check that there is no wait if the condition is already met."""
+        start = time.monotonic()
+        self.assertTrue(wait_until(lambda: True, 10, description="ready test"))
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(utils.waits["ready test"]["count"], 1)
+
+    def test_backoff(self):
+        """Check that the condition is checked until it is met."""
+        checks = []
+
+        def check():
+            checks.append(time.monotonic())
+            return len(checks) == 4
+
+        self.assertTrue(
+            wait_until(check, 10, description="backoff test", interval=0.01, backoff=2)
+        )
+        gaps = [later - earlier for earlier, later in zip(checks, checks[1:])]
+        self.assertEqual(len(gaps), 3)
+        self.assertGreater(gaps[2], gaps[0])
+
+    def test_timeout(self):
+        """Check that waiting stops after the timeout."""
+        start = time.monotonic()
+        self.assertFalse(
+            wait_until(lambda: False, 0.2, description="timeout test", interval=0.05)
+        )
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(utils.waits["timeout test"]["timeouts"], 1)
+        self.assertGreaterEqual(utils.waits["timeout test"]["longest"], 0.2)